@@ -32,10 +32,12 @@ class DebriefReportSection(BaseReportSection):
                     html.escape(getattr(a, 'architecture', '') or ''),
                     html.escape(a.exe_name),
                 ])
-            flowable_list.append(self.generate_table(
+            flowable_list.append(await self.in_executor(
+                self.generate_table,
                 agent_data,
                 [.85*inch, 1.0*inch, .65*inch, .55*inch, .95*inch, .65*inch, .55*inch, 1.8*inch],
-                escape_html=False
+                escape_html=False,
+                plain_text=True
             ))
 
         return flowable_list
@@ -2,6 +2,8 @@ from plugins.debrief.app.utility.base_report_section import BaseReportSection, P
 
 
 class DebriefReportSection(BaseReportSection):
+    graph_type = 'attackpath'
+
     def __init__(self):
         super().__init__()
         self.id = 'attackpath-graph'
@@ -11,10 +13,4 @@ class DebriefReportSection(BaseReportSection):
                            'hosts are connected by the method of execution used to start the agent on the target host.'
 
     async def generate_section_elements(self, styles, **kwargs):
-        flowable_list = []
-        path = kwargs.get('graph_files', {}).get('attackpath')
-        if path:
-            # Keep the title, description, and graph grouped together to avoid page break in the middle.
-            flowable_list.append(self.generate_grouped_graph_section_flowables(styles, path, PORTRAIT_CONTENT_WIDTH))
-
-        return flowable_list
+        return await self.generate_graph_section_flowables(styles, self.graph_type, PORTRAIT_CONTENT_WIDTH, **kwargs)
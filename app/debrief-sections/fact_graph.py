@@ -1,7 +1,12 @@
 from plugins.debrief.app.utility.base_report_section import BaseReportSection, PORTRAIT_CONTENT_WIDTH
+from plugins.debrief.app.utility.fact_detail import FactDetail
 
 
 class DebriefReportSection(BaseReportSection):
+    graph_type = 'fact'
+    GRAPH_DETAIL = FactDetail(top_k=15, cluster=True)
+    graph_options = dict(detail=GRAPH_DETAIL)
+
     def __init__(self):
         super().__init__()
         self.id = 'fact-graph'
@@ -9,14 +14,9 @@ class DebriefReportSection(BaseReportSection):
         self.section_title = 'FACT GRAPH'
         self.description = 'This graph displays the facts discovered by the operations run. Facts are attached to ' \
                            'the operation where they were discovered. Facts are also attached to the facts that led ' \
-                           'to their discovery. For readability, only the first 15 facts discovered in an operation ' \
-                           'are included in the graph. Larger operations may have their fact count limited for readability.'
+                           'to their discovery. For readability, only the 15 highest-scoring facts of an operation are ' \
+                           'shown individually; the remaining facts are grouped into one node per trait.'
 
     async def generate_section_elements(self, styles, **kwargs):
-        flowable_list = []
-        path = kwargs.get('graph_files', {}).get('fact')
-        if path:
-            # Keep the title, description, and graph grouped together to avoid page break in the middle.
-            flowable_list.append(self.generate_grouped_graph_section_flowables(styles, path, PORTRAIT_CONTENT_WIDTH))
-
-        return flowable_list
+        return await self.generate_graph_section_flowables(styles, self.graph_type, PORTRAIT_CONTENT_WIDTH,
+                                                           graph_options=self.graph_options, **kwargs)
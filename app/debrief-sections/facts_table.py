@@ -13,6 +13,8 @@ EXCEEDS_MSG = '... <font color="maroon"><i>(Value exceeds table cell character l
 
 
 class DebriefReportSection(BaseReportSection):
+    cache_flags = ('agents',)
+
     def __init__(self):
         super().__init__()
         self.id = 'facts-table'
@@ -144,4 +146,6 @@ class DebriefReportSection(BaseReportSection):
             fact_data.append(fact_table_row)
 
         # Score/Source at minimum width; Trait/Value/Command expand to fill
-        return self.generate_table(fact_data, [1.1*inch, 2.1*inch, .4*inch, .55*inch, 2.85*inch], escape_html=False)
+        return await self.in_executor(self.generate_table, fact_data,
+                                      [1.1*inch, 2.1*inch, .4*inch, .55*inch, 2.85*inch], escape_html=False,
+                                      plain_text=True)
@@ -6,6 +6,8 @@ from plugins.debrief.app.utility.base_report_section import BaseReportSection
 
 
 class DebriefReportSection(BaseReportSection):
+    cacheable = False  # carries the time of the render
+
     def __init__(self):
         super().__init__()
         self.id = 'main-summary'
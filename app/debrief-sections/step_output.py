@@ -30,7 +30,7 @@ class DebriefReportSection(BaseReportSection):
             return flowable_list
 
         for op in kwargs.get('operations', []):
-            table = self._generate_output_table(op)
+            table = await self.in_executor(self._generate_output_table, op)
             if table is None:
                 continue  # skip section entirely when no output captured
             flowable_list.append(
@@ -50,23 +50,22 @@ class DebriefReportSection(BaseReportSection):
             if not output:
                 continue
             if len(output) > OUTPUT_CHAR_LIMIT:
-                output_html = escape(output[:OUTPUT_CHAR_LIMIT]) + TRUNCATED_MSG
+                # Wrap output as a pre-built Paragraph so markup (TRUNCATED_MSG) is preserved
+                # while other cells use default escaping via escape_html=True
+                output_cell = Paragraph(escape(output[:OUTPUT_CHAR_LIMIT]) + TRUNCATED_MSG, _OUTPUT_STYLE)
             else:
-                output_html = escape(output)
-            # Wrap output as a pre-built Paragraph so markup (TRUNCATED_MSG) is preserved
-            # while other cells use default escaping via escape_html=True
-            output_para = Paragraph(output_html, _OUTPUT_STYLE)
+                output_cell = output
             data.append([
                 getattr(link.ability, 'name', '') or '',
                 self.status_name(link.status),
                 link.paw,
-                output_para,
+                output_cell,
             ])
 
         if len(data) == 1:
             return None  # no output to show
 
-        return self.generate_table(data, [1.2*inch, .6*inch, .6*inch, 4.6*inch])
+        return self.generate_table(data, [1.2*inch, .6*inch, .6*inch, 4.6*inch], plain_text=True)
 
     def _get_output(self, link):
         """Decode link output, returning empty string if unavailable."""
@@ -27,7 +27,7 @@ class DebriefReportSection(BaseReportSection):
                         Paragraph(self.description, styles['Normal'])
                     ])
                 )
-                flowable_list.append(self._generate_op_steps_table(o))
+                flowable_list.append(await self.in_executor(self._generate_op_steps_table, o))
         return flowable_list
 
     def _generate_op_steps_table(self, operation):
@@ -48,4 +48,4 @@ class DebriefReportSection(BaseReportSection):
 
         return self.generate_table(steps, [
             .7*inch, .6*inch, .5*inch, .65*inch, .9*inch, .8*inch, 2.45*inch, .4*inch
-        ])
+        ], plain_text=True)
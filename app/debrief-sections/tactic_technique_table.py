@@ -11,6 +11,8 @@ from plugins.debrief.app.debrief_svc import DebriefService
 
 
 class DebriefReportSection(BaseReportSection):
+    cache_flags = ('ttps-detections',)
+
     def __init__(self):
         super().__init__()
         self.id = 'tactic-technique-table'
@@ -43,7 +45,7 @@ class DebriefReportSection(BaseReportSection):
             ttps = DebriefService.generate_ttps(operations, key_by_tid=True) or {}
             block = self.group_elements([
                 Paragraph(self.section_title, styles['Heading2']),
-                self._generate_ttps_table(ttps, operations, include_det_links)
+                await self.in_executor(self._generate_ttps_table, ttps, operations, include_det_links)
             ])
 
             flowable_list.append(block)
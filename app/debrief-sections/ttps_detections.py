@@ -12,6 +12,7 @@ from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
 from reportlab.lib.enums import TA_LEFT, TA_CENTER
 
 from plugins.debrief.app.utility.base_report_section import BaseReportSection
+from plugins.debrief.app.utility.chunked_table import CHUNK_ROWS, ChunkedTable
 
 
 class DebriefReportSection(BaseReportSection):
@@ -175,7 +176,7 @@ class DebriefReportSection(BaseReportSection):
         for i, op in enumerate(operations):
             if i > 0:
                 flows.append(PageBreak())
-            flows.extend(self._generate_detection_appendix(op, paw_to_platform))
+            flows.extend(await self.in_executor(self._generate_detection_appendix, op, paw_to_platform))
 
         return flows
 
@@ -442,18 +443,6 @@ class DebriefReportSection(BaseReportSection):
         pages, causing LayoutError for large detection tables.
         '''
 
-        # ------------------------------------------------------------------
-        # BUILD TABLE
-        # ------------------------------------------------------------------
-        tbl = Table(
-            rows,
-            colWidths=self.DATA_COL_WIDTHS,
-            repeatRows=2,
-            splitByRow=True,
-            splitInRow=True,
-            hAlign='CENTER'
-        )
-
         # Base styling (unchanged from your version)
         base_style = [
             # --- Row 0 main headers ---
@@ -495,7 +484,15 @@ class DebriefReportSection(BaseReportSection):
 
 
 
-        tbl.setStyle(TableStyle(base_style))
+        # ------------------------------------------------------------------
+        # BUILD TABLE
+        # ------------------------------------------------------------------
+        table_kwargs = dict(splitByRow=True, splitInRow=True, hAlign='CENTER')
+        if len(rows) - 2 > CHUNK_ROWS:
+            tbl = ChunkedTable(rows, self.DATA_COL_WIDTHS, base_style, header_rows=2, **table_kwargs)
+        else:
+            tbl = Table(rows, colWidths=self.DATA_COL_WIDTHS, repeatRows=2, **table_kwargs)
+            tbl.setStyle(TableStyle(base_style))
         tbl.spaceBefore = 0
         tbl.spaceAfter = 0
         return tbl
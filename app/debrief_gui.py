@@ -1,12 +1,20 @@
+import asyncio
 import base64
 import glob
+import hashlib
+import json
 import logging
 import os
+import pickle
 import re
+import shutil
+import tempfile
 
 from aiohttp import web
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from aiohttp_jinja2 import template
 from datetime import datetime
+from functools import partial
 from importlib import import_module
 from io import BytesIO
 from reportlab import rl_settings
@@ -15,9 +23,22 @@ from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.platypus import SimpleDocTemplate, Spacer, PageTemplate, Frame, PageBreak, Flowable
 
 from app.service.auth_svc import for_all_public_methods, check_authorization
+try:
+    from aiohttp_security import authorized_userid
+except ImportError:  # pragma: no cover - installed with Caldera, absent when the plugin runs on its own
+    authorized_userid = None
 from app.utility.base_world import BaseWorld
 from plugins.debrief.app.debrief_svc import DebriefService
 from plugins.debrief.app.objects.c_story import Story
+from plugins.debrief.app.utility import graph_layout
+from plugins.debrief.app.utility.base_report_section import BaseReportSection
+from plugins.debrief.app.utility.d3_graph import D3Graph
+from plugins.debrief.app.utility.fact_detail import FactDetail
+from plugins.debrief.app.utility.operation_resolver import OperationResolver, OperationSnapshot, index_agents_by_paw
+from plugins.debrief.app.utility.pdf_cache import PdfArtifactCache
+from plugins.debrief.app.utility.pdf_jobs import PdfJob, PdfJobQueue
+from plugins.debrief.app.utility.response_cache import ResponseCache
+from plugins.debrief.app.utility.section_cache import SectionCache
 from plugins.debrief.attack_mapper import get_attack18
 
 
@@ -43,12 +64,32 @@ class DebriefGui(BaseWorld):
         self.report_section_names = list()
         self.loaded_report_sections = False
         self._a18 = None
+        self.pdf_executor = self._create_pdf_executor()
+        self._pdf_thread_executor = None
+        self.pdf_jobs = PdfJobQueue(
+            max_running=BaseWorld.get_config(prop='pdf_jobs_max_running', name='debrief') or 2,
+            max_jobs=BaseWorld.get_config(prop='pdf_jobs_max_queued', name='debrief') or 20,
+            idle_timeout=BaseWorld.get_config(prop='pdf_job_idle_timeout', name='debrief') or 120,
+            log=self.log)
+        cache_mb = BaseWorld.get_config(prop='response_cache_mb', name='debrief')
+        self.response_cache = ResponseCache(max_bytes=int((64 if cache_mb is None else cache_mb) * 1024 * 1024))
+        cache_mb = BaseWorld.get_config(prop='section_cache_mb', name='debrief')
+        self.section_cache = SectionCache(max_bytes=int((64 if cache_mb is None else cache_mb) * 1024 * 1024))
+        cache_mb = BaseWorld.get_config(prop='pdf_cache_mb', name='debrief')
+        self.pdf_cache = PdfArtifactCache(os.path.join('plugins', 'debrief', 'downloads'),
+                                          max_bytes=int((256 if cache_mb is None else cache_mb) * 1024 * 1024),
+                                          log=self.log)
 
         rl_settings.trustedHosts = BaseWorld.get_config(prop='reportlab_trusted_hosts', name='debrief') or None
 
     async def _get_access(self, request):
         return dict(access=tuple(await self.auth_svc.get_permissions(request)))
 
+    async def _requester(self, request):
+        """Identify who made ``request``: their user id, if logged in, and their access groups."""
+        user = await authorized_userid(request) if authorized_userid else None
+        return user, (await self._get_access(request))['access']
+
     @template('debrief.html')
     async def splash(self, request):
         operations = [o.display for o in
@@ -76,22 +117,89 @@ class DebriefGui(BaseWorld):
 
     async def report(self, request):
         data = dict(await request.json())
-        operations = [o for o in await self.data_svc.locate('operations', match=await self._get_access(request))
-                      if str(o.id) in data.get('operations')]
-        op_displays = [o.display for o in operations]
-        ttps = DebriefService.generate_ttps(operations)
-        return web.json_response(dict(operations=op_displays, ttps=ttps))
+        resolver = OperationResolver(self.data_svc, criteria=await self._get_access(request), snapshot=True)
+        operations = await resolver.resolve(data.get('operations'))
+
+        async def build():
+            op_displays = [o.display for o in operations]
+            ttps = DebriefService.generate_ttps(operations)
+            return dict(operations=op_displays, ttps=ttps)
+        return await self._cached_json(request, 'report', (), operations, build)
 
     async def topology(self, request):
         try:
             operations = request.rel_url.query.get('operations', '')
             op_ids = [o for o in operations.split(',') if o]
-            topo = await self.debrief_svc.build_topology(op_ids)
-            return web.json_response(topo)
+            resolver = OperationResolver(self.data_svc, snapshot=True)
+            resolved = await resolver.resolve(op_ids)
+            return await self._cached_json(request, 'topology', (), resolved,
+                                           lambda: self.debrief_svc.build_topology(op_ids, resolver=resolver),
+                                           knowledge=True)
         except Exception as e:
             self.log.error(repr(e), exc_info=True)
             return web.json_response({'error': 'Error building topology'}, status=500)
 
+    async def topology_stream(self, request):
+        """Stream a live topology as server-sent events.
+
+        The first ``topology`` event carries the whole topology. Each ``delta`` event after it carries
+        what changed since the last event sent (see ``DebriefService.diff_topology``); the topology is
+        only rebuilt when the operations' fingerprint, knowledge store facts included, changed. ``end`` follows once every
+        operation has stopped.
+        """
+        query = request.rel_url.query
+        op_ids = [o for o in query.get('operations', '').split(',') if o]
+        try:
+            interval = float(query.get('interval') or
+                             BaseWorld.get_config(prop='topology_stream_interval', name='debrief') or 2)
+        except ValueError:
+            return web.json_response({'error': 'interval must be a number'}, status=400)
+        interval = max(interval, self._MIN_STREAM_INTERVAL)
+
+        response = web.StreamResponse(headers={'Content-Type': 'text/event-stream', 'Cache-Control': 'no-cache'})
+        await response.prepare(request)
+        try:
+            operations = await OperationResolver(self.data_svc).resolve(op_ids)
+            sent, fingerprint = None, None
+            while True:
+                snapshots = [OperationSnapshot(op) for op in operations]
+                current_fingerprint = await self.debrief_svc.fingerprint(snapshots, knowledge=True)
+                if current_fingerprint != fingerprint:
+                    fingerprint = current_fingerprint
+                    topo = await self.debrief_svc.build_topology(
+                        op_ids, resolver=OperationResolver.from_operations(snapshots))
+                    delta = self.debrief_svc.diff_topology(sent, topo) if sent else None
+                    if delta is None:
+                        await self._send_event(response, 'topology', topo)
+                    elif any(delta.values()):
+                        await self._send_event(response, 'delta', delta)
+                    sent = topo
+                else:
+                    await response.write(b': keepalive\n\n')
+                if all(getattr(op, 'state', None) in self._STOPPED_STATES for op in operations):
+                    await self._send_event(response, 'end', {})
+                    break
+                await asyncio.sleep(interval)
+        except ConnectionResetError:
+            self.log.debug('Client went away while streaming topology')
+            return response
+        except Exception as e:
+            self.log.error(repr(e), exc_info=True)
+            try:
+                await self._send_event(response, 'error', {'error': 'Error building topology'})
+            except ConnectionResetError:
+                self.log.debug('Client went away before the topology error was sent')
+                return response
+        await response.write_eof()
+        return response
+
+    _MIN_STREAM_INTERVAL = 0.5  # seconds
+    _STOPPED_STATES = ('finished', 'out_of_time')
+
+    @staticmethod
+    async def _send_event(response, event, data):
+        await response.write(f'event: {event}\ndata: {json.dumps(data)}\n\n'.encode('utf-8'))
+
     async def graph(self, request):
         graphs = {
             'steps': self.debrief_svc.build_steps_d3,
@@ -100,6 +208,13 @@ class DebriefGui(BaseWorld):
             'tactic': self.debrief_svc.build_tactic_d3,
             'technique': self.debrief_svc.build_technique_d3
         }
+        graph_streams = {
+            'steps': self.debrief_svc.iter_steps_d3,
+            'attackpath': self.debrief_svc.iter_attackpath_d3,
+            'fact': self.debrief_svc.iter_fact_d3,
+            'tactic': self.debrief_svc.iter_tactic_d3,
+            'technique': self.debrief_svc.iter_technique_d3
+        }
         try:
             graph_type = request.rel_url.query.get('type')
             if graph_type not in graphs:
@@ -107,46 +222,275 @@ class DebriefGui(BaseWorld):
 
             operations = request.rel_url.query.get('operations', '')
             op_ids = [o for o in operations.split(',') if o]
-            graph = await graphs[graph_type](op_ids)
-            return web.json_response(graph)
+            options = dict()
+            if graph_type == 'fact':
+                try:
+                    options['detail'] = self._get_fact_detail(request.rel_url.query)
+                except ValueError:
+                    return web.json_response({'error': 'top_k must be a non-negative integer'}, status=400)
+            cursor = request.rel_url.query.get('cursor')
+            if cursor is None and request.rel_url.query.get('format') == 'ndjson':
+                graph_iter = graph_streams[graph_type](op_ids, graph=D3Graph(flush_size=self._GRAPH_STREAM_CHUNK),
+                                                       **options)
+                return await self._stream_graph(request, graph_iter)
+            if cursor is not None:
+                graph = await self.debrief_svc.build_graph_delta(partial(graphs[graph_type], **options), op_ids,
+                                                                 cursor, count_facts=(graph_type == 'fact'))
+                return web.json_response(graph)
+            resolver = OperationResolver(self.data_svc, snapshot=True)
+            resolved = await resolver.resolve(op_ids)
+            variant = tuple(sorted((k, v) for k, v in request.rel_url.query.items() if k != 'operations'))
+            return await self._cached_json(request, 'graph', variant, resolved,
+                                           lambda: graphs[graph_type](op_ids, resolver=resolver, **options))
         except Exception as e:
             self.log.exception('graph() failed: %r', e)
             return web.json_response({'error': 'internal error'}, status=500)
 
+    @staticmethod
+    def _get_fact_detail(query):
+        """Read the fact graph ``top_k``, ``cluster`` and ``expand`` query parameters."""
+        top_k = query.get('top_k')
+        return FactDetail(top_k=int(top_k) if top_k else None,
+                          cluster=query.get('cluster', '').lower() in ('1', 'true', 'yes'),
+                          expand=[t for t in query.get('expand', '').split(',') if t])
+
+    async def _cached_json(self, request, endpoint, variant, operations, build, knowledge=False):
+        """Return the JSON response for ``await build()``, served from the response cache when possible.
+
+        Entries are keyed by endpoint, request variant, operation ids, the caller's access and the
+        operations' fingerprint, so they are never served once an operation changed. Views that read
+        the knowledge store pass ``knowledge`` to have its facts counted in. Responses carry an ETag
+        and a matching If-None-Match gets a 304.
+        """
+        key = (endpoint, variant, tuple(str(op.id) for op in operations),
+               (await self._get_access(request))['access'],
+               await self.debrief_svc.fingerprint(operations, knowledge=knowledge))
+        entry = self.response_cache.get(key)
+        if entry is None:
+            entry = self.response_cache.put(key, json.dumps(await build()).encode('utf-8'))
+        body, etag = entry
+        if etag in [t.strip() for t in request.headers.get('If-None-Match', '').split(',')]:
+            return web.Response(status=304, headers={'ETag': etag})
+        return web.Response(body=body, content_type='application/json', headers={'ETag': etag})
+
+    _GRAPH_STREAM_CHUNK = 500  # nodes + links buffered between writes
+
+    async def _stream_graph(self, request, graph_iter):
+        """Write a graph as newline-delimited JSON, one ``{"node": ...}`` or ``{"link": ...}`` per line."""
+        response = web.StreamResponse(headers={'Content-Type': 'application/x-ndjson'})
+        await response.prepare(request)
+        try:
+            async for graph in graph_iter:
+                nodes, links = graph.drain()
+                lines = [json.dumps(dict(node=n)) for n in nodes] + [json.dumps(dict(link=lnk)) for lnk in links]
+                if lines:
+                    await response.write(('\n'.join(lines) + '\n').encode('utf-8'))
+        except ConnectionResetError:
+            self.log.debug('Client went away while streaming graph')
+            return response
+        except Exception as e:
+            self.log.exception('graph() stream failed: %r', e)
+            await response.write(json.dumps(dict(error='internal error')).encode('utf-8') + b'\n')
+        await response.write_eof()
+        return response
+
     async def download_pdf(self, request):
+        """Build the requested report.
+
+        Clients sending ``Accept: application/pdf`` get the document itself, streamed from a spooled
+        temporary file; everyone else gets the legacy JSON body with the PDF as a string. Reports
+        of stopped operations are kept in ``pdf_cache`` and rendered once for identical requests.
+        """
         data = dict(await request.json())
-        svg_data = data['graphs']
-        header_logo_filename = data.get('header-logo')
-        self._save_svgs(svg_data)
+        workspace = tempfile.mkdtemp(prefix='debrief-')
         try:
-            if data['operations']:
-                header_logo_path = None
-                if header_logo_filename:
-                    header_logo_path = os.path.relpath(os.path.join(self.uploads_dir, 'header-logos', header_logo_filename))
-                access = await self._get_access(request)
-                operations = [o for o in await self.data_svc.locate('operations', match=access)
-                              if str(o.id) in data.get('operations', [])]
-                op_name = operations[0].name if operations else 'Operation'
-                safe_op_name = re.sub(r'[^A-Za-z0-9_-]+', '-', op_name)
-                date_part = datetime.now().strftime('%Y_%m_%d')
-                filename = f'{safe_op_name}_Debrief_{date_part}.pdf'
-                runtime_agents = self._get_runtime_agents(operations)
-                pdf_bytes = await self._build_pdf(operations, runtime_agents, filename, data['report-sections'], header_logo_path)
+            graph_files = self._save_svgs(data['graphs'], workspace)
+            pdf_request = await self._pdf_request(request, data)
+            if pdf_request:
+                operations, runtime_agents, filename, sections, header_logo_path = pdf_request
+                build = partial(self._build_pdf, operations, runtime_agents, filename, sections, header_logo_path,
+                                graph_files=graph_files)
+                cache_key = await self._pdf_cache_key(operations, sections, header_logo_path)
+                if cache_key:
+                    with await self.pdf_cache.open_or_render(cache_key, lambda output: build(output=output)) as pdf_file:
+                        if self._wants_pdf(request):
+                            return await self._pdf_response(request, pdf_file, filename, on_disk=True)
+                        pdf_bytes = pdf_file.read()
+                elif self._wants_pdf(request):
+                    with tempfile.SpooledTemporaryFile(max_size=self._PDF_SPOOL_SIZE) as pdf_file:
+                        await build(output=pdf_file)
+                        self.log.info('Generated PDF')
+                        return await self._pdf_response(request, pdf_file, filename)
+                else:
+                    pdf_bytes = await build()
                 self.log.info('Generated PDF')
-                return web.json_response(dict(filename=filename, pdf_bytes=pdf_bytes))
+                return web.json_response(dict(filename=filename, pdf_bytes=pdf_bytes.decode('utf-8', errors='ignore')))
             return web.json_response({'error': 'No operations selected'}, status=400)
         except Exception as e:
             self.log.exception('download_pdf() failed: %r', e)
             return web.json_response({'error': 'Error generating PDF report'}, status=500)
         finally:
-            self._clean_downloads()
+            shutil.rmtree(workspace, ignore_errors=True)
+
+    async def submit_pdf_job(self, request):
+        """Queue a PDF render with the body of ``POST /plugin/debrief/pdf`` and answer with its job id."""
+        data = dict(await request.json())
+        try:
+            pdf_request = await self._pdf_request(request, data)
+        except Exception as e:
+            self.log.exception('submit_pdf_job() failed: %r', e)
+            return web.json_response({'error': 'Error generating PDF report'}, status=500)
+        if not pdf_request:
+            return web.json_response({'error': 'No operations selected'}, status=400)
+        operations, runtime_agents, filename, sections, header_logo_path = pdf_request
+        svg_data = data.get('graphs') or {}
+
+        async def render(job):
+            workspace = tempfile.mkdtemp(prefix='debrief-')
+            try:
+                graph_files = self._save_svgs(svg_data, workspace)
+                build = partial(self._build_pdf, operations, runtime_agents, filename, sections, header_logo_path,
+                                graph_files=graph_files, job=job)
+                cache_key = await self._pdf_cache_key(operations, sections, header_logo_path)
+                if cache_key:
+                    with await self.pdf_cache.open_or_render(cache_key, lambda output: build(output=output)) as pdf_file:
+                        return pdf_file.read()
+                return await build()
+            finally:
+                shutil.rmtree(workspace, ignore_errors=True)
+
+        try:
+            job = self.pdf_jobs.submit(render, sections, filename, owner=await self._requester(request))
+        except PdfJobQueue.QueueFull:
+            return web.json_response({'error': 'Too many PDF jobs, try again later'}, status=429)
+        return web.json_response(job.display(), status=202)
+
+    async def pdf_job_status(self, request):
+        job = self.pdf_jobs.get(request.match_info['job_id'], await self._requester(request))
+        if not job:
+            return web.json_response({'error': 'Unknown PDF job'}, status=404)
+        return web.json_response(job.display())
+
+    async def download_pdf_job(self, request):
+        job = self.pdf_jobs.get(request.match_info['job_id'], await self._requester(request))
+        if not job:
+            return web.json_response({'error': 'Unknown PDF job'}, status=404)
+        if job.state != PdfJob.DONE:
+            return web.json_response(job.display(), status=409)
+        if self._wants_pdf(request):
+            return web.Response(body=job.result, content_type='application/pdf',
+                                headers={'Content-Disposition': self._attachment(job.filename)})
+        return web.json_response(dict(filename=job.filename, pdf_bytes=job.result.decode('utf-8', errors='ignore')))
+
+    async def cancel_pdf_job(self, request):
+        job = self.pdf_jobs.cancel(request.match_info['job_id'], await self._requester(request))
+        if not job:
+            return web.json_response({'error': 'Unknown PDF job'}, status=404)
+        return web.json_response(job.display())
+
+    _PDF_SPOOL_SIZE = 8 * 1024 * 1024  # PDFs up to this size stay in memory, larger ones spill to disk
+    _PDF_CHUNK_SIZE = 256 * 1024
+
+    @staticmethod
+    def _wants_pdf(request):
+        return 'application/pdf' in request.headers.get('Accept', '')
+
+    @staticmethod
+    def _attachment(filename):
+        return 'attachment; filename="%s"' % re.sub(r'[^A-Za-z0-9_.-]+', '-', filename)
+
+    async def _pdf_response(self, request, pdf_file, filename, on_disk=False):
+        """Send a finished PDF from its binary file as ``application/pdf``.
+
+        Files on disk (including a spool that went to disk) are handed to ``loop.sendfile``;
+        in-memory spools and transports without sendfile support (TLS) are written in chunks.
+        """
+        size = pdf_file.seek(0, os.SEEK_END)
+        pdf_file.seek(0)
+        response = web.StreamResponse(headers={'Content-Type': 'application/pdf',
+                                               'Content-Disposition': self._attachment(filename)})
+        response.content_length = size
+        await response.prepare(request)
+        if (on_disk or size > self._PDF_SPOOL_SIZE) and request.transport is not None:
+            try:
+                await asyncio.get_running_loop().sendfile(request.transport, pdf_file, 0, size)
+                await response.write_eof()
+                return response
+            except NotImplementedError:
+                pdf_file.seek(0)
+        chunk = pdf_file.read(self._PDF_CHUNK_SIZE)
+        while chunk:
+            await response.write(chunk)
+            chunk = pdf_file.read(self._PDF_CHUNK_SIZE)
+        await response.write_eof()
+        return response
+
+    async def _pdf_cache_key(self, operations, sections, header_logo_path):
+        """Return the ``pdf_cache`` key of a render, or None if its PDF must not be reused.
+
+        Only reports of stopped operations are reused, and only when no graph comes from the SVGs
+        uploaded by the browser, either because graphs cannot be laid out here or because a
+        selected graph is too large to be. The key covers the operations' fingerprint, the selected sections,
+        the header logo's content and the plugin version.
+        """
+        if not self.pdf_cache.enabled or not operations:
+            return None
+        if any(getattr(op, 'state', None) not in self._STOPPED_STATES for op in operations):
+            return None
+        if not graph_layout.available() and any(('-graph' in s) for s in sections):
+            return None
+        for section in sections:
+            module = self.report_section_modules.get(section)
+            if isinstance(module, BaseReportSection) and \
+                    await module.uses_uploaded_graph(operations=operations, debrief_svc=self.debrief_svc):
+                return None
+        return self.pdf_cache.key(await self.debrief_svc.fingerprint(operations), list(sections),
+                                  self._file_digest(header_logo_path), self._plugin_version())
+
+    _version = None
+
+    @classmethod
+    def _plugin_version(cls):
+        if cls._version is None:
+            try:
+                with open(os.path.join('plugins', 'debrief', 'VERSION.txt')) as fh:
+                    cls._version = fh.read().strip()
+            except OSError:
+                cls._version = ''
+        return cls._version
+
+    @staticmethod
+    def _file_digest(path):
+        if not path:
+            return None
+        try:
+            with open(path, 'rb') as fh:
+                return hashlib.sha256(fh.read()).hexdigest()
+        except OSError:
+            return None
+
+    async def _pdf_request(self, request, data):
+        """Resolve a PDF request body into ``_build_pdf`` arguments, or None if no operation was selected."""
+        if not data.get('operations'):
+            return None
+        header_logo_path = None
+        if data.get('header-logo'):
+            header_logo_path = os.path.relpath(os.path.join(self.uploads_dir, 'header-logos', data['header-logo']))
+        resolver = OperationResolver(self.data_svc, criteria=await self._get_access(request), snapshot=True)
+        operations = await resolver.resolve(data['operations'])
+        op_name = operations[0].name if operations else 'Operation'
+        safe_op_name = re.sub(r'[^A-Za-z0-9_-]+', '-', op_name)
+        date_part = datetime.now().strftime('%Y_%m_%d')
+        filename = f'{safe_op_name}_Debrief_{date_part}.pdf'
+        runtime_agents = self._get_runtime_agents(operations, resolver)
+        return operations, runtime_agents, filename, data['report-sections'], header_logo_path
 
     async def download_json(self, request):
         data = dict(await request.json())
         if data['operations']:
+            resolver = OperationResolver(self.data_svc, criteria=await self._get_access(request))
             operations = [await o.report(file_svc=self.file_svc, data_svc=self.data_svc, output=True) for o in
-                          await self.data_svc.locate('operations', match=await self._get_access(request))
-                          if str(o.id) in data.get('operations')]
+                          await resolver.resolve(data.get('operations'))]
             filename = 'debrief_' + datetime.today().strftime('%Y-%m-%d_%H-%M-%S')
             return web.json_response(dict(filename=filename, json_bytes=operations))
         return web.json_response('No operations selected')
@@ -190,10 +534,12 @@ class DebriefGui(BaseWorld):
         with open(filepath, 'wb') as f:
             f.write(content)
 
-    # D3 force-directed graph sections removed from PDF — their layouts are
-    # non-deterministic and unreadable in print. The equivalent table sections
-    # (steps-table, tactic-technique-table) convey the same data.
-    _HIDDEN_SECTIONS = {'steps-graph', 'tactic-graph', 'technique-graph', 'fact-graph'}
+    # D3 force-directed graph sections are kept out of the PDF unless NumPy is available
+    # for the deterministic server-side layout; browser layouts are non-deterministic and
+    # unreadable in print. The equivalent table sections (steps-table,
+    # tactic-technique-table) convey the same data.
+    _HIDDEN_SECTIONS = set() if graph_layout.available() else {
+        'steps-graph', 'tactic-graph', 'technique-graph', 'fact-graph'}
 
     def _load_report_sections(self, plugins):
         if not self.loaded_report_sections:
@@ -217,44 +563,32 @@ class DebriefGui(BaseWorld):
             self.report_section_names.sort(key=lambda s: s['name'].lower())
             self.loaded_report_sections = True
 
-    def _get_runtime_agents(self, operations):
-        added_paws = set()
+    def _get_runtime_agents(self, operations, resolver=None):
+        agents_by_paw = resolver.agents_by_paw if resolver else index_agents_by_paw
         executed_paws = set()
-        runtime_agents = []
+        runtime_agents = dict()
         for op in operations or []:
             for ln in getattr(op, 'chain', []) or []:
                 paw = getattr(ln, 'paw', None)
                 if paw:
                     executed_paws.add(paw)
-            for agent in op.agents:
-                if agent.paw not in added_paws and agent.paw in executed_paws:
-                    runtime_agents.append(agent)
-                    added_paws.add(agent.paw)
-        return runtime_agents
+            for paw, agent in agents_by_paw(op).items():
+                if paw in executed_paws:
+                    runtime_agents.setdefault(paw, agent)
+        return list(runtime_agents.values())
 
     def _pretty_name(self, trait: str) -> str:
         # fallback pretty name when no explicit name is present
         # examples: 'server.malicious.url' -> 'Server Malicious Url'
         return ' '.join(p.capitalize() for p in str(trait).replace('_', '.').split('.') if p)
 
-    async def _build_pdf(self, operations, agents, filename, sections, header_logo_path):
+    async def _build_pdf(self, operations, agents, filename, sections, header_logo_path, graph_files=None, job=None,
+                         output=None):
         if not self._a18:
             self._a18 = get_attack18()  # lazy load Attack18Map
 
         _landscape_locked = False
-        pdf_buffer = BytesIO()
-        doc = TemplateSwitchDoc(
-            pdf_buffer,
-            pagesize=letter,
-            rightMargin=RIGHT_MARGIN,
-            leftMargin=LEFT_MARGIN,
-            topMargin=TOP_MARGIN,
-            bottomMargin=BOTTOM_MARGIN,
-            title=filename
-        )
-
         story_obj = Story()
-        story_obj.set_header_logo_path(header_logo_path)
         story_obj.append(Spacer(1, 36))
         styles = getSampleStyleSheet()
 
@@ -266,100 +600,56 @@ class DebriefGui(BaseWorld):
         if 'ttps-detections' in sections and not detections_only:
             sections = [s for s in sections if s != 'ttps-detections'] + ['ttps-detections']
 
-        # Frames
-        portrait_frame = Frame(
-            doc.leftMargin, doc.bottomMargin,
-            doc.width, doc.height,
-            id='portrait-frame'
-        )
-        lm = bm = rm = tm = 18
-        lw, lh = to_landscape(letter)
-        landscape_frame = Frame(
-            lm, bm,
-            lw - (lm + rm),
-            lh - (tm + bm),
-            id='landscape-frame'
-        )
-
-        # PageTemplates
-        portrait_first_tpl = PageTemplate(id='PortraitFirst', frames=[portrait_frame], pagesize=letter,
-                                          onPage=story_obj.header_footer_first)
-        portrait_tpl = PageTemplate(id='Portrait', frames=[portrait_frame], pagesize=letter,
-                                    onPage=story_obj.header_footer_rest)
-        landscape_first_tpl = PageTemplate(id='LandscapeFirst', frames=[landscape_frame], pagesize=to_landscape(letter),
-                                           onPage=story_obj.header_footer_first)
-        landscape_tpl = PageTemplate(id='Landscape', frames=[landscape_frame], pagesize=to_landscape(letter),
-                                     onPage=story_obj.header_footer_rest)
-
         if detections_only:
-            # Make LandscapeFirst the default starting template
-            doc.addPageTemplates([
-                landscape_first_tpl,  # first page: landscape + first-page header/footer
-                landscape_tpl,        # subsequent pages in landscape
-                portrait_tpl,
-                portrait_first_tpl,
-            ])
             story_obj.append(LockTemplateMarker('Landscape'), spacing=0)
-        else:
-            # Default is portrait; we'll switch to landscape only for the detections block
-            doc.addPageTemplates([
-                portrait_first_tpl,
-                portrait_tpl,
-                landscape_tpl,
-                landscape_first_tpl,
-            ])
-
-        # Collect SVG graphs if any
-        graph_files = {}
-        if any(('-graph' in v) for v in sections):
-            for file in glob.glob('./plugins/debrief/downloads/*.svg'):
-                graph_files[os.path.basename(file).split('.')[0]] = file
+
+        if job:
+            job.sections = {section: 'pending' for section in sections}
+        progress = job.section_progress if job else (lambda section, state: None)
+
+        graph_files = graph_files or {}
 
         try:
-            # ---- COVER: ----
+            # Cover first, statistics right after it, then the other sections in the requested order
+            planned = []
             cover_module = self.report_section_modules.get('main-summary')
             if cover_module:
-                self.log.debug('Generating main summary cover flowables')
-                cover_flowables = await cover_module.generate_section_elements(
-                    styles,
-                    operations=operations,
-                    agents=agents,
-                    graph_files=graph_files,
-                    selected_sections=sections
-                )
-                if cover_flowables:
-                    for f in cover_flowables:
-                        story_obj.append(f)
-
-            # ---- STATISTICS: render right after cover ----
+                planned.append(('main-summary', cover_module))
             stats_module = self.report_section_modules.get('statistics')
             if stats_module and 'statistics' in sections:
-                self.log.debug('Generating statistics section (after cover)')
-                stats_flowables = await stats_module.generate_section_elements(
-                    styles, operations=operations, agents=agents,
-                    graph_files=graph_files, selected_sections=sections
-                )
-                for f in stats_flowables:
-                    story_obj.append(f)
-
-            # ---- SECTIONS: append each section's flowables ----
+                planned.append(('statistics', stats_module))
             for section in sections:
                 if section in ('main-summary', 'statistics'):
                     continue
-
                 section_module = self.report_section_modules.get(section)
                 if not section_module:
                     self.log.warn(f'Requested debrief section module {section} not found.')
                     continue
+                planned.append((section, section_module))
+
+            fingerprint = await self.debrief_svc.fingerprint(operations)
+
+            # Load the operations' facts and relationships once, before the sections read them concurrently
+            snapshots = [op for op in operations if isinstance(op, OperationSnapshot)]
+            await asyncio.gather(*(op.all_facts() for op in snapshots), *(op.all_relationships() for op in snapshots))
 
+            async def generate(section, section_module):
                 self.log.debug(f'Generating flowables for section: {section}')
-                flowables = await section_module.generate_section_elements(
-                    styles,
+                progress(section, 'running')
+                flowables = await self.section_cache.generate(
+                    section_module, styles, fingerprint,
                     operations=operations,
                     agents=agents,
-                    graph_files=graph_files,
+                    graph_files=graph_files, debrief_svc=self.debrief_svc,
                     selected_sections=sections
                 )
+                progress(section, 'done')
+                return flowables or []
+
+            # ---- SECTIONS: generated concurrently, their table building and graph layout on worker
+            # threads, then appended in plan order ----
+            generated = await asyncio.gather(*(generate(section, module) for section, module in planned))
+            for (section, _), flowables in zip(planned, generated):
                 if section == 'ttps-detections' and not _landscape_locked and not detections_only:
                     story_obj.append(UseTemplateMarker('LandscapeFirst'), spacing=0)
                     story_obj.append(PageBreak(), spacing=0)
@@ -372,14 +662,53 @@ class DebriefGui(BaseWorld):
                     story_obj.append(f)
 
             # Build PDF
-            doc.build(story_obj.story_arr)
-            pdf_value = pdf_buffer.getvalue()
-            return pdf_value.decode('utf-8', errors='ignore')
+            if job:
+                job.stage = 'layout'
+            return await self._render_pdf(story_obj.story_arr, filename, header_logo_path, detections_only,
+                                          on_page=job.page_done if job else None, output=output)
         except Exception as e:
             self.log.exception(e)
             raise e
-        finally:
-            pdf_buffer.close()
+
+    async def _render_pdf(self, story, title, header_logo_path, detections_only, on_page=None, output=None):
+        """Lay out and build the PDF on the render pool so the event loop keeps serving requests.
+
+        Returns the PDF bytes, or None once it is written to the binary file ``output``.
+        The story is test-pickled before it is sent to a process pool; one that cannot be pickled
+        is rendered on a thread instead. Errors raised while rendering are passed on either way.
+        ``on_page`` and ``output`` only reach thread workers; a worker process cannot call back
+        into this one, so its bytes are copied to ``output`` here.
+        """
+        build = partial(render_pdf, story, title, header_logo_path=header_logo_path, detections_only=detections_only)
+        loop = asyncio.get_running_loop()
+        executor = self.pdf_executor
+        if isinstance(executor, ProcessPoolExecutor):
+            try:
+                pickle.dumps(build, protocol=pickle.HIGHEST_PROTOCOL)
+            except Exception as e:
+                self.log.warning('PDF story cannot be sent to a worker process, rendering on a thread: %r', e)
+                executor = self._pdf_fallback_executor()
+            else:
+                pdf = await loop.run_in_executor(executor, build)
+                if output is None:
+                    return pdf
+                output.write(pdf)
+                return None
+        return await loop.run_in_executor(executor, partial(build, on_page=on_page, output=output))
+
+    def _pdf_fallback_executor(self):
+        if self._pdf_thread_executor is None:
+            self._pdf_thread_executor = ThreadPoolExecutor(max_workers=self.pdf_executor._max_workers,
+                                                           thread_name_prefix='debrief-pdf')
+        return self._pdf_thread_executor
+
+    @staticmethod
+    def _create_pdf_executor():
+        """Return the pool configured by ``pdf_render_pool`` (thread or process) and ``pdf_render_workers``."""
+        workers = BaseWorld.get_config(prop='pdf_render_workers', name='debrief') or 2
+        if BaseWorld.get_config(prop='pdf_render_pool', name='debrief') == 'process':
+            return ProcessPoolExecutor(max_workers=workers)
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix='debrief-pdf')
 
     @staticmethod
     def _sanitize_filename(filename):
@@ -388,9 +717,15 @@ class DebriefGui(BaseWorld):
         return re.sub(r'\s+', '_', cleaned)
 
     @staticmethod
-    def _save_svgs(svgs):
-        save_location = os.path.realpath('./plugins/debrief/downloads/')
-        for filename, svg_bytes in svgs.items():
+    def _save_svgs(svgs, save_location):
+        """Write the browser's base64 SVG graphs into the render's own ``save_location``.
+
+        Returns ``{graph_type: path}`` for ``graph_files``, so concurrent renders never see or
+        delete each other's graphs.
+        """
+        save_location = os.path.realpath(save_location)
+        graph_files = dict()
+        for filename, svg_bytes in (svgs or {}).items():
             safe_name = re.sub(r'[^A-Za-z0-9_-]', '', filename)
             if not safe_name:
                 continue
@@ -399,14 +734,8 @@ class DebriefGui(BaseWorld):
                 continue  # path traversal attempt
             with open(full_path, 'wb') as fh:
                 fh.write(base64.b64decode(svg_bytes))
-
-    @staticmethod
-    def _clean_downloads():
-        imgs = []
-        imgs.extend(glob.glob('./plugins/debrief/downloads/*.png'))
-        imgs.extend(glob.glob('./plugins/debrief/downloads/*.svg'))
-        for f in imgs:
-            os.remove(f)
+            graph_files[safe_name] = full_path
+        return graph_files
 
     @staticmethod
     def _suppress_logs(library):
@@ -446,6 +775,12 @@ class LockTemplateMarker(Flowable):
 class TemplateSwitchDoc(SimpleDocTemplate):
     '''SimpleDocTemplate that reacts to UseTemplateMarker/LockTemplateMarker.'''
 
+    on_page = None  # optional callable(page_number) run after each finished page
+
+    def afterPage(self):
+        if self.on_page:
+            self.on_page(self.page)
+
     def afterFlowable(self, flowable):
         try:
             if isinstance(flowable, UseTemplateMarker):
@@ -465,3 +800,75 @@ class TemplateSwitchDoc(SimpleDocTemplate):
                 self.handle_nextPageTemplate(self._locked_template)
         except Exception as e:
             logging.error('Error while processing flowable in TemplateSwitchDoc.afterFlowable: %r', e)
+
+
+def render_pdf(story, title, header_logo_path=None, detections_only=False, on_page=None, output=None):
+    """Build ``story`` into a PDF and return its bytes, or write it to the binary file ``output``.
+
+    Runs on a worker thread or process, so it only touches its own document; the header logo
+    travels on the document rather than through ``Story``'s shared default. ``on_page`` is
+    called with each finished page number and may raise to abort the build.
+    """
+    pdf_buffer = BytesIO() if output is None else output
+    doc = TemplateSwitchDoc(
+        pdf_buffer,
+        pagesize=letter,
+        rightMargin=RIGHT_MARGIN,
+        leftMargin=LEFT_MARGIN,
+        topMargin=TOP_MARGIN,
+        bottomMargin=BOTTOM_MARGIN,
+        title=title
+    )
+    doc.header_logo_path = header_logo_path
+    doc.on_page = on_page
+
+    # Frames
+    portrait_frame = Frame(
+        doc.leftMargin, doc.bottomMargin,
+        doc.width, doc.height,
+        id='portrait-frame'
+    )
+    lm = bm = rm = tm = 18
+    lw, lh = to_landscape(letter)
+    landscape_frame = Frame(
+        lm, bm,
+        lw - (lm + rm),
+        lh - (tm + bm),
+        id='landscape-frame'
+    )
+
+    # PageTemplates
+    portrait_first_tpl = PageTemplate(id='PortraitFirst', frames=[portrait_frame], pagesize=letter,
+                                      onPage=Story.header_footer_first)
+    portrait_tpl = PageTemplate(id='Portrait', frames=[portrait_frame], pagesize=letter,
+                                onPage=Story.header_footer_rest)
+    landscape_first_tpl = PageTemplate(id='LandscapeFirst', frames=[landscape_frame], pagesize=to_landscape(letter),
+                                       onPage=Story.header_footer_first)
+    landscape_tpl = PageTemplate(id='Landscape', frames=[landscape_frame], pagesize=to_landscape(letter),
+                                 onPage=Story.header_footer_rest)
+
+    if detections_only:
+        # Make LandscapeFirst the default starting template
+        doc.addPageTemplates([
+            landscape_first_tpl,  # first page: landscape + first-page header/footer
+            landscape_tpl,        # subsequent pages in landscape
+            portrait_tpl,
+            portrait_first_tpl,
+        ])
+    else:
+        # Default is portrait; we'll switch to landscape only for the detections block
+        doc.addPageTemplates([
+            portrait_first_tpl,
+            portrait_tpl,
+            landscape_tpl,
+            landscape_first_tpl,
+        ])
+
+    if output is not None:
+        doc.build(story)
+        return None
+    try:
+        doc.build(story)
+        return pdf_buffer.getvalue()
+    finally:
+        pdf_buffer.close()
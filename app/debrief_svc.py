@@ -1,6 +1,12 @@
+import asyncio
 import logging
 
 from app.utility.base_service import BaseService
+from plugins.debrief.app.utility.d3_graph import D3Graph
+from plugins.debrief.app.utility.fact_detail import FactDetail
+from plugins.debrief.app.utility.operation_resolver import OperationResolver, OperationView
+from plugins.debrief.app.utility.run_grouping import group_runs
+from plugins.debrief.app.utility.subnets import SubnetIndex
 
 
 class DebriefService(BaseService):
@@ -11,167 +17,263 @@ class DebriefService(BaseService):
         self.data_svc = services.get('data_svc')
         self.log = logging.getLogger('debrief_svc')
 
-    async def build_steps_d3(self, operation_ids):
-        graph_output = dict(nodes=[], links=[])
-        id_store = dict(c2=0)
-        graph_output['nodes'].append(dict(name="C2 Server", type='c2', label='server', id=0, img='server',
-                                          attrs={k: v for k, v in self.get_config().items() if k.startswith('app.')}))
+    async def build_steps_d3(self, operation_ids, resolver=None):
+        return await self._collect(self.iter_steps_d3(operation_ids, resolver))
 
-        operations = []
-        for op_id in operation_ids:
-            matches = await self.data_svc.locate('operations', match=dict(id=op_id))
-            if matches:
-                operations.append(matches[0])
+    async def iter_steps_d3(self, operation_ids, resolver=None, graph=None):
+        graph = graph or D3Graph()
+        graph.add_node(dict(name="C2 Server", type='c2', label='server', id=0, img='server',
+                            attrs={k: v for k, v in self.get_config().items() if k.startswith('app.')}))
 
-        for operation in operations:
+        resolver = self._resolver(resolver)
+        for operation in await resolver.resolve(operation_ids):
             # Add operation node
-            graph_output['nodes'].append(dict(name=operation.name, type='operation', id=operation.id, img='operation',
-                                              timestamp=self._format_timestamp(operation.created)))
+            graph.add_node(dict(name=operation.name, type='operation', id=operation.id, img='operation',
+                                timestamp=self._format_timestamp(operation.created)))
 
             # Add agents for this operation
             agents = [x for x in operation.agents if x]
-            self._add_agents_to_d3(agents, id_store, graph_output)
+            self._add_agents_to_d3(agents, graph)
             for agent in agents:
-                graph_output['links'].append(dict(source=operation.id,
-                                                  target=id_store['agent' + agent.unique],
-                                                  type='has_agent'))
+                graph.add_link(operation.id, graph.id_of('agent' + agent.unique), 'has_agent')
 
             # Add steps
+            agents_by_paw = resolver.agents_by_paw(operation)
             previous_link_graph_id = None
             for link in operation.chain:
-                link_graph_id = id_store['link' + link.unique] = max(id_store.values()) + 1
+                link_graph_id = graph.allocate('link' + link.unique)
                 display_name = link.ability.name + (' (cleanup)' if link.cleanup else '')
-                graph_output['nodes'].append(dict(type='link', name='link:'+link.unique, id=link_graph_id,
-                                                  status=link.status, operation=operation.id, img=link.ability.tactic,
-                                                  attrs=dict(status=link.status, name=display_name),
-                                                  timestamp=self._format_timestamp(link.created)))
+                graph.add_node(dict(type='link', name='link:'+link.unique, id=link_graph_id,
+                                    status=link.status, operation=operation.id, img=link.ability.tactic,
+                                    attrs=dict(status=link.status, name=display_name),
+                                    timestamp=self._format_timestamp(link.created)))
 
                 if not previous_link_graph_id:
-                    graph_output['links'].append(dict(source=operation.id, target=link_graph_id, type='next_link'))
+                    graph.add_link(operation.id, link_graph_id, 'next_link')
                 else:
-                    graph_output['links'].append(dict(source=previous_link_graph_id, target=link_graph_id,
-                                                      type='next_link'))
+                    graph.add_link(previous_link_graph_id, link_graph_id, 'next_link')
                 previous_link_graph_id = link_graph_id
 
                 # Link the step to the corresponding agent
-                for agent in agents:
-                    if agent.paw == link.paw:
-                        graph_output['links'].append(dict(source=id_store['agent' + agent.unique], target=link_graph_id,
-                                                          type='next_link'))
+                agent = agents_by_paw.get(link.paw)
+                if agent:
+                    graph.add_link(graph.id_of('agent' + agent.unique), link_graph_id, 'next_link')
+                if graph.full:
+                    yield graph
+
+        yield graph
 
-        return graph_output
+    async def build_attackpath_d3(self, operation_ids, resolver=None):
+        return await self._collect(self.iter_attackpath_d3(operation_ids, resolver))
 
-    async def build_attackpath_d3(self, operation_ids):
-        graph_output = dict(nodes=[], links=[])
-        id_store = dict(c2=0)
-        graph_output['nodes'].append(dict(name="C2 Server", type='c2', label='server', id=0, img='server',
-                                          attrs={config: value for config, value in self.get_config().items() if
-                                                 config.startswith('app.')}))
+    async def iter_attackpath_d3(self, operation_ids, resolver=None, graph=None):
+        graph = graph or D3Graph()
+        graph.add_node(dict(name="C2 Server", type='c2', label='server', id=0, img='server',
+                            attrs={config: value for config, value in self.get_config().items() if
+                                   config.startswith('app.')}))
 
-        operations = [op for op_id in operation_ids for op in await self.data_svc.locate('operations',
-                                                                                         match=dict(id=op_id))]
+        resolver = self._resolver(resolver)
+        operations = await resolver.resolve(operation_ids)
+        links_by_id = resolver.link_index()
 
         agents = [x for xs in map(lambda o: o.agents, operations) for x in xs]
-        self._add_agents_to_d3(agents, id_store, graph_output)
+        self._add_agents_to_d3(agents, graph)
 
         for agent in agents:
             if agent.origin_link_id:
-                operation = await self.app_svc.find_op_with_link(agent.origin_link_id)
-                if operation in operations:
-                    link = next(lnk for lnk in operation.chain if lnk.id == agent.origin_link_id)
-                    link_graph_id = id_store['link' + link.unique] = max(id_store.values()) + 1
-                    graph_output['nodes'].append(dict(type='link', name=link.ability.technique_name, id=link_graph_id,
-                                                      status=link.status, operation=operation.id,
-                                                      img=link.ability.tactic,
-                                                      attrs=dict(status=link.status, name=link.ability.name),
-                                                      timestamp=self._format_timestamp(link.created)))
-                    graph_output['links'].append(dict(source=id_store['agent' + link.paw], target=link_graph_id,
-                                                      type='next_link'))
-                    graph_output['links'].append(dict(source=link_graph_id, target=id_store['agent' + agent.paw],
-                                                      type='next_link'))
-        return graph_output
-
-    async def build_fact_d3(self, operation_ids):
-        graph_output = dict(nodes=[], links=[])
-        id_store = dict(default=0)
-
-        for op_id in operation_ids:
-            operation = (await self.data_svc.locate('operations', match=dict(id=op_id)))[0]
-            graph_output['nodes'].append(dict(name=operation.name, type='operation', id=op_id, img='operation',
-                                              timestamp=self._format_timestamp(operation.created)))
+                operation, link = links_by_id.get(agent.origin_link_id, (None, None))
+                if link:
+                    link_graph_id = graph.allocate('link' + link.unique)
+                    graph.add_node(dict(type='link', name=link.ability.technique_name, id=link_graph_id,
+                                        status=link.status, operation=operation.id,
+                                        img=link.ability.tactic,
+                                        attrs=dict(status=link.status, name=link.ability.name),
+                                        timestamp=self._format_timestamp(link.created)))
+                    graph.add_link(graph.id_of('agent' + link.paw), link_graph_id, 'next_link')
+                    graph.add_link(link_graph_id, graph.id_of('agent' + agent.paw), 'next_link')
+            if graph.full:
+                yield graph
+        yield graph
+
+    async def build_fact_d3(self, operation_ids, resolver=None, detail=None):
+        return await self._collect(self.iter_fact_d3(operation_ids, resolver, detail=detail))
+
+    async def iter_fact_d3(self, operation_ids, resolver=None, graph=None, detail=None):
+        graph = graph or D3Graph()
+        detail = detail or FactDetail()
+
+        for operation in await self._resolver(resolver).resolve(operation_ids):
+            op_id = operation.id
+            graph.add_node(dict(name=operation.name, type='operation', id=op_id, img='operation',
+                                timestamp=self._format_timestamp(operation.created)))
             op_nodes, op_links = [], []
-            all_facts = await operation.all_facts()
-            for fact in all_facts:
-                id_store['fact' + fact.unique] = node_id = max(id_store.values()) + 1
+            source_facts = {self._fact_key(f) for f in operation.source.facts}
+            shown, clusters = detail.select(await operation.all_facts())
+            fact_ids = dict()
+            for fact in shown:
+                node_id = fact_ids[fact.unique] = graph.allocate('fact' + fact.unique)
                 node = dict(name=fact.trait, id=node_id, type='fact', operation=op_id,
                             attrs=self._get_pub_attrs(fact), img='fact',
                             timestamp=fact.created.strftime('%Y-%m-%dT%H:%M:%S'))
                 op_nodes.append(node)
+                # Fact nodes can be handed out right away; links wait for the nontargeted pass
+                graph.merge([node], [])
+                if graph.full:
+                    yield graph
 
-                if fact in operation.source.facts:
+                if self._fact_key(fact) in source_facts:
                     d3_link = dict(source=op_id, target=node_id, type='relationship')
                     op_links.append(d3_link)
 
+            for trait, facts in clusters.items():
+                node_id = graph.allocate()
+                node = dict(name=trait, id=node_id, type='fact_cluster', operation=op_id, img='fact',
+                            attrs=dict(trait=trait, count=len(facts)),
+                            timestamp=min(f.created for f in facts).strftime('%Y-%m-%dT%H:%M:%S'))
+                op_nodes.append(node)
+                graph.merge([node], [])
+                fact_ids.update((f.unique, node_id) for f in facts)
+                if any(self._fact_key(f) in source_facts for f in facts):
+                    op_links.append(dict(source=op_id, target=node_id, type='relationship'))
+                if graph.full:
+                    yield graph
+
             all_relationships = await operation.all_relationships()
             for relationship in all_relationships:
                 if relationship.edge and relationship.target.value:
-                    d3_link = dict(source=id_store.get('fact' + relationship.source.unique),
-                                   target=id_store.get('fact' + relationship.target.unique),
-                                   type='relationship')
+                    if detail.enabled:
+                        source = fact_ids.get(relationship.source.unique)
+                        target = fact_ids.get(relationship.target.unique)
+                        if source is None or target is None or source == target:
+                            continue
+                    else:
+                        source = graph.get('fact' + relationship.source.unique)
+                        target = graph.get('fact' + relationship.target.unique)
+                    d3_link = dict(source=source, target=target, type='relationship')
                     op_links.append(d3_link)
 
             self._link_nontargeted_facts(op_nodes, op_links, op_id)
 
-            graph_output['nodes'].extend([n for n in op_nodes if n not in graph_output['nodes']])
-            graph_output['links'].extend([lnk for lnk in op_links if lnk not in graph_output['links']])
+            graph.merge([], op_links if not clusters else self._unique_links(op_links))
+            if graph.full:
+                yield graph
+
+        yield graph
+
+    async def build_tactic_d3(self, operation_ids, resolver=None):
+        return await self._collect(self.iter_tactic_d3(operation_ids, resolver))
 
-        return graph_output
+    async def build_technique_d3(self, operation_ids, resolver=None):
+        return await self._collect(self.iter_technique_d3(operation_ids, resolver))
 
-    async def build_tactic_d3(self, operation_ids):
-        return await self._build_prop_d3(operation_ids, 'tactic')
+    def iter_tactic_d3(self, operation_ids, resolver=None, graph=None):
+        return self._iter_prop_d3(operation_ids, 'tactic', resolver, graph)
 
-    async def build_technique_d3(self, operation_ids):
-        return await self._build_prop_d3(operation_ids, 'technique_name')
+    def iter_technique_d3(self, operation_ids, resolver=None, graph=None):
+        return self._iter_prop_d3(operation_ids, 'technique_name', resolver, graph)
 
-    async def _build_prop_d3(self, operation_ids, prop):
-        graph_output = dict(nodes=[], links=[])
-        id_store = dict(default=0)
+    async def _iter_prop_d3(self, operation_ids, prop, resolver=None, graph=None):
+        graph = graph or D3Graph()
 
-        for op_id in operation_ids:
-            operation = (await self.data_svc.locate('operations', match=dict(id=op_id)))[0]
-            graph_output['nodes'].append(dict(name=operation.name, type='operation', id=op_id, img='operation',
-                                              timestamp=self._format_timestamp(operation.created)))
+        for operation in await self._resolver(resolver).resolve(operation_ids):
+            op_id = operation.id
+            graph.add_node(dict(name=operation.name, type='operation', id=op_id, img='operation',
+                                timestamp=self._format_timestamp(operation.created)))
             previous_prop_graph_id = None
             if len(operation.chain) > 0:
                 for p, lnks in self._get_by_prop_order(operation.chain, prop):
-                    i = max(id_store.values()) + 1
-                    prop_graph_id = id_store[prop + p + str(i)] = i
+                    prop_graph_id = graph.allocate()
                     p_attrs = {prop: p}
                     p_attrs.update({lnk.unique: lnk.ability.name for lnk in lnks})
-                    graph_output['nodes'].append(dict(type=prop, name=p, id=prop_graph_id, operation=op_id,
-                                                      attrs=p_attrs, img=p,
-                                                      timestamp=self._format_timestamp(lnks[0].created)))
+                    graph.add_node(dict(type=prop, name=p, id=prop_graph_id, operation=op_id,
+                                        attrs=p_attrs, img=p,
+                                        timestamp=self._format_timestamp(lnks[0].created)))
 
                     if not previous_prop_graph_id:
-                        graph_output['links'].append(dict(source=op_id, target=prop_graph_id, type='next_link'))
+                        graph.add_link(op_id, prop_graph_id, 'next_link')
                     else:
-                        graph_output['links'].append(
-                            dict(source=previous_prop_graph_id, target=prop_graph_id, type='next_link'))
+                        graph.add_link(previous_prop_graph_id, prop_graph_id, 'next_link')
                     previous_prop_graph_id = prop_graph_id
-        return graph_output
+                    if graph.full:
+                        yield graph
+        yield graph
 
     @staticmethod
-    def _add_agents_to_d3(agents, id_store, graph_output):
+    async def _collect(graph_iter):
+        """Run a graph generator to the end and return the whole graph."""
+        graph = None
+        async for graph in graph_iter:
+            pass
+        return graph.output()
+
+    async def build_graph_delta(self, builder, operation_ids, cursor, count_facts=False):
+        """Run a graph builder and return only what changed since ``cursor``.
+
+        The cursor is the opaque token returned by the previous call: per operation, the
+        number of links, facts and agents the client has already received. Both the current
+        and the previously sent graph are rebuilt from views of the operations cut off at
+        those counts, and the result carries new or updated nodes, new links and the next
+        cursor. If node ids shifted in between (e.g. a new agent joined), the full graph is
+        returned with ``reset`` set so the client can start over.
+        """
+        operations = await self._resolver().resolve(operation_ids)
+        positions = dict()
+        for operation in operations:
+            facts = len(await operation.all_facts()) if count_facts else 0
+            positions[str(operation.id)] = (len(operation.chain or []), facts, len(operation.agents or []))
+
+        current = await builder(operation_ids, resolver=self._resolver_at(operations, positions))
+        next_cursor = self._encode_graph_cursor(positions)
+        seen = self._parse_graph_cursor(cursor)
+        if seen is None:
+            return dict(current, cursor=next_cursor, reset=True)
+
+        previous = await builder(operation_ids, resolver=self._resolver_at(operations, seen))
+        previous_nodes = {n['id']: n for n in previous['nodes']}
+        current_nodes = {n['id']: n for n in current['nodes']}
+        for node_id, node in previous_nodes.items():
+            match = current_nodes.get(node_id)
+            if not match or (match['type'], match['name']) != (node['type'], node['name']):
+                return dict(current, cursor=next_cursor, reset=True)
+
+        previous_links = {D3Graph.link_key(lnk) for lnk in previous['links']}
+        return dict(nodes=[n for n in current['nodes'] if previous_nodes.get(n['id']) != n],
+                    links=[lnk for lnk in current['links'] if D3Graph.link_key(lnk) not in previous_links],
+                    cursor=next_cursor, reset=False)
+
+    @staticmethod
+    def _resolver_at(operations, positions):
+        return OperationResolver.from_operations(
+            [OperationView(op, *positions.get(str(op.id), (0, 0, 0))) for op in operations])
+
+    @staticmethod
+    def _encode_graph_cursor(positions):
+        return ','.join(f'{op_id}:{links}:{facts}:{agents}' for op_id, (links, facts, agents) in positions.items())
+
+    @staticmethod
+    def _parse_graph_cursor(cursor):
+        """Return ``{op_id: (links, facts, agents)}`` for a cursor token, or None if it is empty or malformed."""
+        positions = dict()
+        for entry in (cursor or '').split(','):
+            parts = entry.rsplit(':', 3)
+            if len(parts) != 4 or not all(p.isdigit() for p in parts[1:]):
+                return None
+            positions[parts[0]] = tuple(int(p) for p in parts[1:])
+        return positions
+
+    def _resolver(self, resolver=None):
+        return resolver or OperationResolver(self.data_svc, snapshot=True)
+
+    @staticmethod
+    def _add_agents_to_d3(agents, graph):
         for agent in agents:
-            if 'agent' + agent.unique not in id_store.keys():
-                id_store['agent' + agent.unique] = max(id_store.values()) + 1
-                node = dict(name=f'{agent.paw} ({agent.display_name})', id=id_store['agent' + agent.unique], group=agent.group,
+            agent_graph_id, created = graph.intern('agent' + agent.unique)
+            if created:
+                node = dict(name=f'{agent.paw} ({agent.display_name})', id=agent_graph_id, group=agent.group,
                             type='agent', img=agent.platform, timestamp=agent.created.strftime('%Y-%m-%dT%H:%M:%S'),
                             attrs=dict(host=agent.host, group=agent.group, platform=agent.platform, paw=agent.paw))
-                graph_output['nodes'].append(node)
-
-                link = dict(source=0, target=id_store['agent' + agent.unique], type='agent_contact')
-                graph_output['links'].append(link)
+                graph.add_node(node)
+                graph.add_link(0, agent_graph_id, 'agent_contact')
 
     @staticmethod
     def generate_ttps(operations, key_by_tid=False):
@@ -221,15 +323,7 @@ class DebriefService(BaseService):
 
     @staticmethod
     def _get_by_prop_order(chain, prop):
-        current = getattr(chain[0].ability, prop)
-        ordered = [(current, [chain[0]])]
-        for lnk in chain[1:]:
-            if getattr(lnk.ability, prop) != current and lnk.cleanup == 0:
-                current = getattr(lnk.ability, prop)
-                ordered.append((current, [lnk]))
-            else:
-                next(p for p in ordered if p[0] == current)[1].append(lnk)
-        return ordered
+        return group_runs(chain, key=lambda lnk: getattr(lnk.ability, prop), starts_run=lambda lnk: lnk.cleanup == 0)
 
     @staticmethod
     def _format_timestamp(timestamp):
@@ -237,19 +331,26 @@ class DebriefService(BaseService):
 
     @staticmethod
     def _link_nontargeted_facts(op_nodes, op_links, op_id):
+        targeted = {lnk['target'] for lnk in op_links}
         for n in op_nodes:
-            target_links = [lnk for lnk in op_links if lnk['target'] == n['id']]
-            if not target_links:
+            if n['id'] not in targeted:
                 d3_link = dict(source=op_id, target=n['id'], type='relationship')
                 op_links.append(d3_link)
+                targeted.add(n['id'])
+
+    @staticmethod
+    def _unique_links(links):
+        return list({D3Graph.link_key(lnk): lnk for lnk in links}.values())
+
+    @staticmethod
+    def _fact_key(fact):
+        # Caldera facts compare equal on unique and source
+        return fact.unique, getattr(fact, 'source', None)
 
-    async def build_topology(self, operation_ids):
+    async def build_topology(self, operation_ids, resolver=None):
         """Build network topology data: hosts, subnets, edges, steps grouped by host."""
-        operations = []
-        for op_id in operation_ids:
-            matches = await self.data_svc.locate('operations', match=dict(id=op_id))
-            if matches:
-                operations.append(matches[0])
+        resolver = self._resolver(resolver)
+        operations = await resolver.resolve(operation_ids)
 
         hosts = {}       # keyed by agent paw or discovered-ip
         edges = []
@@ -259,8 +360,7 @@ class DebriefService(BaseService):
         # --- Compromised hosts (agents) ---
         paw_to_host = {}
         for op in operations:
-            for agent in (op.agents or []):
-                paw = agent.paw
+            for paw, agent in resolver.agents_by_paw(op).items():
                 if paw in hosts:
                     continue
                 ips = list(getattr(agent, 'host_ip_addrs', []) or [])
@@ -302,8 +402,7 @@ class DebriefService(BaseService):
         replay_sequence = []  # ordered list of {paw, step, index}
 
         for op in operations:
-            for agent in (op.agents or []):
-                paw = agent.paw
+            for paw in resolver.agents_by_paw(op):
                 if paw not in steps_by_host:
                     steps_by_host[paw] = []
 
@@ -326,7 +425,7 @@ class DebriefService(BaseService):
                     command=link.command,
                 )
                 steps_by_host[paw].append(step_data)
-                replay_sequence.append(dict(paw=paw, step=step_data, index=step_idx))
+                replay_sequence.append(dict(paw=paw, step=step_data, index=step_idx, operation=str(op.id)))
                 step_idx += 1
                 if paw in hosts:
                     hosts[paw]['step_count'] = len(steps_by_host[paw])
@@ -334,11 +433,12 @@ class DebriefService(BaseService):
         # --- Build edges from chain order + origin_link_id ---
         # First: explicit lateral movement via origin_link_id
         agents_with_origin = set()
+        links_by_id = resolver.link_index()
         for op in operations:
-            for agent in (op.agents or []):
+            for agent in resolver.agents_by_paw(op).values():
                 if agent.origin_link_id:
-                    origin_link = next((lnk for lnk in op.chain if lnk.id == agent.origin_link_id), None)
-                    if origin_link:
+                    origin_op, origin_link = links_by_id.get(agent.origin_link_id, (None, None))
+                    if origin_op is op:
                         source_paw = origin_link.paw
                         if source_paw in hosts:
                             hosts[agent.paw]['origin_agent'] = source_paw
@@ -393,30 +493,13 @@ class DebriefService(BaseService):
                             command='',
                         ),
                         index=i,
+                        operation=None,
                     ))
 
         # --- Discovered hosts (from operation facts + knowledge svc) ---
         discovered_ips = set()
-        knowledge_svc = self.services.get('knowledge_svc')
-        for op in operations:
-            all_facts = list(await op.all_facts())
-            # Also query knowledge_svc for facts in the operation's source
-            source = getattr(op, 'source', None)
-            source_id = str(getattr(source, 'id', '')) if source else ''
-            if knowledge_svc and source_id:
-                try:
-                    kb_facts = await knowledge_svc.get_facts(
-                        criteria=dict(source=source_id, trait='remote.host.ip')
-                    )
-                    for kf in (kb_facts or []):
-                        all_facts.append(kf)
-                    kb_fqdn = await knowledge_svc.get_facts(
-                        criteria=dict(source=source_id, trait='remote.host.fqdn')
-                    )
-                    for kf in (kb_fqdn or []):
-                        all_facts.append(kf)
-                except Exception:
-                    pass
+        facts_by_op = await asyncio.gather(*(self._get_topology_facts(op) for op in operations))
+        for all_facts in facts_by_op:
             for fact in all_facts:
                 trait = getattr(fact, 'trait', '') or ''
                 value = str(getattr(fact, 'value', '') or '')
@@ -451,29 +534,28 @@ class DebriefService(BaseService):
 
         # --- Build subnets from IPs ---
         # Each host goes in ONE subnet only (its primary/first non-docker IP).
-        # Docker bridge IPs (172.17-31.x.x) are deprioritized.
+        # Docker bridge IPs (172.16.0.0/12) are deprioritized.
         subnet_map = {}  # cidr -> set of host_ids
         assigned_hosts = set()
 
+        subnet_index = self._subnet_index()
         for host_id, host in hosts.items():
             if host_id == 'c2':
                 continue
             ips = host.get('ips') or []
-            # Pick best IP: prefer non-172.1x (non-Docker bridge) IPs
+            # Pick best IP: prefer non-Docker bridge IPs
             primary_ip = None
             for ip in ips:
-                subnet = self._ip_to_subnet(ip)
-                if subnet and not ip.startswith('172.'):
+                if subnet_index.subnet_of(ip) and not subnet_index.is_docker_bridge(ip):
                     primary_ip = ip
                     break
             if not primary_ip:
                 for ip in ips:
-                    subnet = self._ip_to_subnet(ip)
-                    if subnet:
+                    if subnet_index.subnet_of(ip):
                         primary_ip = ip
                         break
             if primary_ip:
-                subnet_cidr = self._ip_to_subnet(primary_ip)
+                subnet_cidr = subnet_index.subnet_of(primary_ip)
                 subnet_map.setdefault(subnet_cidr, set()).add(host_id)
                 assigned_hosts.add(host_id)
                 # Store primary IP on host for display
@@ -489,7 +571,7 @@ class DebriefService(BaseService):
             if host_id == 'c2':
                 continue
             for ip in (host.get('ips') or []):
-                subnet_cidr = self._ip_to_subnet(ip)
+                subnet_cidr = subnet_index.subnet_of(ip)
                 if subnet_cidr and subnet_cidr not in subnet_map:
                     subnet_map[subnet_cidr] = set()  # empty subnet — visible but no hosts
 
@@ -501,7 +583,7 @@ class DebriefService(BaseService):
             paw = item['paw']
             host = hosts.get(paw)
             if host and host.get('primary_ip'):
-                cidr = self._ip_to_subnet(host['primary_ip'])
+                cidr = subnet_index.subnet_of(host['primary_ip'])
                 if cidr and cidr not in seen_subnets:
                     subnet_order.append(cidr)
                     seen_subnets.add(cidr)
@@ -523,18 +605,15 @@ class DebriefService(BaseService):
             if e['target'] != 'c2':
                 parent_map[e['target']] = e['source']
 
-        path_to_c2 = {}
-        for host_id in hosts:
-            if host_id == 'c2':
-                continue
-            path = [host_id]
-            current = host_id
-            visited = set()
-            while current in parent_map and current not in visited:
-                visited.add(current)
-                current = parent_map[current]
-                path.append(current)
-            path_to_c2[host_id] = path  # e.g. ['db01', 'dc01', 'proxy01', 'web01', 'c2']
+        path_to_c2 = self._paths_to_c2([host_id for host_id in hosts if host_id != 'c2'], parent_map)
+        # e.g. path_to_c2['db01'] == ['db01', 'dc01', 'proxy01', 'web01', 'c2']
+
+        # Depth (hops to C2, None if the host does not reach it) and subtree size (hosts that
+        # beacon through this one, itself included) for the beacon animation
+        depth, subtree_size = self._beacon_tree(hosts, parent_map)
+        for host_id, host in hosts.items():
+            host['depth'] = depth[host_id]
+            host['subtree_size'] = subtree_size[host_id]
 
         return dict(
             subnets=subnets,
@@ -545,13 +624,232 @@ class DebriefService(BaseService):
             path_to_c2=path_to_c2,
         )
 
+    async def fingerprint(self, operations, knowledge=False):
+        """Return a cheap value that changes whenever the operations' graphs, topology or report could.
+
+        Per operation it covers the name, state and other settings the report shows, chain length,
+        each link's status, how many links finished and the last finish time, how many facts and
+        relationships the links collected, the number of facts in the source and the agents'
+        reported attributes; no facts are loaded. With ``knowledge`` set it
+        also counts the knowledge store's remote host facts for the operation's source, which the
+        topology reads.
+        """
+        fingerprint = []
+        for op in operations:
+            chain = op.chain or []
+            finished = [lnk.finish for lnk in chain if lnk.finish]
+            fingerprint.append((str(op.id), getattr(op, 'state', None), self._operation_fingerprint(op),
+                                len(chain), tuple(self._link_fingerprint(lnk) for lnk in chain), len(finished),
+                                max(finished, default=None),
+                                sum(len(getattr(lnk, 'facts', None) or []) for lnk in chain),
+                                sum(len(getattr(lnk, 'relationships', None) or []) for lnk in chain),
+                                len(getattr(getattr(op, 'source', None), 'facts', None) or []),
+                                tuple(self._agent_fingerprint(agent) for agent in op.agents or [])))
+        if knowledge:
+            kb_facts = await asyncio.gather(*(self._get_remote_host_facts(op) for op in operations))
+            fingerprint = [entry + (len(facts),) for entry, facts in zip(fingerprint, kb_facts)]
+        return tuple(fingerprint)
+
     @staticmethod
-    def _ip_to_subnet(ip_str):
-        """Convert an IP string to a /24 subnet string."""
+    def diff_topology(previous, current):
+        """Return what ``current`` adds to or changes in ``previous``, or None if that needs a full reload.
+
+        Replay entries are identified by their operation and their index within it, so steps added
+        to any operation show up as new entries whatever their position in the whole sequence; sent
+        ones that changed (a step that completed) are listed in ``replay_updates`` with their
+        ``operation`` and ``index``. Hosts, subnets and paths to C2 are sent when new or changed, and
+        ``subnet_order`` when the subnet order changed. Edges are only ever added. A removed host,
+        edge or replay entry cannot be expressed as an update.
+        """
+        prev_replay = {DebriefService._replay_key(e): e for e in previous['replay_sequence']}
+        replay = [(DebriefService._replay_key(e), e) for e in current['replay_sequence']]
+        if not prev_replay.keys() <= {key for key, _ in replay} or \
+                not previous['hosts'].keys() <= current['hosts'].keys():
+            return None
+        prev_edges = {DebriefService._edge_key(e) for e in previous['edges']}
+        edges = [(DebriefService._edge_key(e), e) for e in current['edges']]
+        if not prev_edges <= {key for key, _ in edges}:
+            return None
+
+        prev_subnets = {s['cidr']: s for s in previous['subnets']}
+        subnet_order = [s['cidr'] for s in current['subnets']]
+        return dict(
+            replay_sequence=[entry for key, entry in replay if key not in prev_replay],
+            replay_updates=[dict(operation=key[0], index=key[1], entry=entry) for key, entry in replay
+                            if key in prev_replay and prev_replay[key] != entry],
+            hosts={host_id: host for host_id, host in current['hosts'].items()
+                   if previous['hosts'].get(host_id) != host},
+            edges=[e for key, e in edges if key not in prev_edges],
+            subnets=[s for s in current['subnets'] if prev_subnets.get(s['cidr']) != s],
+            subnet_order=subnet_order if subnet_order != list(prev_subnets) else [],
+            path_to_c2={host_id: path for host_id, path in current['path_to_c2'].items()
+                        if previous['path_to_c2'].get(host_id) != path},
+        )
+
+    # Operation and link attributes shown in the report and the steps graph
+    _OPERATION_FIELDS = ('name', 'start', 'finish', 'jitter', 'autonomous', 'auto_close', 'visibility',
+                         'obfuscator', 'group', 'use_learning_parsers')
+    _LINK_FIELDS = ('status', 'pid', 'score')
+
+    @classmethod
+    def _operation_fingerprint(cls, op):
+        return tuple(str(getattr(op, field, None)) for field in cls._OPERATION_FIELDS) + \
+            (str(getattr(getattr(op, 'adversary', None), 'adversary_id', None)),
+             str(getattr(getattr(op, 'planner', None), 'id', None)),
+             str(getattr(getattr(op, 'objective', None), 'id', None)))
+
+    @classmethod
+    def _link_fingerprint(cls, link):
+        return tuple(getattr(link, field, None) for field in cls._LINK_FIELDS)
+
+    # Agent attributes shown in the topology, graphs and report sections
+    _AGENT_FIELDS = ('paw', 'host', 'platform', 'username', 'privilege', 'trusted', 'group', 'architecture',
+                     'exe_name', 'contact', 'origin_link_id')
+
+    @classmethod
+    def _agent_fingerprint(cls, agent):
+        return tuple(str(getattr(agent, field, None)) for field in cls._AGENT_FIELDS) + \
+            (tuple(getattr(agent, 'host_ip_addrs', None) or ()), bool(getattr(agent, 'proxy_receivers', None)))
+
+    @staticmethod
+    def _replay_key(entry):
+        return entry.get('operation'), entry['index']
+
+    @staticmethod
+    def _edge_key(edge):
+        return edge['source'], edge['target'], edge['type'], edge.get('technique')
+
+    @staticmethod
+    def _paths_to_c2(host_ids, parent_map):
+        """Return ``{host_id: path}`` following ``parent_map`` from each host towards C2.
+
+        A path ends at a node without a parent or, on a cycle, with the first node seen twice.
+        Every node's path is computed once and reused by the hosts behind it, so shared
+        suffixes are not walked again.
+        """
+        paths = dict()
+        for start in host_ids:
+            walk, position = [], dict()
+            node = start
+            while node not in paths and node not in position:
+                position[node] = len(walk)
+                walk.append(node)
+                if node not in parent_map:
+                    paths[node] = [node]
+                    break
+                node = parent_map[node]
+            if node in position and node not in paths:
+                loop = walk[position[node]:]
+                for i, member in enumerate(loop):
+                    paths[member] = loop[i:] + loop[:i] + [member]
+            for node in reversed(walk):
+                if node not in paths:
+                    paths[node] = [node] + paths[parent_map[node]]
+        return {host_id: paths[host_id] for host_id in host_ids}
+
+    @staticmethod
+    def _beacon_tree(host_ids, parent_map, root='c2'):
+        """Return ``(depth, subtree_size)`` for ``host_ids`` following ``parent_map`` towards ``root``.
+
+        ``depth`` is the number of hops to ``root``, None for hosts that do not reach it.
+        ``subtree_size`` counts the hosts other than ``root`` whose path to C2 passes through a
+        host, plus one for the host itself; every host that ends up on a cycle is passed through
+        by everything leading into it. Each node is visited a constant number of times.
+        """
+        host_ids = list(host_ids)
+        hops, end, cycles = dict(), dict(), []
+        for start in host_ids:
+            walk, position = [], dict()
+            node = start
+            while node not in hops and node not in position:
+                position[node] = len(walk)
+                walk.append(node)
+                if node not in parent_map:
+                    hops[node], end[node] = 0, node
+                    break
+                node = parent_map[node]
+            if node in position and node not in hops:
+                cycles.append(walk[position[node]:])
+                for member in cycles[-1]:
+                    hops[member], end[member] = 0, None
+            for node in reversed(walk):
+                if node not in hops:
+                    hops[node], end[node] = hops[parent_map[node]] + 1, end[parent_map[node]]
+
+        # Hosts beyond each node, added to the node's parent level by level from the deepest
+        known = set(host_ids)
+        weight = {node: int(node in known and node != root) for node in hops}
+        beyond = dict(weight)
+        levels = [[] for _ in range(max(hops.values(), default=0) + 1)]
+        for node, level in hops.items():
+            levels[level].append(node)
+        for level in reversed(levels[1:]):
+            for node in level:
+                beyond[parent_map[node]] += beyond[node]
+        for cycle in cycles:
+            total = sum(beyond[member] for member in cycle)
+            for member in cycle:
+                beyond[member] = total
+
+        depth = {host_id: hops[host_id] if end[host_id] == root else None for host_id in host_ids}
+        subtree_size = {host_id: 1 + beyond[host_id] - weight[host_id] for host_id in host_ids}
+        return depth, subtree_size
+
+    _REMOTE_HOST_TRAITS = ('remote.host.ip', 'remote.host.fqdn')
+
+    async def _get_topology_facts(self, operation):
+        """Return an operation's facts plus the knowledge store's remote host facts for its source.
+
+        Both are fetched concurrently, the knowledge store in a single query for all remote host
+        traits, and facts already known to the operation are not repeated.
+        """
+        op_facts, kb_facts = await asyncio.gather(operation.all_facts(), self._get_remote_host_facts(operation))
+        all_facts = list(op_facts)
+        seen = {self._fact_identity(f) for f in all_facts}
+        for fact in kb_facts:
+            identity = self._fact_identity(fact)
+            if identity not in seen:
+                seen.add(identity)
+                all_facts.append(fact)
+        return all_facts
+
+    async def _get_remote_host_facts(self, operation):
+        knowledge_svc = self.services.get('knowledge_svc')
+        source = getattr(operation, 'source', None)
+        source_id = str(getattr(source, 'id', '')) if source else ''
+        if not (knowledge_svc and source_id):
+            return []
         try:
-            parts = ip_str.strip().split('.')
-            if len(parts) == 4 and all(p.isdigit() and 0 <= int(p) <= 255 for p in parts):
-                return f'{parts[0]}.{parts[1]}.{parts[2]}.0/24'
-        except (ValueError, AttributeError):
-            pass
-        return None
+            return list(await knowledge_svc.get_facts(
+                criteria=dict(source=source_id, trait=self._REMOTE_HOST_TRAITS)) or [])
+        except Exception:
+            return []
+
+    @staticmethod
+    def _fact_identity(fact):
+        unique = getattr(fact, 'unique', None)
+        return unique if unique is not None else (getattr(fact, 'trait', None), str(getattr(fact, 'value', '')))
+
+    def _subnet_index(self):
+        """Return a subnet index configured from the debrief topology settings."""
+        prefixes = dict()
+        for version, default, width in ((4, 24, 32), (6, 64, 128)):
+            prefix = self.get_config(prop=f'topology_subnet_prefix_v{version}', name='debrief')
+            if prefix is None:
+                prefix = default
+            elif isinstance(prefix, bool) or not isinstance(prefix, int) or not 0 <= prefix <= width:
+                self.log.warning('Ignoring invalid topology_subnet_prefix_v%d %r, using /%d', version, prefix, default)
+                prefix = default
+            prefixes[f'prefix_v{version}'] = prefix
+        subnet_index = SubnetIndex(**prefixes)
+        for network in self.get_config(prop='topology_subnets', name='debrief') or []:
+            try:
+                subnet_index.add(network)
+            except ValueError:
+                self.log.warning('Ignoring invalid topology subnet: %r', network)
+        return subnet_index
+
+    @staticmethod
+    def _ip_to_subnet(ip_str):
+        """Convert an IP string to its default subnet string (/24 for IPv4, /64 for IPv6)."""
+        return SubnetIndex().subnet_of(ip_str)
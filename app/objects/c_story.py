@@ -1,5 +1,6 @@
 import html
 import os
+import re
 
 from lxml import etree as ET
 from reportlab.lib import colors
@@ -7,6 +8,8 @@ from reportlab.lib.styles import ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.platypus import Paragraph, Spacer, PageBreak, Image
 
+from plugins.debrief.app.utility.text_cell import TextCell
+
 
 class Story:
     _header_logo_path = None
@@ -29,6 +32,15 @@ class Story:
     def set_header_logo_path(header_logo_path):
         Story._header_logo_path = header_logo_path
 
+    @staticmethod
+    def _doc_header_logo_path(doc):
+        """Return the header logo of the document being built, falling back to the shared one.
+
+        Documents rendered concurrently carry their own ``header_logo_path`` so one request
+        cannot swap the logo of another.
+        """
+        return getattr(doc, 'header_logo_path', Story._header_logo_path)
+
     @staticmethod
     def _page_margins(canvas, doc):
         """Return (left, right, top, bottom) margins appropriate for the current page.
@@ -64,8 +76,9 @@ class Story:
             header_y = page_h - tm + im.drawHeight / 2
             im.drawOn(canvas, lm, page_h - tm)
 
-            if Story._header_logo_path:
-                Story.draw_header_logo(canvas, doc, Story._header_logo_path)
+            header_logo_path = Story._doc_header_logo_path(doc)
+            if header_logo_path:
+                Story.draw_header_logo(canvas, doc, header_logo_path)
 
             canvas.setStrokeColor(colors.maroon)
             canvas.setLineWidth(4)
@@ -89,8 +102,9 @@ class Story:
         # Header — skip entirely on landscape pages (18pt margin too narrow)
         is_landscape = page_w > page_h
         if not is_landscape:
-            if Story._header_logo_path:
-                Story.draw_header_logo(canvas, doc, Story._header_logo_path)
+            header_logo_path = Story._doc_header_logo_path(doc)
+            if header_logo_path:
+                Story.draw_header_logo(canvas, doc, header_logo_path)
             # Portrait pages have room for the full header
             header_y = page_h - tm * 0.75
             canvas.setFillColor(colors.maroon)
@@ -213,10 +227,14 @@ class Story:
             svg.write(f)
 
     _TABLE_STYLE = ParagraphStyle(name='Table', fontSize=8, wordWrap='CJK')
+    _MARKUP = re.compile('[<&]')
 
     @staticmethod
-    def get_table_object(val, escape_html=True):
+    def get_table_object(val, escape_html=True, plain_text=False):
         style = Story._TABLE_STYLE
+        if plain_text and type(val) is str and (escape_html or not Story._MARKUP.search(val)):
+            # Text with no markup to honour is laid out without a Paragraph
+            return TextCell(val, style)
         if type(val) is str:
             escaped = html.escape(val) if escape_html else val
             return Paragraph(escaped, style)
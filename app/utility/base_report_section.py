@@ -1,3 +1,6 @@
+import asyncio
+from functools import partial
+
 from reportlab.lib import colors
 from reportlab.lib.units import inch
 from reportlab.platypus import Image, Paragraph, Spacer, Table, TableStyle
@@ -5,6 +8,10 @@ from reportlab.platypus.flowables import KeepTogetherSplitAtTop
 from svglib.svglib import svg2rlg
 
 from plugins.debrief.app.objects.c_story import Story
+from plugins.debrief.app.utility import graph_layout
+from plugins.debrief.app.utility.chunked_table import CHUNK_ROWS, ChunkedTable
+from plugins.debrief.app.utility.operation_resolver import OperationResolver
+from plugins.debrief.app.utility.text_cell import TextCell
 from plugins.debrief.attack_mapper import get_attack18
 
 # Available content width for portrait pages (letter 8.5" - 2×0.75" margins)
@@ -12,6 +19,11 @@ PORTRAIT_CONTENT_WIDTH = 7.0 * inch
 
 
 class BaseReportSection:
+    cacheable = True  # whether renders may reuse this section's flowables, see cache_key()
+    cache_flags = ()  # selected sections that change this section's output
+    graph_type = None  # set by graph sections, see generate_graph_section_flowables()
+    graph_options = None  # keyword arguments of the graph section's debrief_svc builder
+
     _status_names = {
         0: 'success',
         -2: 'discarded',
@@ -29,6 +41,45 @@ class BaseReportSection:
         self.section_title = 'BASE SECTION HEADER'
         self._a18 = get_attack18()  # lazy-loaded ATT&CK v18 index
 
+    def cache_key(self, **kwargs):
+        """Return what the section's output depends on besides its operations, or None if it must not be reused.
+
+        Graph sections only qualify when they are drawn server-side; the SVG uploaded by the
+        browser differs from one download to the next.
+        """
+        if not self.cacheable:
+            return None
+        if self.graph_type and not (kwargs.get('debrief_svc') and graph_layout.available()):
+            return None
+        selected = kwargs.get('selected_sections') or ()
+        return tuple(flag in selected for flag in self.cache_flags)
+
+    async def uses_uploaded_graph(self, **kwargs):
+        """Return whether this graph section would draw the browser's SVG rather than lay its graph out."""
+        return bool(self.graph_type) and \
+            await self.build_server_graph(self.graph_type, self.graph_options, **kwargs) is None
+
+    @staticmethod
+    async def in_executor(func, *args, **kwargs):
+        """Run the CPU-bound ``func``, such as building a table, on the loop's default executor.
+
+        Sections are generated concurrently; this keeps their table building off the event loop
+        so the other sections, and other requests, make progress meanwhile.
+        """
+        return await asyncio.get_running_loop().run_in_executor(None, partial(func, *args, **kwargs))
+
+    @staticmethod
+    async def build_server_graph(graph_type, graph_options=None, **kwargs):
+        """Return the graph of ``graph_type`` to lay out server-side, or None if that is not possible."""
+        operations = kwargs.get('operations') or []
+        debrief_svc = kwargs.get('debrief_svc')
+        if not (debrief_svc and operations and graph_layout.available()):
+            return None
+        builder = getattr(debrief_svc, f'build_{graph_type}_d3')
+        graph = await builder([op.id for op in operations], resolver=OperationResolver.from_operations(operations),
+                              **(graph_options or {}))
+        return graph if graph_layout.can_layout(graph) else None
+
     def generate_section_title_and_description(self, styles):
         """Return grouped flowable containing section title and description."""
 
@@ -48,6 +99,31 @@ class BaseReportSection:
             self.generate_graph(graph_path, graph_width)
         ])
 
+    async def generate_graph_section_flowables(self, styles, graph_type, graph_width, graph_options=None, **kwargs):
+        """Return the graph section flowables, laid out server-side when possible.
+
+        With a ``debrief_svc`` and NumPy available the graph is built from the selected operations
+        and drawn directly, so identical inputs give identical pages. Otherwise, or when the graph
+        has too many nodes to lay out, the SVG uploaded by the browser for ``graph_type`` is used,
+        if any; the table sections still cover the same data.
+        """
+        graph = await self.build_server_graph(graph_type, graph_options, **kwargs)
+        if graph is not None:
+            # The layout is CPU-bound, keep it off the event loop
+            drawing = await asyncio.get_running_loop().run_in_executor(None, graph_layout.render_graph,
+                                                                       graph, graph_width)
+            return [self.group_elements([
+                Paragraph(self.section_title, styles['Heading2']),
+                Paragraph(self.description, styles['Normal']),
+                Spacer(1, 10),
+                drawing
+            ])]
+        path = kwargs.get('graph_files', {}).get(graph_type)
+        if path:
+            # Keep the title, description, and graph grouped together to avoid page break in the middle.
+            return [self.generate_grouped_graph_section_flowables(styles, path, graph_width)]
+        return []
+
     @staticmethod
     def group_elements(flowable_list):
         """Group flowables together to avoid page breaks in the middle."""
@@ -62,19 +138,19 @@ class BaseReportSection:
         return Image(graph, width=width, height=(width * aspect))
 
     @staticmethod
-    def generate_table(data, col_widths, escape_html=True):
-        # Preserve pre-built Paragraph objects (e.g. cells with intentional markup)
+    def generate_table(data, col_widths, escape_html=True, plain_text=False):
+        # Preserve pre-built Paragraph objects (e.g. cells with intentional markup); with
+        # plain_text, string cells without markup are drawn as TextCells instead of Paragraphs
         processed_rows = []
         for row in data[1:]:
             processed_row = []
             for val in row:
-                if isinstance(val, Paragraph):
+                if isinstance(val, (Paragraph, TextCell)):
                     processed_row.append(val)
                 else:
-                    processed_row.append(Story.get_table_object(val, escape_html=escape_html))
+                    processed_row.append(Story.get_table_object(val, escape_html=escape_html, plain_text=plain_text))
             processed_rows.append(processed_row)
         data[1:] = processed_rows
-        tbl = Table(data, colWidths=col_widths, repeatRows=1)
         style_cmds = [
             ('BACKGROUND', (0, 0), (-1, 0), colors.maroon),
             ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
@@ -92,6 +168,10 @@ class BaseReportSection:
             ('BOX', (0, 0), (-1, -1), 0.5, colors.black),
             ('LINEAFTER', (0, 0), (0, -1), 2, colors.maroon),
         ]
+        if len(data) - 1 > CHUNK_ROWS:
+            return ChunkedTable(data, col_widths, style_cmds, header_rows=1,
+                                row_backgrounds=[colors.whitesmoke, colors.lightgrey])
+        tbl = Table(data, colWidths=col_widths, repeatRows=1)
         for each in range(1, len(data)):
             bg_color = colors.lightgrey if each % 2 == 0 else colors.whitesmoke
             style_cmds.append(('BACKGROUND', (0, each), (-1, each), bg_color))
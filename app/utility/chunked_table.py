@@ -0,0 +1,182 @@
+from reportlab.platypus import Flowable, Table, TableStyle
+
+# Body rows measured at a time; tables with more body rows than this are chunked
+CHUNK_ROWS = 100
+_FUZZ = 1e-6
+
+
+class ChunkedTable(Flowable):
+    """A long table laid out a page at a time, drawing like one ``Table`` split across pages.
+
+    Each time a ``Table`` is split, ReportLab copies its style commands (one per row for zebra
+    striping) and re-sums the heights of every row left over, so laying out a table of n rows
+    costs O(n^2). This flowable measures body rows once, ``chunk_rows`` at a time, and only
+    builds a ``Table`` from the header rows plus the rows that fill the space it is given, with
+    their heights already known. Layout cost per page therefore does not depend on table length.
+
+    ``style`` holds the commands for the whole table, with rows counted from the top of the
+    table; each page's table gets them translated to the rows it holds. ``row_backgrounds``
+    alternate from the first body row of the whole table. Spans must not cross body rows that
+    may end up on different pages.
+    """
+
+    def __init__(self, data, col_widths, style, header_rows=1, row_backgrounds=None, chunk_rows=CHUNK_ROWS,
+                 **table_kwargs):
+        super().__init__()
+        self.header = data[:header_rows]
+        self.body = data
+        self.col_widths = col_widths
+        self.style = list(style)
+        self.row_backgrounds = list(row_backgrounds or ())
+        self.chunk_rows = chunk_rows
+        self.table_kwargs = table_kwargs
+        self.hAlign = table_kwargs.get('hAlign', 'CENTER')
+        self._total = len(data)
+        self._position = header_rows  # index in ``body`` of the next row not measured yet
+        self._first = header_rows  # row of the whole table the next row laid out is
+        self._width = None  # the width rows were measured at
+        self._header_heights = None
+        self._measured = []  # rows measured but not laid out yet, as the measuring Table left them
+        self._heights = []
+        self._stale = []  # rows measured at another width, measured again before the body's
+        self._boundary = None  # the last row laid out, see split()
+        self._window = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_window'] = None
+        return state
+
+    def wrap(self, availWidth, availHeight):
+        # Heights beyond a page only ever get compared with a frame's, so stop measuring there
+        page_height = (getattr(getattr(self, 'canv', None), '_pagesize', None) or (0, availHeight))[1]
+        limit = min(availHeight, page_height)
+        if self._window and self._window[0] == (availWidth, limit):
+            return self._window[2]
+        if availWidth != self._width:
+            self._stale = self._measured + self._stale
+            self._width, self._header_heights, self._measured, self._heights = availWidth, None, [], []
+        count = self._rows_filling(limit)
+        table = self._page_table(count)
+        size = table.wrap(availWidth, limit)
+        self._window = ((availWidth, limit), (table, count), size)
+        return size
+
+    def split(self, availWidth, availHeight):
+        self.wrap(availWidth, availHeight)
+        _, (table, count), _ = self._window
+        parts = table.split(availWidth, availHeight)
+        if len(parts) < 2:
+            return parts
+        first, rest = parts
+        header_rows = len(self.header)
+        rest.wrap(availWidth, availHeight)  # measures a row split in two; the others keep their heights
+
+        remainder = ChunkedTable(self.header, self.col_widths, self.style, header_rows=header_rows,
+                                 row_backgrounds=self.row_backgrounds, chunk_rows=self.chunk_rows, **self.table_kwargs)
+        remainder.body = self.body
+        remainder._total = self._total
+        remainder._position = self._position
+        remainder._first = self._first + count - (len(rest._cellvalues) - header_rows)
+        remainder._width = self._width
+        remainder._header_heights = self._header_heights
+        remainder._measured = rest._cellvalues[header_rows:] + self._measured[count:]
+        remainder._heights = rest._rowHeights[header_rows:] + self._heights[count:]
+        remainder._stale = list(self._stale)
+        split_at = len(first._cellvalues) - 1
+        if len(first._cellvalues) + len(rest._cellvalues) - 2 * header_rows > count:
+            # A row was split in two; the next page's table splits it again to get the same second half
+            remainder._boundary = (table._cellvalues[split_at], table._rowHeights[split_at],
+                                   availHeight - sum(table._rowHeights[:split_at]), True)
+        else:
+            height = first._rowHeights[split_at]
+            remainder._boundary = (first._cellvalues[split_at], height, height + _FUZZ, False)
+        return [first, remainder]
+
+    def draw(self):
+        # Drawn in place, without the extra graphics state drawOn() would wrap around it
+        table = self._window[1][0]
+        table.canv = self.canv
+        try:
+            table.draw()
+        finally:
+            del table.canv
+
+    def _rows_filling(self, limit):
+        """Return how many rows it takes to fill ``limit`` below the header rows, measuring them as needed."""
+        if self._header_heights is None:
+            self._measure()
+        height, count = sum(self._header_heights), 0
+        while height <= limit:
+            if count == len(self._heights) and not self._measure():
+                break
+            height += self._heights[count]
+            count += 1
+        return count
+
+    def _measure(self):
+        """Measure the next ``chunk_rows`` rows, returning False if there were none left."""
+        rows = self._stale[:self.chunk_rows]
+        del self._stale[:len(rows)]
+        end = min(self._position + self.chunk_rows - len(rows), len(self.body))
+        rows += self.body[self._position:end]
+        self._position = end
+        table = self._table(rows, self._first + len(self._measured))
+        table.wrap(self._width, 0x7fffffff)
+        header_rows = len(self.header)
+        self._header_heights = table._rowHeights[:header_rows]
+        # Keep the rows as the Table prepared them, so later Tables can split them without measuring
+        self._measured.extend(table._cellvalues[header_rows:])
+        self._heights.extend(table._rowHeights[header_rows:])
+        return bool(rows)
+
+    def _table(self, rows, first, heights=None):
+        """Return a ``Table`` of the header rows and ``rows``, the first of them being row ``first`` of the whole table."""
+        table = Table(self.header + rows, colWidths=self.col_widths, rowHeights=heights, repeatRows=len(self.header),
+                      **self.table_kwargs)
+        table.setStyle(TableStyle(self._translate(first, len(rows))))
+        return table
+
+    def _page_table(self, count):
+        """Return the ``Table`` for the next ``count`` rows, lined exactly as if the whole table had been split.
+
+        Where a table splits, ReportLab turns boxes and grids crossing the split into separate
+        lines. Rather than copy that logic, a table starting with the last row laid out is split
+        after it the same way; a row split in two is split again at the same height.
+        """
+        heights = self._header_heights + self._heights[:count]
+        if self._boundary is None or not count:
+            return self._table(self._measured[:count], self._first, heights)
+        row, height, split_height, split_in_row = self._boundary
+        skip = 1 if split_in_row else 0
+        header_rows = len(self.header)
+        seed = self._table([row] + self._measured[skip:count], self._first - 1 + skip,
+                           heights[:header_rows] + [height] + heights[header_rows + skip:])
+        seed.wrap(self._width, 0x7fffffff)
+        return seed.split(self._width, sum(heights[:header_rows]) + split_height)[1]
+
+    def _translate(self, first, count):
+        """Return ``style`` for a table holding the header rows and ``count`` rows from row ``first``."""
+        header_rows = len(self.header)
+        last = first + count - 1
+
+        def to_local(row):
+            return row if row < header_rows else header_rows + row - first
+
+        commands = []
+        for command in self.style:
+            (start_col, start_row), (end_col, end_row) = command[1], command[2]
+            start_row = start_row + self._total if start_row < 0 else start_row
+            end_row = end_row + self._total if end_row < 0 else end_row
+            if start_row < header_rows:
+                start, end = start_row, end_row if end_row < header_rows else to_local(min(end_row, last))
+            elif start_row <= last and end_row >= first:
+                start, end = to_local(max(start_row, first)), to_local(min(end_row, last))
+            else:
+                continue
+            commands.append((command[0], (start_col, start), (end_col, end)) + tuple(command[3:]))
+        if self.row_backgrounds:
+            for row in range(first, first + count):
+                color = self.row_backgrounds[(row - header_rows) % len(self.row_backgrounds)]
+                commands.append(('BACKGROUND', (0, to_local(row)), (-1, to_local(row)), color))
+        return commands
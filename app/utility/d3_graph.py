@@ -0,0 +1,81 @@
+class D3Graph:
+    """Append-only node/link buffers for the D3 graph endpoints.
+
+    Node ids come from a monotonic counter instead of ``max(id_store.values()) + 1``
+    so building a graph is linear in the number of nodes. Keys such as
+    ``'agent' + agent.unique`` are interned to the id they were allocated.
+
+    With a ``flush_size`` the graph can be streamed: builders yield it whenever
+    ``full`` is true, and the consumer drains the buffered nodes and links.
+    """
+
+    def __init__(self, flush_size=None):
+        self.flush_size = flush_size
+        self.nodes = []
+        self.links = []
+        self._ids = dict()
+        self._last_id = 0
+        self._merged_nodes = set()
+        self._merged_links = set()
+
+    @property
+    def full(self):
+        return self.flush_size is not None and len(self.nodes) + len(self.links) >= self.flush_size
+
+    def __contains__(self, key):
+        return key in self._ids
+
+    def allocate(self, key=None):
+        """Return the next free node id, optionally (re)binding ``key`` to it."""
+        self._last_id += 1
+        if key is not None:
+            self._ids[key] = self._last_id
+        return self._last_id
+
+    def intern(self, key):
+        """Return ``(node_id, created)`` for ``key``, allocating an id the first time it is seen."""
+        node_id = self._ids.get(key)
+        if node_id is not None:
+            return node_id, False
+        return self.allocate(key), True
+
+    def id_of(self, key):
+        return self._ids[key]
+
+    def get(self, key, default=None):
+        return self._ids.get(key, default)
+
+    def add_node(self, node):
+        self.nodes.append(node)
+        return node
+
+    def add_link(self, source, target, link_type):
+        link = dict(source=source, target=target, type=link_type)
+        self.links.append(link)
+        return link
+
+    def merge(self, nodes, links):
+        """Append nodes and links that no earlier ``merge`` call contributed.
+
+        Nodes are keyed by id and links by ``(source, target, type)``, so merging per-operation
+        results stays linear instead of comparing every dict against the whole graph.
+        """
+        new_nodes = [n for n in nodes if n['id'] not in self._merged_nodes]
+        new_links = [lnk for lnk in links if self.link_key(lnk) not in self._merged_links]
+        self._merged_nodes.update(n['id'] for n in new_nodes)
+        self._merged_links.update(self.link_key(lnk) for lnk in new_links)
+        self.nodes.extend(new_nodes)
+        self.links.extend(new_links)
+
+    @staticmethod
+    def link_key(link):
+        return link['source'], link['target'], link['type']
+
+    def drain(self):
+        """Return and forget the buffered ``(nodes, links)``; ids and merge keys are kept."""
+        nodes, links = self.nodes, self.links
+        self.nodes, self.links = [], []
+        return nodes, links
+
+    def output(self):
+        return dict(nodes=self.nodes, links=self.links)
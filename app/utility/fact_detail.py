@@ -0,0 +1,44 @@
+import heapq
+
+
+class FactDetail:
+    """Level-of-detail settings for the fact graph.
+
+    ``top_k`` keeps the highest-scoring facts of each operation as individual nodes, ties going
+    to the fact discovered first. With ``cluster`` set, facts that miss the cut are folded into
+    one aggregate node per trait instead of being dropped; traits listed in ``expand`` are
+    always shown fact by fact. Clustering without ``top_k`` collapses every fact not expanded.
+    """
+
+    def __init__(self, top_k=None, cluster=False, expand=()):
+        if top_k is not None and top_k < 0:
+            raise ValueError('top_k must not be negative')
+        self.top_k = top_k
+        self.cluster = cluster
+        self.expand = frozenset(expand or ())
+
+    @property
+    def enabled(self):
+        return self.top_k is not None or self.cluster or bool(self.expand)
+
+    def select(self, facts):
+        """Split ``facts`` into ``(shown, clusters)``.
+
+        ``shown`` keeps discovery order. ``clusters`` maps each collapsed trait to its hidden facts,
+        in order of first appearance; it is empty unless clustering is on.
+        """
+        facts = list(facts)
+        top_k = self.top_k
+        if top_k is None:
+            top_k = 0 if self.cluster else len(facts)
+        if len(facts) <= top_k:
+            return facts, dict()
+        ranked = heapq.nlargest(top_k, range(len(facts)), key=lambda i: (getattr(facts[i], 'score', 0), -i))
+        keep = set(ranked)
+        shown, clusters = [], dict()
+        for i, fact in enumerate(facts):
+            if i in keep or fact.trait in self.expand:
+                shown.append(fact)
+            elif self.cluster:
+                clusters.setdefault(fact.trait, []).append(fact)
+        return shown, clusters
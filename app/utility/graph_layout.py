@@ -0,0 +1,123 @@
+"""Deterministic server-side layout for the D3 graph outputs of ``DebriefService``.
+
+NumPy is optional: without it ``available()`` is false and graph sections fall back to the
+SVGs uploaded by the browser.
+"""
+from reportlab.graphics.shapes import Circle, Drawing, Line, String
+from reportlab.lib import colors
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised only without numpy
+    np = None
+
+NODE_COLORS = {
+    'c2': colors.maroon,
+    'operation': colors.HexColor('#1f4e79'),
+    'agent': colors.HexColor('#2e7d32'),
+    'link': colors.HexColor('#6d6d6d'),
+    'tactic': colors.HexColor('#8e24aa'),
+    'technique_name': colors.HexColor('#ef6c00'),
+    'fact': colors.HexColor('#00838f'),
+    'fact_cluster': colors.HexColor('#005662'),
+}
+STATUS_COLORS = {0: colors.HexColor('#2e7d32'), 1: colors.HexColor('#c62828'), 124: colors.HexColor('#f9a825')}
+_BLOCK = 512  # rows of the pairwise repulsion computed at once, bounds memory to O(_BLOCK * n)
+_PAIR_BUDGET = 2 * 10 ** 8  # pairwise force evaluations per layout; large graphs get fewer iterations
+_MIN_ITERATIONS = 30
+# Largest graph still given _MIN_ITERATIONS within the pair budget; larger ones are not laid out
+MAX_NODES = int((_PAIR_BUDGET // _MIN_ITERATIONS) ** 0.5)
+
+
+def available():
+    return np is not None
+
+
+def can_layout(graph):
+    """Return whether ``graph`` is small enough to be laid out server-side."""
+    return len(graph['nodes']) <= MAX_NODES
+
+
+def layout_iterations(n, iterations):
+    """Return how many of ``iterations`` passes over ``n`` nodes fit in the pair budget."""
+    return min(iterations, _PAIR_BUDGET // (n * n)) if n else iterations
+
+
+def force_layout(graph, iterations=150, seed=0):
+    """Return ``{node_id: (x, y)}`` in the unit square for a ``dict(nodes, links)`` graph.
+
+    A vectorized Fruchterman-Reingold simulation started from seeded random positions, so the
+    same graph always gets the same layout. Graphs too large for ``iterations`` full passes within
+    the pair budget are given fewer, see ``can_layout()`` for the largest worth drawing.
+    """
+    ids = [n['id'] for n in graph['nodes']]
+    index = {node_id: i for i, node_id in enumerate(ids)}
+    n = len(ids)
+    if n == 0:
+        return dict()
+    if n == 1:
+        return {ids[0]: (0.5, 0.5)}
+
+    edges = np.array([(index[lnk['source']], index[lnk['target']]) for lnk in graph['links']
+                      if lnk['source'] in index and lnk['target'] in index and lnk['source'] != lnk['target']],
+                     dtype=np.int64).reshape(-1, 2)
+    iterations = layout_iterations(n, iterations)
+    pos = np.random.default_rng(seed).random((n, 2), dtype=np.float32)
+    k = np.float32(np.sqrt(1.0 / n))
+    temperature = np.float32(0.1)
+    cooling = temperature / (iterations + 1)
+    for _ in range(iterations):
+        disp = np.empty((n, 2), dtype=np.float32)
+        xs, ys = pos[:, 0], pos[:, 1]
+        for start in range(0, n, _BLOCK):
+            dx = xs[start:start + _BLOCK, None] - xs[None, :]
+            dy = ys[start:start + _BLOCK, None] - ys[None, :]
+            force = k * k / np.maximum(dx * dx + dy * dy, 1e-4)
+            disp[start:start + _BLOCK, 0] = (dx * force).sum(axis=1)
+            disp[start:start + _BLOCK, 1] = (dy * force).sum(axis=1)
+        if len(edges):
+            delta = pos[edges[:, 0]] - pos[edges[:, 1]]
+            dist = np.maximum(np.linalg.norm(delta, axis=1), 0.01)
+            pull = delta * (dist / k)[:, None]
+            np.subtract.at(disp, edges[:, 0], pull)
+            np.add.at(disp, edges[:, 1], pull)
+        length = np.maximum(np.linalg.norm(disp, axis=1), 0.01)
+        pos += disp / length[:, None] * np.minimum(length, temperature)[:, None]
+        temperature -= cooling
+
+    pos -= pos.min(axis=0)
+    span = pos.max(axis=0)
+    pos /= np.where(span > 0, span, 1.0)
+    return {node_id: (float(x), float(y)) for node_id, (x, y) in zip(ids, pos)}
+
+
+def render_graph(graph, width, height=None, seed=0):
+    """Lay out ``graph`` and return it as a ReportLab ``Drawing`` of the given size."""
+    height = height or width * 0.75
+    positions = force_layout(graph, seed=seed)
+    margin, radius = 12, 4 if len(positions) < 200 else 2.5
+    drawing = Drawing(width, height)
+
+    def place(node_id):
+        x, y = positions[node_id]
+        return margin + x * (width - 2 * margin), margin + y * (height - 2 * margin)
+
+    for lnk in graph['links']:
+        if lnk['source'] in positions and lnk['target'] in positions:
+            (x1, y1), (x2, y2) = place(lnk['source']), place(lnk['target'])
+            drawing.add(Line(x1, y1, x2, y2, strokeColor=colors.lightgrey, strokeWidth=0.4))
+    show_labels = len(positions) <= 150
+    for node in graph['nodes']:
+        x, y = place(node['id'])
+        fill = STATUS_COLORS.get(node.get('status')) if node['type'] == 'link' else None
+        drawing.add(Circle(x, y, radius, fillColor=fill or NODE_COLORS.get(node['type'], colors.grey),
+                           strokeColor=colors.white, strokeWidth=0.3))
+        if show_labels:
+            drawing.add(String(x + radius + 1, y - 1.5, _label(node), fontSize=4.5, fillColor=colors.black))
+    return drawing
+
+
+def _label(node):
+    label = (node.get('attrs') or {}).get('name') if node['type'] == 'link' else None
+    label = str(label or node.get('name', ''))
+    return label if len(label) <= 28 else label[:27] + '…'
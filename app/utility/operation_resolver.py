@@ -0,0 +1,127 @@
+import asyncio
+
+
+class OperationResolver:
+    """Resolves the operations selected for one request.
+
+    All ids that have not been seen yet are fetched with a single ``data_svc.locate``
+    call (a tuple in a match criteria matches any of its values) and indexed by id,
+    so a campaign selection costs one pass over the server's operations instead of
+    one pass per selected id. With ``snapshot`` set, operations are handed out as
+    ``OperationSnapshot`` objects so their facts are only loaded once per request.
+    """
+
+    def __init__(self, data_svc, criteria=None, snapshot=False):
+        self.data_svc = data_svc
+        self.criteria = dict(criteria or {})
+        self.snapshot = snapshot
+        self._by_id = dict()
+        self._agents_by_paw = dict()
+        self._links_by_id = dict()
+        self._linked_ops = set()
+
+    async def resolve(self, operation_ids):
+        """Return the located operations in the order their ids were first requested, each once."""
+        wanted = list(dict.fromkeys(str(op_id) for op_id in operation_ids or []))
+        missing = tuple(op_id for op_id in wanted if op_id not in self._by_id)
+        if missing and self.data_svc:
+            match = dict(self.criteria, id=missing)
+            for operation in await self.data_svc.locate('operations', match=match):
+                if self.snapshot:
+                    operation = OperationSnapshot(operation)
+                self._by_id.setdefault(str(operation.id), operation)
+        return [self._by_id[op_id] for op_id in wanted if op_id in self._by_id]
+
+    @classmethod
+    def from_operations(cls, operations):
+        """Return a resolver over already-located operations."""
+        resolver = cls(data_svc=None)
+        for operation in operations:
+            resolver._by_id.setdefault(str(operation.id), operation)
+        return resolver
+
+    def get(self, op_id):
+        return self._by_id.get(str(op_id))
+
+    def agents_by_paw(self, operation):
+        """Return the operation's paw -> agent index, built once per request."""
+        key = str(operation.id)
+        index = self._agents_by_paw.get(key)
+        if index is None:
+            index = self._agents_by_paw[key] = index_agents_by_paw(operation)
+        return index
+
+    def link_index(self):
+        """Return a link id -> (operation, link) index over every operation resolved so far."""
+        for key, operation in self._by_id.items():
+            if key not in self._linked_ops:
+                self._linked_ops.add(key)
+                for link in getattr(operation, 'chain', None) or []:
+                    self._links_by_id.setdefault(link.id, (operation, link))
+        return self._links_by_id
+
+
+def index_agents_by_paw(operation):
+    """Map each paw to the first agent reporting it, keeping ``operation.agents`` order."""
+    index = dict()
+    for agent in getattr(operation, 'agents', None) or []:
+        if agent:
+            index.setdefault(agent.paw, agent)
+    return index
+
+
+class OperationView:
+    """Read-only view of an operation cut off after the given number of links, facts and agents.
+
+    Chains, agent lists and facts only ever grow while an operation runs, so a view at
+    the counts a client already received rebuilds the graph that client is holding.
+    """
+
+    def __init__(self, operation, links, facts, agents):
+        self._operation = operation
+        self._facts = facts
+        self.chain = list(operation.chain or [])[:links]
+        self.agents = list(operation.agents or [])[:agents]
+
+    def __getattr__(self, name):
+        return getattr(self._operation, name)
+
+    async def all_facts(self):
+        return list(await self._operation.all_facts())[:self._facts]
+
+    async def all_relationships(self):
+        visible = {f.unique for f in await self.all_facts()}
+        return [r for r in await self._operation.all_relationships()
+                if r.source.unique in visible and getattr(r.target, 'unique', None) in visible]
+
+
+class OperationSnapshot:
+    """An operation as seen by one request.
+
+    The chain and agents are copied when the snapshot is taken. Facts and relationships are
+    loaded on first use and every builder and report section after that gets the same lists,
+    so they must not be modified.
+    """
+
+    def __init__(self, operation):
+        self._operation = operation
+        self._loads = dict()
+        self.chain = list(operation.chain or [])
+        self.agents = list(operation.agents or [])
+
+    def __getattr__(self, name):
+        if name == '_operation':
+            raise AttributeError(name)
+        return getattr(self._operation, name)
+
+    async def all_facts(self):
+        return await self._load('all_facts')
+
+    async def all_relationships(self):
+        return await self._load('all_relationships')
+
+    async def _load(self, name):
+        load = self._loads.get(name)
+        if load is None:
+            load = self._loads[name] = asyncio.ensure_future(getattr(self._operation, name)())
+        return await load
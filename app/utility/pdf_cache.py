@@ -0,0 +1,122 @@
+import asyncio
+import glob
+import hashlib
+import json
+import os
+import uuid
+
+
+class PdfArtifactCache:
+    """Rendered PDFs kept on disk under the hash of everything that went into them.
+
+    The directory is bounded to ``max_bytes``, least recently used files going first (a hit
+    refreshes the file's modification time). Concurrent requests for the same key share one
+    render: the first renders while the others wait for its file.
+    """
+
+    def __init__(self, directory, max_bytes, log=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.log = log
+        self._inflight = dict()
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    @staticmethod
+    def key(*parts):
+        """Return a file-name-safe digest of JSON-serializable ``parts``."""
+        return hashlib.sha256(json.dumps(parts, default=str).encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.pdf')
+
+    def lookup(self, key):
+        """Return the path of the PDF cached under ``key``, or None."""
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    async def get_or_render(self, key, render):
+        """Return the path of the PDF for ``key``, awaiting ``render(output)`` to write it if needed.
+
+        If the request rendering a key goes away, one of the requests waiting on it takes over.
+        """
+        while True:
+            path = self.lookup(key)
+            if path:
+                return path
+            pending = self._inflight.get(key)
+            if pending is None:
+                break
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+
+        pending = self._inflight[key] = asyncio.get_running_loop().create_future()
+        pending.add_done_callback(lambda f: f.cancelled() or f.exception())
+        path = self.path(key)
+        part = '%s.%s.part' % (path, uuid.uuid4().hex)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(part, 'wb') as output:
+                await render(output)
+            os.replace(part, path)
+            self._evict(keep=path)
+            pending.set_result(path)
+            return path
+        except asyncio.CancelledError:
+            pending.cancel()
+            raise
+        except Exception as e:
+            pending.set_exception(e)
+            raise
+        finally:
+            self._inflight.pop(key, None)
+            if os.path.exists(part):
+                os.remove(part)
+
+    async def open_or_render(self, key, render):
+        """Return the PDF for ``key`` opened for reading, rendering it first if needed.
+
+        A concurrent render may evict the file between ``get_or_render`` and opening it; the
+        PDF is then rendered again, a few times at most. An open file stays readable once evicted.
+        """
+        for attempt in range(self._OPEN_ATTEMPTS):
+            path = await self.get_or_render(key, render)
+            try:
+                return open(path, 'rb')
+            except FileNotFoundError:
+                if attempt == self._OPEN_ATTEMPTS - 1:
+                    raise
+                if self.log:
+                    self.log.debug('Cached PDF %s was evicted before it was opened, rendering again', path)
+
+    _OPEN_ATTEMPTS = 3
+
+    def _evict(self, keep):
+        entries = []
+        for path in glob.glob(os.path.join(self.directory, '*.pdf')):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except OSError as e:
+                if self.log:
+                    self.log.debug('Could not evict cached PDF %s: %r', path, e)
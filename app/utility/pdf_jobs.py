@@ -0,0 +1,152 @@
+import asyncio
+import re
+import time
+import uuid
+
+
+class PdfJobCancelled(Exception):
+    pass
+
+
+class PdfJob:
+    """One queued PDF render and the progress it reports.
+
+    ``sections`` maps each requested section to ``'pending'``, ``'running'`` or ``'done'``;
+    ``pages`` counts the pages laid out so far. The render itself reads ``cancelled`` between
+    pages so a cancelled build stops even while it runs on a worker thread. ``owner`` identifies
+    who submitted the job; only they may see, download or cancel it.
+    """
+
+    QUEUED, RUNNING, DONE, FAILED, CANCELLED = 'queued', 'running', 'done', 'failed', 'cancelled'
+
+    def __init__(self, sections, filename, owner=None):
+        self.id = uuid.uuid4().hex
+        self.owner = owner
+        self.state = self.QUEUED
+        self.stage = None
+        self.sections = {section: 'pending' for section in sections}
+        self.pages = 0
+        self.filename = filename
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.last_seen = time.monotonic()
+        self.task = None
+
+    @property
+    def cancelled(self):
+        return self.state == self.CANCELLED
+
+    @property
+    def finished(self):
+        return self.state in (self.DONE, self.FAILED, self.CANCELLED)
+
+    def section_progress(self, section, state):
+        if section in self.sections:
+            self.sections[section] = state
+        self.stage = section if state == 'running' else self.stage
+
+    def page_done(self, page):
+        if self.cancelled:
+            raise PdfJobCancelled(self.id)
+        self.pages = page
+
+    def complete(self, pdf):
+        self.result = pdf
+        self.pages = count_pages(pdf) or self.pages
+        self.state = self.DONE
+        self.stage = None
+
+    def display(self):
+        return dict(job_id=self.id, state=self.state, stage=self.stage, filename=self.filename,
+                    sections=[dict(name=name, state=state) for name, state in self.sections.items()],
+                    pages=self.pages, error=self.error)
+
+
+class PdfJobQueue:
+    """Runs PDF jobs in the background, at most ``max_running`` at a time.
+
+    Clients poll a job to keep it alive: a job (queued, running or finished) that nobody asked
+    about for ``idle_timeout`` seconds is treated as abandoned, cancelled and forgotten. Submitting
+    fails with ``QueueFull`` once ``max_jobs`` jobs are held.
+    """
+
+    class QueueFull(Exception):
+        pass
+
+    def __init__(self, max_running=2, max_jobs=20, idle_timeout=120, log=None):
+        self.max_running = max_running
+        self.max_jobs = max_jobs
+        self.idle_timeout = idle_timeout
+        self.log = log
+        self._jobs = dict()
+        self._slots = None
+        self._reaper = None
+
+    def __len__(self):
+        return len(self._jobs)
+
+    def submit(self, render, sections, filename, owner=None):
+        """Queue ``render(job)``, a coroutine function returning the PDF bytes, and return its job."""
+        self.reap()
+        if len(self._jobs) >= self.max_jobs:
+            raise self.QueueFull()
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_running)
+        job = PdfJob(sections, filename, owner=owner)
+        self._jobs[job.id] = job
+        job.task = asyncio.ensure_future(self._run(job, render))
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.ensure_future(self._reap_idle())
+        return job
+
+    def get(self, job_id, owner=None):
+        """Return the job and mark it as still wanted, or None if it is unknown or not ``owner``'s."""
+        self.reap()
+        job = self._jobs.get(job_id)
+        if not job or job.owner != owner:
+            return None
+        job.last_seen = time.monotonic()
+        return job
+
+    def cancel(self, job_id, owner=None):
+        """Cancel and forget a job; returns it, or None if it is unknown or not ``owner``'s."""
+        job = self._jobs.get(job_id)
+        if not job or job.owner != owner:
+            return None
+        del self._jobs[job_id]
+        if not job.finished:
+            job.state = PdfJob.CANCELLED
+            job.task.cancel()
+        return job
+
+    def reap(self):
+        deadline = time.monotonic() - self.idle_timeout
+        for job in [job for job in self._jobs.values() if job.last_seen < deadline]:
+            if self.log:
+                self.log.debug('Dropping abandoned PDF job %s', job.id)
+            self.cancel(job.id, job.owner)
+
+    async def _reap_idle(self):
+        while self._jobs:
+            await asyncio.sleep(max(self.idle_timeout / 2, 0.01))
+            self.reap()
+
+    async def _run(self, job, render):
+        try:
+            async with self._slots:
+                if job.cancelled:
+                    return
+                job.state = PdfJob.RUNNING
+                job.complete(await render(job))
+        except (asyncio.CancelledError, PdfJobCancelled):
+            job.state = PdfJob.CANCELLED
+        except Exception as e:
+            if self.log:
+                self.log.exception('PDF job %s failed: %r', job.id, e)
+            job.state, job.error = PdfJob.FAILED, 'Error generating PDF report'
+
+
+def count_pages(pdf):
+    """Return the number of page objects in a ReportLab PDF."""
+    return len(re.findall(rb'/Type /Page\b(?!s)', pdf or b''))
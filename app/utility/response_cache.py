@@ -0,0 +1,47 @@
+import hashlib
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """In-process LRU cache of encoded response bodies, bounded by their total size in bytes.
+
+    Keys are expected to carry an operation fingerprint, so an entry is simply never looked up
+    again once the operations it was built from change; it then ages out of the LRU order.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        """Return ``(body, etag)`` for ``key`` or None, marking the entry as recently used."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key, body):
+        """Store ``body`` under ``key`` and return its ``(body, etag)`` entry.
+
+        Bodies larger than the whole budget are not stored.
+        """
+        entry = (body, self.etag(body))
+        if len(body) > self.max_bytes:
+            return entry
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.size -= len(previous[0])
+        self._entries[key] = entry
+        self.size += len(body)
+        while self.size > self.max_bytes:
+            _, (evicted, _) = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+        return entry
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def etag(body):
+        return '"%s"' % hashlib.sha256(body).hexdigest()[:32]
@@ -0,0 +1,16 @@
+def group_runs(items, key, starts_run=None):
+    """Group consecutive items that share a key into ``[(key, [items]), ...]`` in one pass.
+
+    An item whose key differs from the current run only opens a new run when
+    ``starts_run(item)`` is true; otherwise it is folded into the current run.
+    """
+    runs = []
+    current = None
+    for item in items:
+        item_key = key(item)
+        if not runs or (item_key != current[0] and (starts_run is None or starts_run(item))):
+            current = (item_key, [item])
+            runs.append(current)
+        else:
+            current[1].append(item)
+    return runs
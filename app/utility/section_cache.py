@@ -0,0 +1,50 @@
+import logging
+import pickle
+import threading
+
+from plugins.debrief.app.utility.base_report_section import BaseReportSection
+from plugins.debrief.app.utility.response_cache import ResponseCache
+
+
+class SectionCache:
+    """Report section flowables kept across renders, pickled and bounded by size in bytes.
+
+    Entries are keyed by section id, the operations' fingerprint and the section's own
+    ``cache_key``. Flowables are changed while a document is laid out, so they are pickled as
+    soon as they are generated and every hit unpickles a fresh copy. Sections without a
+    ``cache_key``, or whose key is None, are always generated, and so are graph sections whose
+    graph is too large to lay out, since they draw the SVG uploaded with each request.
+    """
+
+    def __init__(self, max_bytes):
+        self._entries = ResponseCache(max_bytes)
+        self._lock = threading.Lock()
+        self.log = logging.getLogger('debrief_section_cache')
+
+    def __len__(self):
+        return len(self._entries)
+
+    async def generate(self, section, styles, fingerprint, **kwargs):
+        """Return ``section``'s flowables for ``kwargs``, reusing an earlier render's when possible."""
+        cache_key = getattr(section, 'cache_key', None)
+        extra = cache_key(**kwargs) if cache_key and fingerprint is not None else None
+        if extra is not None and isinstance(section, BaseReportSection) and \
+                await section.uses_uploaded_graph(**kwargs):
+            extra = None
+        if extra is None:
+            return await section.generate_section_elements(styles, **kwargs)
+        key = (section.id, fingerprint, extra)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None:
+            # The bytes were pickled by this cache in this process and never come from outside
+            return pickle.loads(entry[0])  # nosec B301
+        flowables = await section.generate_section_elements(styles, **kwargs)
+        try:
+            body = pickle.dumps(flowables, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            self.log.debug('Section %s output cannot be cached: %r', section.id, e)
+        else:
+            with self._lock:
+                self._entries.put(key, body)
+        return flowables
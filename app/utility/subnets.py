@@ -0,0 +1,78 @@
+import ipaddress
+
+# Docker picks its bridge networks from 172.17.0.0/16 - 172.31.0.0/16
+DOCKER_BRIDGE_NETWORK = ipaddress.ip_network('172.16.0.0/12')
+
+
+class SubnetIndex:
+    """Groups IP addresses into the subnets shown on the topology.
+
+    An address belongs to the most specific configured network that contains it (longest-prefix
+    match over a binary trie), or else to its network at the default prefix length for its IP
+    version. Lookups are memoized per address string, so each distinct IP is parsed once.
+    """
+
+    def __init__(self, prefix_v4=24, prefix_v6=64, networks=()):
+        for version, prefix, width in ((4, prefix_v4, 32), (6, prefix_v6, 128)):
+            if not isinstance(prefix, int) or not 0 <= prefix <= width:
+                raise ValueError(f'invalid IPv{version} subnet prefix: {prefix!r}')
+        self.prefixes = {4: prefix_v4, 6: prefix_v6}
+        self._tries = {4: [None, None, None], 6: [None, None, None]}  # node: [zero, one, network]
+        self._cache = dict()
+        self._cidrs = dict()
+        for network in networks:
+            self.add(network)
+
+    def add(self, network):
+        """Add a network such as ``'10.20.0.0/16'`` to group addresses under."""
+        network = ipaddress.ip_network(network, strict=False)
+        node = self._tries[network.version]
+        bits, width = int(network.network_address), network.max_prefixlen
+        for depth in range(network.prefixlen):
+            bit = (bits >> (width - 1 - depth)) & 1
+            if node[bit] is None:
+                node[bit] = [None, None, None]
+            node = node[bit]
+        node[2] = network
+        self._cache.clear()
+
+    def subnet_of(self, ip):
+        """Return the CIDR string ``ip`` is grouped under, or None if it is not an IP address."""
+        return self._lookup(ip)[0]
+
+    def is_docker_bridge(self, ip):
+        return self._lookup(ip)[1]
+
+    def _lookup(self, ip):
+        entry = self._cache.get(ip)
+        if entry is None:
+            entry = self._cache[ip] = self._classify(ip)
+        return entry
+
+    def _classify(self, ip):
+        try:
+            address = ipaddress.ip_address(str(ip).strip())
+        except ValueError:
+            return None, False
+        network = self._longest_match(address)
+        if network:
+            return str(network), address in DOCKER_BRIDGE_NETWORK
+        # Mask the integer form rather than building an ip_network per address; hosts of the
+        # same subnet then share one formatted CIDR string.
+        prefix, width = self.prefixes[address.version], address.max_prefixlen
+        key = (address.version, int(address) >> (width - prefix))
+        cidr = self._cidrs.get(key)
+        if cidr is None:
+            cidr = self._cidrs[key] = f'{type(address)(key[1] << (width - prefix))}/{prefix}'
+        return cidr, address in DOCKER_BRIDGE_NETWORK
+
+    def _longest_match(self, address):
+        node = self._tries[address.version]
+        match = node[2]
+        bits, width = int(address), address.max_prefixlen
+        for depth in range(width):
+            node = node[(bits >> (width - 1 - depth)) & 1]
+            if node is None:
+                break
+            match = node[2] or match
+        return match
@@ -0,0 +1,69 @@
+import re
+
+from reportlab.lib.textsplit import dumbSplit
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.platypus import Flowable
+
+# Runs of the whitespace a Paragraph collapses into one space (non-breaking spaces are kept)
+_WHITESPACE = re.compile(r'[ \t\n\r\f\v]+')
+# Width of each character seen so far, per (font name, font size)
+_CHAR_WIDTHS = dict()
+
+
+def char_widths(text, font_name, font_size):
+    """Return the width of each character of ``text``, measuring each distinct character once."""
+    widths = _CHAR_WIDTHS.get((font_name, font_size))
+    if widths is None:
+        widths = _CHAR_WIDTHS.setdefault((font_name, font_size), dict())
+    try:
+        return [widths[c] for c in text]
+    except KeyError:
+        for c in set(text).difference(widths):
+            widths[c] = stringWidth(c, font_name, font_size)
+        return [widths[c] for c in text]
+
+
+class TextCell(Flowable):
+    """A table cell of plain text, laid out like a ``Paragraph`` in a ``wordWrap='CJK'`` style.
+
+    A Paragraph parses its text as markup and measures every character each time it is
+    wrapped. Text without markup needs neither: this flowable collapses whitespace the way
+    the Paragraph would, breaks lines with ReportLab's own CJK splitting on cached character
+    widths and draws the lines straight onto the canvas. Only the style's font, size,
+    leading and text colour are used; text that needs markup or links should stay a Paragraph.
+    """
+
+    def __init__(self, text, style):
+        super().__init__()
+        self.text = _WHITESPACE.sub(' ', text).strip(' ')
+        self.style = style
+        self.lines = []
+
+    def wrap(self, availWidth, availHeight):
+        style = self.style
+        self.width = availWidth
+        if not self.text:
+            self.lines = []
+        else:
+            widths = char_widths(self.text, style.fontName, style.fontSize)
+            if sum(widths) <= availWidth:
+                self.lines = [self.text]
+            else:
+                self.lines = [line for _, line in dumbSplit(self.text, widths, availWidth)]
+        self.height = len(self.lines) * style.leading
+        return self.width, self.height
+
+    def minWidth(self):
+        style = self.style
+        return max([stringWidth(word, style.fontName, style.fontSize) for word in self.text.split(' ')] or [0])
+
+    def draw(self):
+        if not self.lines:
+            return
+        style = self.style
+        text = self.canv.beginText(0, self.height - style.fontSize)
+        text.setFont(style.fontName, style.fontSize, style.leading)
+        text.setFillColor(style.textColor)
+        for line in self.lines:
+            text.textLine(line)
+        self.canv.drawText(text)
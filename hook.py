@@ -35,11 +35,16 @@ async def enable(services):
     app.router.add_route('POST', '/plugin/debrief/report', debrief_gui.report)
     app.router.add_route('*', '/plugin/debrief/graph', debrief_gui.graph)
     app.router.add_route('POST', '/plugin/debrief/pdf', debrief_gui.download_pdf)
+    app.router.add_route('POST', '/plugin/debrief/pdf/jobs', debrief_gui.submit_pdf_job)
+    app.router.add_route('GET', '/plugin/debrief/pdf/jobs/{job_id}', debrief_gui.pdf_job_status)
+    app.router.add_route('GET', '/plugin/debrief/pdf/jobs/{job_id}/download', debrief_gui.download_pdf_job)
+    app.router.add_route('DELETE', '/plugin/debrief/pdf/jobs/{job_id}', debrief_gui.cancel_pdf_job)
     app.router.add_route('POST', '/plugin/debrief/json', debrief_gui.download_json)
     app.router.add_route('GET', '/plugin/debrief/logos', debrief_gui.all_logos)
     app.router.add_route('GET', '/plugin/debrief/sections', debrief_gui.report_sections)
     app.router.add_route('POST', '/plugin/debrief/logo', debrief_gui.upload_logo)
     app.router.add_route('GET', '/plugin/debrief/topology', debrief_gui.topology)
+    app.router.add_route('GET', '/plugin/debrief/topology/stream', debrief_gui.topology_stream)
 
     # Kick off the ATT&CK v18 cache warmup
     asyncio.create_task(_init_attack18_cache())
@@ -0,0 +1,118 @@
+"""Tests for app/utility/chunked_table.py — long tables laid out a page at a time."""
+import importlib
+import pickle
+import re
+from io import BytesIO
+from unittest.mock import patch
+
+import pytest
+from reportlab.lib.pagesizes import landscape, letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Table
+from reportlab.platypus.flowables import KeepTogetherSplitAtTop
+
+from plugins.debrief.app.utility.base_report_section import BaseReportSection
+from plugins.debrief.app.utility.chunked_table import CHUNK_ROWS, ChunkedTable
+
+TTP_DET_MODULE = importlib.import_module('plugins.debrief.app.debrief-sections.ttps_detections')
+COL_WIDTHS = [1.2 * inch, .6 * inch, .6 * inch, 4.6 * inch]
+
+
+def _steps(count):
+    return [['Time', 'Status', 'Agent', 'Name']] + [
+        ['2021-01-01 08:%02d' % (i % 60), 'success', 'paw%d' % i, 'long step name ' * (i % 7) + str(i)]
+        for i in range(count)
+    ]
+
+
+def _pages(flowables, **kwargs):
+    """Build ``flowables`` and return each page's drawing operations.
+
+    Runs of lines stroked with the same settings are sorted: ReportLab orders them by how many
+    times a table was split, which does not change what is drawn.
+    """
+    buffer = BytesIO()
+    SimpleDocTemplate(buffer, invariant=1, pageCompression=0, **kwargs).build(flowables)
+    pages = []
+    for stream in re.findall(rb'stream\r?\n(.*?)endstream', buffer.getvalue(), re.S):
+        ops, lines = [], []
+        for op in stream.split(b'\n'):
+            if op.endswith(b' l S'):
+                lines.append(op)
+            else:
+                ops.extend(sorted(lines) + [op])
+                lines = []
+        pages.append(ops + sorted(lines))
+    return pages
+
+
+class TestGenerateTable:
+    def test_short_tables_stay_plain(self):
+        assert type(BaseReportSection.generate_table(_steps(CHUNK_ROWS), COL_WIDTHS)) is Table
+
+    def test_long_tables_are_chunked(self):
+        assert isinstance(BaseReportSection.generate_table(_steps(CHUNK_ROWS + 1), COL_WIDTHS), ChunkedTable)
+
+    @pytest.mark.parametrize('rows', [CHUNK_ROWS + 1, 450])
+    def test_draws_like_one_table(self, rows):
+        with patch('plugins.debrief.app.utility.base_report_section.CHUNK_ROWS', 10 ** 6):
+            plain = BaseReportSection.generate_table(_steps(rows), COL_WIDTHS)
+        chunked = BaseReportSection.generate_table(_steps(rows), COL_WIDTHS)
+        assert type(plain) is Table
+        expected = _pages([plain])
+        assert len(expected) > 2
+        assert _pages([chunked]) == expected
+
+    def test_tables_built_stay_page_sized(self):
+        sizes = []
+        init = Table.__init__
+
+        def record(self, data, *args, **kwargs):
+            sizes.append(len(data))
+            init(self, data, *args, **kwargs)
+
+        table = BaseReportSection.generate_table(_steps(3000), COL_WIDTHS)
+        with patch.object(Table, '__init__', record):
+            pages = _pages([table])
+        assert len(pages) > 50
+        assert max(sizes) <= 2 * CHUNK_ROWS + 1
+
+    def test_pickled_copy_draws_the_same(self):
+        table = BaseReportSection.generate_table(_steps(300), COL_WIDTHS)
+        copy = pickle.loads(pickle.dumps(table, protocol=pickle.HIGHEST_PROTOCOL))
+        assert _pages([copy]) == _pages([table])
+
+
+class TestDetectionsTable:
+    @pytest.fixture
+    def det_section(self):
+        with patch('plugins.debrief.app.utility.base_report_section.get_attack18'):
+            section = TTP_DET_MODULE.DebriefReportSection()
+        section._ensure_styles()
+        return section
+
+    @staticmethod
+    def _rows(section, count):
+        p = section._p
+        rows = [
+            [p('AN'), p('Platform'), p('Statement'), p('Log Sources'), '', '', p('Mutable Elements'), ''],
+            ['', '', '', p('Name'), p('Channel'), p('Data Component'), p('Field'), p('Description')],
+        ]
+        rows += [[p('AN%d' % i), p('windows'), p('statement ' * (i % 30 + 1)), p('name'), p('channel'),
+                  p('component'), p('field'), p('description ' * (i % 9))] for i in range(count)]
+        rows[150][2] = p('a statement longer than a page ' * 400)
+        return rows
+
+    def test_split_rows_and_headers_draw_like_one_table(self, det_section):
+        def story(table):
+            return [KeepTogetherSplitAtTop([Paragraph('Detection Strategies', getSampleStyleSheet()['Normal']),
+                                            table])]
+
+        page = dict(pagesize=landscape(letter), leftMargin=18, rightMargin=18, topMargin=18, bottomMargin=18)
+        with patch.object(TTP_DET_MODULE, 'CHUNK_ROWS', 10 ** 6):
+            plain = det_section._build_det_table(self._rows(det_section, 300))
+        chunked = det_section._build_det_table(self._rows(det_section, 300))
+        assert type(plain) is Table
+        assert isinstance(chunked, ChunkedTable)
+        assert _pages(story(chunked), **page) == _pages(story(plain), **page)
@@ -0,0 +1,71 @@
+"""Tests for app/utility/d3_graph.py — D3Graph."""
+from plugins.debrief.app.utility.d3_graph import D3Graph
+
+
+class TestAllocate:
+    def test_ids_start_after_zero(self):
+        graph = D3Graph()
+        assert graph.allocate() == 1
+        assert graph.allocate() == 2
+
+    def test_key_bound_to_id(self):
+        graph = D3Graph()
+        node_id = graph.allocate('link1')
+        assert graph.id_of('link1') == node_id
+        assert 'link1' in graph
+
+    def test_rebinding_key_allocates_fresh_id(self):
+        graph = D3Graph()
+        first = graph.allocate('fact1')
+        second = graph.allocate('fact1')
+        assert second == first + 1
+        assert graph.id_of('fact1') == second
+
+
+class TestIntern:
+    def test_intern_returns_existing_id(self):
+        graph = D3Graph()
+        node_id, created = graph.intern('agent1')
+        assert created
+        assert graph.intern('agent1') == (node_id, False)
+
+    def test_get_missing_key(self):
+        assert D3Graph().get('missing') is None
+
+
+class TestBuffers:
+    def test_output_contains_nodes_and_links(self):
+        graph = D3Graph()
+        graph.add_node(dict(id=0, type='c2'))
+        graph.add_link(0, 1, 'agent_contact')
+        assert graph.output() == dict(nodes=[dict(id=0, type='c2')],
+                                      links=[dict(source=0, target=1, type='agent_contact')])
+
+
+class TestMerge:
+    def test_merge_skips_previously_merged_items(self):
+        graph = D3Graph()
+        graph.merge([dict(id=1)], [dict(source='op', target=1, type='relationship')])
+        graph.merge([dict(id=1), dict(id=2)], [dict(source='op', target=1, type='relationship'),
+                                               dict(source=1, target=2, type='relationship')])
+        assert [n['id'] for n in graph.nodes] == [1, 2]
+        assert len(graph.links) == 2
+
+
+class TestDrain:
+    def test_full_only_with_flush_size(self):
+        graph = D3Graph()
+        graph.add_node(dict(id=1))
+        assert not graph.full
+        graph = D3Graph(flush_size=2)
+        graph.add_node(dict(id=1))
+        graph.add_link(0, 1, 'agent_contact')
+        assert graph.full
+
+    def test_drain_keeps_interned_ids(self):
+        graph = D3Graph(flush_size=1)
+        graph.add_node(dict(id=graph.allocate('agent1')))
+        nodes, links = graph.drain()
+        assert nodes == [dict(id=1)] and links == []
+        assert graph.nodes == [] and not graph.full
+        assert graph.intern('agent1') == (1, False)
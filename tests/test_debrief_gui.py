@@ -10,7 +10,11 @@ from plugins.debrief.app.debrief_gui import (
     UseTemplateMarker,
     LockTemplateMarker,
     TemplateSwitchDoc,
+    render_pdf,
 )
+from plugins.debrief.app.utility.pdf_cache import PdfArtifactCache
+from plugins.debrief.app.utility.response_cache import ResponseCache
+from plugins.debrief.app.utility.section_cache import SectionCache
 
 
 # ---------------------------------------------------------------------------
@@ -89,6 +93,171 @@ class TestTemplateSwitchDoc:
         buf.close()
 
 
+# ---------------------------------------------------------------------------
+# render_pdf / DebriefGui._render_pdf
+# ---------------------------------------------------------------------------
+class TestRenderPdf:
+    @pytest.fixture(autouse=True)
+    def caldera_root(self, tmp_path, monkeypatch):
+        # Page headers load the logo relative to the Caldera root
+        (tmp_path / 'plugins').mkdir()
+        (tmp_path / 'plugins' / 'debrief').symlink_to(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        monkeypatch.chdir(tmp_path)
+
+    def _story(self):
+        from reportlab.lib.styles import getSampleStyleSheet
+        from reportlab.platypus import Paragraph
+        return [Paragraph('Operation report', getSampleStyleSheet()['Normal'])]
+
+    def test_returns_pdf_bytes(self):
+        pdf = render_pdf(self._story(), 'report')
+        assert pdf.startswith(b'%PDF')
+
+    def test_writes_to_output_file(self):
+        from io import BytesIO
+        output = BytesIO()
+        assert render_pdf(self._story(), 'report', output=output) is None
+        assert output.getvalue().startswith(b'%PDF')
+        assert not output.closed
+
+    def test_on_page_sees_each_page_and_can_abort(self):
+        from reportlab.platypus import PageBreak
+        from plugins.debrief.app.utility.pdf_jobs import count_pages
+        pages = []
+        pdf = render_pdf(self._story() + [PageBreak()] + self._story(), 'report', on_page=pages.append)
+        assert pages == [1, 2]
+        assert count_pages(pdf) == 2
+
+        def abort(page):
+            raise RuntimeError('cancelled')
+        with pytest.raises(RuntimeError):
+            render_pdf(self._story(), 'report', on_page=abort)
+
+    def test_detections_only_starts_landscape(self):
+        assert b'/MediaBox [ 0 0 612 792 ]' in render_pdf(self._story(), 'report')
+        assert b'/MediaBox [ 0 0 792 612 ]' in render_pdf(self._story(), 'report', detections_only=True)
+
+    def test_header_logo_travels_on_document(self):
+        from plugins.debrief.app.objects.c_story import Story
+        Story.set_header_logo_path(None)
+        with patch.object(Story, 'draw_header_logo') as draw:
+            render_pdf(self._story(), 'report', header_logo_path='logo.png')
+        assert draw.called
+        assert all(call.args[2] == 'logo.png' for call in draw.call_args_list)
+        assert Story._header_logo_path is None
+
+    @staticmethod
+    def _make_gui(executor):
+        gui = DebriefGui.__new__(DebriefGui)
+        gui.log = MagicMock()
+        gui.pdf_executor = executor
+        gui._pdf_thread_executor = None
+        return gui
+
+    @pytest.mark.asyncio
+    async def test_render_runs_on_executor(self):
+        import threading
+        from concurrent.futures import ThreadPoolExecutor
+        threads = []
+
+        def fake_render(story, title, header_logo_path=None, detections_only=False, on_page=None, output=None):
+            threads.append(threading.current_thread())
+            return b'%PDF-fake'
+
+        with ThreadPoolExecutor(max_workers=1) as executor, \
+                patch('plugins.debrief.app.debrief_gui.render_pdf', fake_render):
+            gui = self._make_gui(executor)
+            assert await gui._render_pdf([], 'report', None, False) == b'%PDF-fake'
+        assert threads and threads[0] is not threading.current_thread()
+
+    @staticmethod
+    def _process_gui():
+        from concurrent.futures import ProcessPoolExecutor
+        executor = MagicMock(spec=ProcessPoolExecutor)
+        executor._max_workers = 1
+        return TestRenderPdf._make_gui(executor)
+
+    @pytest.mark.asyncio
+    async def test_unpicklable_story_falls_back_to_thread(self):
+        import threading
+        from reportlab.platypus import Flowable
+        gui = self._process_gui()
+        flowable = Flowable()
+        flowable.callback = lambda: None  # lambdas raise AttributeError (not PicklingError) when pickled
+        threads = []
+
+        def fake_render(story, title, header_logo_path=None, detections_only=False, on_page=None, output=None):
+            threads.append(threading.current_thread())
+            return b'%PDF-thread'
+
+        with patch('plugins.debrief.app.debrief_gui.render_pdf', fake_render):
+            assert await gui._render_pdf([flowable], 'report', None, False) == b'%PDF-thread'
+        assert threads and threads[0].name.startswith('debrief-pdf')
+        gui.pdf_executor.submit.assert_not_called()
+        gui.log.warning.assert_called_once()
+        gui._pdf_thread_executor.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_unpicklable_on_page_stays_in_this_process(self):
+        import asyncio
+        import pickle
+        gui = self._process_gui()
+        pools = []
+
+        async def run_in_executor(pool, build):
+            pools.append(pool)
+            pickle.dumps(build)
+            assert 'output' not in build.keywords and 'on_page' not in build.keywords
+            return b'%PDF-process'
+
+        with patch.object(asyncio.get_running_loop(), 'run_in_executor', side_effect=run_in_executor):
+            assert await gui._render_pdf(self._story(), 'report', None, False, on_page=lambda page: None) == \
+                b'%PDF-process'
+        assert pools == [gui.pdf_executor]
+        gui.log.warning.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_worker_render_error_propagates(self):
+        import asyncio
+        gui = self._process_gui()
+        pools = []
+
+        async def run_in_executor(pool, build):
+            pools.append(pool)
+            raise TypeError('bad flowable')
+
+        with patch.object(asyncio.get_running_loop(), 'run_in_executor', side_effect=run_in_executor):
+            with pytest.raises(TypeError):
+                await gui._render_pdf(self._story(), 'report', None, False)
+        assert pools == [gui.pdf_executor]
+        assert gui._pdf_thread_executor is None
+
+    @pytest.mark.asyncio
+    async def test_process_result_copied_to_output(self):
+        import asyncio
+        from io import BytesIO
+        gui = self._process_gui()
+        output = BytesIO()
+
+        async def run_in_executor(pool, build):
+            return b'%PDF-process'
+
+        with patch.object(asyncio.get_running_loop(), 'run_in_executor', side_effect=run_in_executor):
+            assert await gui._render_pdf([], 'report', None, False, on_page=print, output=output) is None
+        assert output.getvalue() == b'%PDF-process'
+
+    @pytest.mark.parametrize('pool, expected', [(None, 'ThreadPoolExecutor'), ('thread', 'ThreadPoolExecutor'),
+                                                ('process', 'ProcessPoolExecutor')])
+    def test_create_pdf_executor_from_config(self, pool, expected):
+        config = dict(pdf_render_pool=pool, pdf_render_workers=3)
+        with patch('plugins.debrief.app.debrief_gui.BaseWorld.get_config',
+                   side_effect=lambda prop=None, name=None: config.get(prop)):
+            executor = DebriefGui._create_pdf_executor()
+        assert type(executor).__name__ == expected
+        assert executor._max_workers == 3
+        executor.shutdown()
+
+
 # ---------------------------------------------------------------------------
 # DebriefGui._sanitize_filename
 # ---------------------------------------------------------------------------
@@ -117,38 +286,22 @@ class TestSanitizeFilename:
 
 
 # ---------------------------------------------------------------------------
-# DebriefGui._save_svgs / _clean_downloads
+# DebriefGui._save_svgs
 # ---------------------------------------------------------------------------
 class TestSvgOperations:
     def test_save_svgs(self, tmp_path):
         import base64
         svg_content = b'<svg></svg>'
         encoded = base64.b64encode(svg_content).decode()
-        save_dir = str(tmp_path) + '/'
-
-        svgs = {'test_graph': encoded}
-        with patch('plugins.debrief.app.debrief_gui.open', create=True) as mock_open:
-            mock_fh = MagicMock()
-            mock_open.return_value.__enter__ = MagicMock(return_value=mock_fh)
-            mock_open.return_value.__exit__ = MagicMock(return_value=False)
-            DebriefGui._save_svgs(svgs)
-            mock_open.assert_called_once()
-            mock_fh.write.assert_called_once_with(base64.b64decode(encoded))
-
-    def test_clean_downloads(self, tmp_path):
-        # Create test files
-        (tmp_path / 'test.png').write_text('png')
-        (tmp_path / 'test.svg').write_text('svg')
-        (tmp_path / 'keep.txt').write_text('keep')
-
-        with patch('glob.glob') as mock_glob:
-            mock_glob.side_effect = [
-                [str(tmp_path / 'test.png')],
-                [str(tmp_path / 'test.svg')],
-            ]
-            with patch('os.remove') as mock_remove:
-                DebriefGui._clean_downloads()
-                assert mock_remove.call_count == 2
+
+        graph_files = DebriefGui._save_svgs({'steps-graph': encoded, '../../evil': encoded, '...': encoded},
+                                            str(tmp_path))
+        assert graph_files == {'steps-graph': str(tmp_path / 'steps-graph.svg'), 'evil': str(tmp_path / 'evil.svg')}
+        assert (tmp_path / 'steps-graph.svg').read_bytes() == svg_content
+        assert sorted(os.listdir(tmp_path)) == ['evil.svg', 'steps-graph.svg']
+
+    def test_save_svgs_without_graphs(self, tmp_path):
+        assert DebriefGui._save_svgs(None, str(tmp_path)) == {}
 
 
 # ---------------------------------------------------------------------------
@@ -241,3 +394,663 @@ class TestPrettyName:
     def test_empty_string(self):
         gui = self._make_gui()
         assert gui._pretty_name('') == ''
+
+
+# ---------------------------------------------------------------------------
+# DebriefGui.graph — NDJSON streaming
+# ---------------------------------------------------------------------------
+class TestGraphStreaming:
+    def _make_gui(self, mock_services):
+        from plugins.debrief.app.debrief_svc import DebriefService
+        gui = DebriefGui.__new__(DebriefGui)
+        with patch.object(DebriefService, 'get_config', return_value={'app.name': 'caldera'}):
+            gui.debrief_svc = DebriefService(mock_services)
+        gui.debrief_svc.get_config = MagicMock(
+            side_effect=lambda prop=None, name=None: None if prop else {'app.name': 'caldera'})
+        gui.log = MagicMock()
+        gui.data_svc = mock_services['data_svc']
+        gui.auth_svc = mock_services['auth_svc']
+        gui.response_cache = ResponseCache(max_bytes=1024 * 1024)
+        gui.pdf_cache = PdfArtifactCache('/nonexistent', max_bytes=0)
+        return gui
+
+    async def _get(self, gui, query):
+        from aiohttp import web
+        from aiohttp.test_utils import TestClient, TestServer
+        app = web.Application()
+        app.router.add_route('GET', '/plugin/debrief/graph', gui.graph)
+        async with TestClient(TestServer(app)) as client:
+            resp = await client.get('/plugin/debrief/graph', params=query)
+            return resp.status, resp.headers.get('Content-Type'), await resp.text()
+
+    @pytest.mark.asyncio
+    async def test_ndjson_lines_match_json_graph(self, mock_services, make_operation, make_link):
+        import json
+        op = make_operation(chain=[make_link(unique=f'l{i}') for i in range(600)])
+        mock_services['data_svc'].locate.return_value = [op]
+        gui = self._make_gui(mock_services)
+        status, content_type, body = await self._get(gui, dict(type='steps', operations='op-1', format='ndjson'))
+        assert status == 200
+        assert content_type.startswith('application/x-ndjson')
+        records = [json.loads(line) for line in body.splitlines()]
+        expected = await gui.debrief_svc.build_steps_d3(['op-1'])
+        assert [r['node'] for r in records if 'node' in r] == expected['nodes']
+        assert sorted(map(str, (r['link'] for r in records if 'link' in r))) == sorted(map(str, expected['links']))
+
+    @pytest.mark.asyncio
+    async def test_stream_error_written_as_record(self, mock_services):
+        import json
+        mock_services['data_svc'].locate.side_effect = RuntimeError('boom')
+        gui = self._make_gui(mock_services)
+        status, _, body = await self._get(gui, dict(type='steps', operations='op-1', format='ndjson'))
+        assert status == 200
+        assert json.loads(body.splitlines()[-1]) == dict(error='internal error')
+
+    @pytest.mark.asyncio
+    async def test_fact_top_k_query(self, mock_services, make_operation, make_fact, make_source):
+        import json
+        facts = [make_fact(unique=f'f{i}', score=i) for i in range(5)]
+        mock_services['data_svc'].locate.return_value = [make_operation(facts=facts, source=make_source(facts=[]))]
+        gui = self._make_gui(mock_services)
+        gui.debrief_svc._get_pub_attrs = MagicMock(return_value={})
+        status, _, body = await self._get(gui, dict(type='fact', operations='op-1', top_k='2', cluster='true'))
+        assert status == 200
+        types = [n['type'] for n in json.loads(body)['nodes']]
+        assert types == ['operation', 'fact', 'fact', 'fact_cluster']
+
+    @pytest.mark.asyncio
+    async def test_fact_cluster_query_without_top_k(self, mock_services, make_operation, make_fact, make_source):
+        import json
+        facts = [make_fact(unique=f'f{i}', score=i) for i in range(5)]
+        mock_services['data_svc'].locate.return_value = [make_operation(facts=facts, source=make_source(facts=[]))]
+        gui = self._make_gui(mock_services)
+        gui.debrief_svc._get_pub_attrs = MagicMock(return_value={})
+        status, _, body = await self._get(gui, dict(type='fact', operations='op-1', cluster='true'))
+        assert status == 200
+        types = [n['type'] for n in json.loads(body)['nodes']]
+        assert types == ['operation', 'fact_cluster']
+
+    @pytest.mark.asyncio
+    async def test_invalid_top_k_rejected(self, mock_services):
+        gui = self._make_gui(mock_services)
+        status, _, _ = await self._get(gui, dict(type='fact', operations='op-1', top_k='many'))
+        assert status == 400
+
+
+# ---------------------------------------------------------------------------
+# DebriefGui response cache
+# ---------------------------------------------------------------------------
+class TestResponseCaching:
+    async def _get(self, gui, query, headers=None):
+        from aiohttp import web
+        from aiohttp.test_utils import TestClient, TestServer
+        app = web.Application()
+        app.router.add_route('GET', '/plugin/debrief/graph', gui.graph)
+        app.router.add_route('GET', '/plugin/debrief/topology', gui.topology)
+        async with TestClient(TestServer(app)) as client:
+            resp = await client.get('/plugin/debrief/graph' if 'type' in query else '/plugin/debrief/topology',
+                                    params=query, headers=headers or {})
+            return resp.status, resp.headers.get('ETag'), await resp.read()
+
+    @pytest.mark.asyncio
+    async def test_unchanged_operations_served_from_cache(self, mock_services, make_operation, make_link):
+        op = make_operation(chain=[make_link(unique='l1')])
+        mock_services['data_svc'].locate.return_value = [op]
+        gui = TestGraphStreaming()._make_gui(mock_services)
+        with patch.object(gui.debrief_svc, 'build_steps_d3', wraps=gui.debrief_svc.build_steps_d3) as build:
+            first = await self._get(gui, dict(type='steps', operations='op-1'))
+            second = await self._get(gui, dict(type='steps', operations='op-1'))
+            assert build.await_count == 1
+            assert first == second
+            op.chain.append(make_link(unique='l2', link_id='l2'))
+            third = await self._get(gui, dict(type='steps', operations='op-1'))
+            assert build.await_count == 2
+            assert third[1] != first[1]
+
+    @pytest.mark.asyncio
+    async def test_matching_etag_gets_304(self, mock_services, make_operation):
+        mock_services['data_svc'].locate.return_value = [make_operation()]
+        gui = TestGraphStreaming()._make_gui(mock_services)
+        status, etag, _ = await self._get(gui, dict(operations='op-1'))
+        assert status == 200 and etag
+        status, _, body = await self._get(gui, dict(operations='op-1'), headers={'If-None-Match': etag})
+        assert status == 304
+        assert body == b''
+
+    @pytest.mark.asyncio
+    async def test_agent_changes_invalidate(self, mock_services, make_operation, make_agent):
+        agent = make_agent(paw='paw1')
+        mock_services['data_svc'].locate.return_value = [make_operation(agents=[agent])]
+        gui = TestGraphStreaming()._make_gui(mock_services)
+        _, first, _ = await self._get(gui, dict(operations='op-1'))
+        agent.privilege = 'Elevated'
+        _, second, body = await self._get(gui, dict(operations='op-1'))
+        assert second != first
+        assert b'"privilege": "Elevated"' in body
+
+    @pytest.mark.asyncio
+    async def test_knowledge_store_facts_invalidate_topology(self, mock_services, make_operation, make_agent,
+                                                             make_fact, make_source):
+        mock_services['data_svc'].locate.return_value = [make_operation(agents=[make_agent(paw='paw1')],
+                                                                        source=make_source())]
+        gui = TestGraphStreaming()._make_gui(mock_services)
+        gui.debrief_svc.services['knowledge_svc'] = knowledge_svc = AsyncMock()
+        knowledge_svc.get_facts.return_value = []
+        _, first, _ = await self._get(gui, dict(operations='op-1'))
+        knowledge_svc.get_facts.return_value = [make_fact(trait='remote.host.ip', value='10.0.1.30')]
+        _, second, body = await self._get(gui, dict(operations='op-1'))
+        assert second != first
+        assert b'discovered-10.0.1.30' in body
+
+    @pytest.mark.asyncio
+    async def test_graph_variants_cached_separately(self, mock_services, make_operation):
+        mock_services['data_svc'].locate.return_value = [make_operation()]
+        gui = TestGraphStreaming()._make_gui(mock_services)
+        await self._get(gui, dict(type='steps', operations='op-1'))
+        await self._get(gui, dict(type='tactic', operations='op-1'))
+        assert len(gui.response_cache) == 2
+
+
+# ---------------------------------------------------------------------------
+# DebriefGui.topology_stream
+# ---------------------------------------------------------------------------
+class TestTopologyStream:
+    @staticmethod
+    async def _read_event(content):
+        event, data = None, None
+        while True:
+            line = (await content.readline()).decode().rstrip('\n')
+            if line.startswith('event: '):
+                event = line[len('event: '):]
+            elif line.startswith('data: '):
+                data = line[len('data: '):]
+            elif not line and event:
+                import json
+                return event, json.loads(data)
+
+    @pytest.mark.asyncio
+    async def test_full_topology_then_delta_then_end(self, mock_services, make_operation, make_agent, make_link):
+        from aiohttp import web
+        from aiohttp.test_utils import TestClient, TestServer
+        gui = TestGraphStreaming()._make_gui(mock_services)
+        gui._MIN_STREAM_INTERVAL = 0
+        op = make_operation(agents=[make_agent(paw='paw1')], chain=[make_link(paw='paw1', link_id='l1')])
+        op.state = 'running'
+        mock_services['data_svc'].locate.return_value = [op]
+        app = web.Application()
+        app.router.add_route('GET', '/plugin/debrief/topology/stream', gui.topology_stream)
+        async with TestClient(TestServer(app)) as client:
+            resp = await client.get('/plugin/debrief/topology/stream', params=dict(operations='op-1', interval='0.01'))
+            assert resp.headers['Content-Type'] == 'text/event-stream'
+            event, topo = await self._read_event(resp.content)
+            assert event == 'topology'
+            assert len(topo['replay_sequence']) == 1
+
+            op.chain.append(make_link(paw='paw1', link_id='l2', unique='l2'))
+            op.state = 'finished'
+            event, delta = await self._read_event(resp.content)
+            assert event == 'delta'
+            assert [e['step']['id'] for e in delta['replay_sequence']] == ['l2']
+            assert delta['edges'] == []
+            assert await self._read_event(resp.content) == ('end', {})
+
+    @pytest.mark.asyncio
+    async def test_knowledge_store_facts_pushed(self, mock_services, make_operation, make_agent, make_link,
+                                                make_fact, make_source):
+        import asyncio
+        from aiohttp import web
+        from aiohttp.test_utils import TestClient, TestServer
+        gui = TestGraphStreaming()._make_gui(mock_services)
+        gui._MIN_STREAM_INTERVAL = 0
+        gui.debrief_svc.services['knowledge_svc'] = knowledge_svc = AsyncMock()
+        knowledge_svc.get_facts.return_value = []
+        op = make_operation(agents=[make_agent(paw='paw1')], chain=[make_link(paw='paw1', link_id='l1')],
+                            source=make_source())
+        op.state = 'running'
+        mock_services['data_svc'].locate.return_value = [op]
+        app = web.Application()
+        app.router.add_route('GET', '/plugin/debrief/topology/stream', gui.topology_stream)
+        async with TestClient(TestServer(app)) as client:
+            resp = await client.get('/plugin/debrief/topology/stream', params=dict(operations='op-1', interval='0.01'))
+            assert (await self._read_event(resp.content))[0] == 'topology'
+
+            knowledge_svc.get_facts.return_value = [make_fact(trait='remote.host.ip', value='10.0.1.30',
+                                                              unique='kb-1')]
+            event, delta = await asyncio.wait_for(self._read_event(resp.content), 5)
+            assert event == 'delta'
+            assert 'discovered-10.0.1.30' in delta['hosts']
+            op.state = 'finished'
+            assert await self._read_event(resp.content) == ('end', {})
+
+    @pytest.mark.asyncio
+    async def test_error_after_failed_write_not_raised(self, mock_services, make_operation):
+        from aiohttp import web
+        gui = TestGraphStreaming()._make_gui(mock_services)
+        mock_services['data_svc'].locate.return_value = [make_operation()]
+        gui.debrief_svc.fingerprint = AsyncMock(side_effect=RuntimeError('failed'))
+        response = MagicMock(prepare=AsyncMock(), write=AsyncMock(side_effect=ConnectionResetError),
+                             write_eof=AsyncMock())
+        request = MagicMock()
+        request.rel_url.query = dict(operations='op-1', interval='1')
+        with patch.object(web, 'StreamResponse', return_value=response):
+            assert await gui.topology_stream(request) is response
+        response.write.assert_awaited_once()
+        response.write_eof.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_invalid_interval_rejected(self, mock_services):
+        from aiohttp import web
+        from aiohttp.test_utils import TestClient, TestServer
+        gui = TestGraphStreaming()._make_gui(mock_services)
+        app = web.Application()
+        app.router.add_route('GET', '/plugin/debrief/topology/stream', gui.topology_stream)
+        async with TestClient(TestServer(app)) as client:
+            resp = await client.get('/plugin/debrief/topology/stream', params=dict(operations='op-1', interval='soon'))
+            assert resp.status == 400
+
+
+# ---------------------------------------------------------------------------
+# DebriefGui PDF job endpoints
+# ---------------------------------------------------------------------------
+class TestPdfJobs:
+    @staticmethod
+    def _make_gui(mock_services):
+        from plugins.debrief.app.utility.pdf_jobs import PdfJobQueue
+        gui = TestGraphStreaming()._make_gui(mock_services)
+        gui.pdf_jobs = PdfJobQueue()
+        gui.uploads_dir = '/tmp/uploads'
+        return gui
+
+    @staticmethod
+    def _app(gui):
+        from aiohttp import web
+        app = web.Application()
+        app.router.add_route('POST', '/plugin/debrief/pdf/jobs', gui.submit_pdf_job)
+        app.router.add_route('GET', '/plugin/debrief/pdf/jobs/{job_id}', gui.pdf_job_status)
+        app.router.add_route('GET', '/plugin/debrief/pdf/jobs/{job_id}/download', gui.download_pdf_job)
+        app.router.add_route('DELETE', '/plugin/debrief/pdf/jobs/{job_id}', gui.cancel_pdf_job)
+        return app
+
+    @pytest.mark.asyncio
+    async def test_submit_poll_download(self, mock_services, make_operation):
+        import asyncio
+        from aiohttp.test_utils import TestClient, TestServer
+        mock_services['data_svc'].locate.return_value = [make_operation(name='Op One')]
+        gui = self._make_gui(mock_services)
+
+        graphs = []
+
+        async def build_pdf(operations, agents, filename, sections, header_logo_path, graph_files=None, job=None):
+            graphs.append(graph_files)
+            assert open(graph_files['steps-graph'], 'rb').read() == b'<svg/>'
+            job.section_progress('agents', 'running')
+            job.page_done(1)
+            job.section_progress('agents', 'done')
+            return b'%PDF-1.4 << /Type /Page >>'
+
+        gui._build_pdf = build_pdf
+        body = dict(operations=['op-1'], graphs={'steps-graph': 'PHN2Zy8+'}, **{'report-sections': ['agents']})
+        async with TestClient(TestServer(self._app(gui))) as client:
+            resp = await client.post('/plugin/debrief/pdf/jobs', json=body)
+            assert resp.status == 202
+            job_id = (await resp.json())['job_id']
+            for _ in range(20):
+                status = await (await client.get(f'/plugin/debrief/pdf/jobs/{job_id}')).json()
+                if status['state'] == 'done':
+                    break
+                await asyncio.sleep(0)
+            assert status['sections'] == [dict(name='agents', state='done')]
+            assert status['pages'] == 1
+            result = await (await client.get(f'/plugin/debrief/pdf/jobs/{job_id}/download')).json()
+            assert result['filename'].startswith('Op-One_Debrief_')
+            assert result['pdf_bytes'].startswith('%PDF')
+        assert not os.path.exists(os.path.dirname(graphs[0]['steps-graph']))
+
+    @pytest.mark.asyncio
+    async def test_cancel_and_unknown_job(self, mock_services, make_operation):
+        import asyncio
+        from aiohttp.test_utils import TestClient, TestServer
+        mock_services['data_svc'].locate.return_value = [make_operation()]
+        gui = self._make_gui(mock_services)
+        started = asyncio.Event()
+
+        workspaces = []
+
+        async def build_pdf(*args, graph_files=None, job=None):
+            workspaces.append(os.path.dirname(graph_files['steps-graph']))
+            started.set()
+            await asyncio.sleep(10)
+
+        gui._build_pdf = build_pdf
+        body = dict(operations=['op-1'], graphs={'steps-graph': 'PHN2Zy8+'}, **{'report-sections': []})
+        async with TestClient(TestServer(self._app(gui))) as client:
+            job_id = (await (await client.post('/plugin/debrief/pdf/jobs', json=body)).json())['job_id']
+            await started.wait()
+            resp = await client.get(f'/plugin/debrief/pdf/jobs/{job_id}/download')
+            assert resp.status == 409
+            resp = await client.delete(f'/plugin/debrief/pdf/jobs/{job_id}')
+            assert (await resp.json())['state'] == 'cancelled'
+            resp = await client.get(f'/plugin/debrief/pdf/jobs/{job_id}')
+            assert resp.status == 404
+        assert not os.path.exists(workspaces[0])
+
+    @pytest.mark.asyncio
+    async def test_other_users_cannot_reach_job(self, mock_services, make_operation):
+        import asyncio
+        from aiohttp.test_utils import TestClient, TestServer
+        from plugins.debrief.app import debrief_gui
+        mock_services['data_svc'].locate.return_value = [make_operation()]
+        gui = self._make_gui(mock_services)
+        user = ['alice']
+
+        async def authorized_userid(request):
+            return user[0]
+
+        async def build_pdf(*args, graph_files=None, job=None):
+            return b'%PDF-1.4'
+
+        gui._build_pdf = build_pdf
+        body = dict(operations=['op-1'], graphs={}, **{'report-sections': []})
+        with patch.object(debrief_gui, 'authorized_userid', authorized_userid):
+            async with TestClient(TestServer(self._app(gui))) as client:
+                job_id = (await (await client.post('/plugin/debrief/pdf/jobs', json=body)).json())['job_id']
+                await asyncio.sleep(0.01)
+                user[0] = 'mallory'
+                assert (await client.get(f'/plugin/debrief/pdf/jobs/{job_id}')).status == 404
+                assert (await client.get(f'/plugin/debrief/pdf/jobs/{job_id}/download')).status == 404
+                assert (await client.delete(f'/plugin/debrief/pdf/jobs/{job_id}')).status == 404
+                user[0] = 'alice'
+                assert (await (await client.get(f'/plugin/debrief/pdf/jobs/{job_id}')).json())['state'] == 'done'
+
+    @pytest.mark.asyncio
+    async def test_submit_without_operations(self, mock_services):
+        from aiohttp.test_utils import TestClient, TestServer
+        gui = self._make_gui(mock_services)
+        async with TestClient(TestServer(self._app(gui))) as client:
+            resp = await client.post('/plugin/debrief/pdf/jobs', json=dict(operations=[], graphs={}))
+            assert resp.status == 400
+
+
+# ---------------------------------------------------------------------------
+# DebriefGui binary PDF responses
+# ---------------------------------------------------------------------------
+class TestBinaryPdfResponse:
+    PDF = b'%PDF-1.4\n' + bytes(range(256)) * 64 + b'\n%%EOF'
+
+    def _make_gui(self, mock_services):
+        gui = TestPdfJobs._make_gui(mock_services)
+
+        async def build_pdf(operations, agents, filename, sections, header_logo_path, graph_files=None, job=None,
+                            output=None):
+            if output is None:
+                return self.PDF
+            output.write(self.PDF)
+
+        gui._build_pdf = build_pdf
+        return gui
+
+    async def _post(self, gui, headers, **body):
+        from aiohttp import web
+        from aiohttp.test_utils import TestClient, TestServer
+        app = web.Application()
+        app.router.add_route('POST', '/plugin/debrief/pdf', gui.download_pdf)
+        body = dict(dict(operations=['op-1'], graphs={}, **{'report-sections': []}), **body)
+        async with TestClient(TestServer(app)) as client:
+            resp = await client.post('/plugin/debrief/pdf', json=body, headers=headers)
+            return resp.status, resp.headers, await resp.read()
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('spool_size', [1024 * 1024, 1024])
+    async def test_pdf_streamed_when_accepted(self, mock_services, make_operation, spool_size):
+        mock_services['data_svc'].locate.return_value = [make_operation(name='Op One')]
+        gui = self._make_gui(mock_services)
+        gui._PDF_SPOOL_SIZE = spool_size  # the smaller size spills the spool to disk and uses sendfile
+        status, headers, body = await self._post(gui, {'Accept': 'application/pdf'})
+        assert status == 200
+        assert headers['Content-Type'] == 'application/pdf'
+        assert headers['Content-Length'] == str(len(self.PDF))
+        assert re.match(r'attachment; filename="Op-One_Debrief_\d{4}_\d{2}_\d{2}\.pdf"', headers['Content-Disposition'])
+        assert body == self.PDF
+
+    @pytest.mark.asyncio
+    async def test_json_without_accept(self, mock_services, make_operation):
+        import json
+        mock_services['data_svc'].locate.return_value = [make_operation()]
+        gui = self._make_gui(mock_services)
+        status, headers, body = await self._post(gui, {})
+        assert status == 200
+        assert headers['Content-Type'].startswith('application/json')
+        assert json.loads(body)['pdf_bytes'] == self.PDF.decode('utf-8', errors='ignore')
+
+    @pytest.mark.asyncio
+    async def test_job_download_as_pdf(self, mock_services, make_operation):
+        from aiohttp.test_utils import TestClient, TestServer
+        from plugins.debrief.app.utility.pdf_jobs import PdfJob
+        gui = self._make_gui(mock_services)
+        job = PdfJob([], 'report.pdf', owner=(None, ()))
+        job.complete(self.PDF)
+        gui.pdf_jobs._jobs[job.id] = job
+        async with TestClient(TestServer(TestPdfJobs._app(gui))) as client:
+            resp = await client.get(f'/plugin/debrief/pdf/jobs/{job.id}/download', headers={'Accept': 'application/pdf'})
+            assert resp.headers['Content-Type'] == 'application/pdf'
+            assert resp.headers['Content-Disposition'] == 'attachment; filename="report.pdf"'
+            assert await resp.read() == self.PDF
+
+
+    @pytest.mark.asyncio
+    async def test_concurrent_renders_keep_their_own_graphs(self, mock_services, make_operation):
+        import asyncio
+        import base64
+        mock_services['data_svc'].locate.return_value = [make_operation()]
+        gui = self._make_gui(mock_services)
+        both_started, seen = asyncio.Barrier(2), []
+
+        async def build_pdf(operations, agents, filename, sections, header_logo_path, graph_files=None, job=None,
+                            output=None):
+            await both_started.wait()
+            seen.append(open(graph_files['steps-graph'], 'rb').read())
+            return self.PDF
+
+        gui._build_pdf = build_pdf
+
+        async def post(svg):
+            from aiohttp import web
+            from aiohttp.test_utils import make_mocked_request
+            body = dict(operations=['op-1'], graphs={'steps-graph': base64.b64encode(svg).decode()},
+                        **{'report-sections': []})
+            request = make_mocked_request('POST', '/plugin/debrief/pdf', app=web.Application())
+            request.json = AsyncMock(return_value=body)
+            return await gui.download_pdf(request)
+
+        await asyncio.gather(post(b'<svg id="a"/>'), post(b'<svg id="b"/>'))
+        assert sorted(seen) == [b'<svg id="a"/>', b'<svg id="b"/>']
+
+
+# ---------------------------------------------------------------------------
+# DebriefGui._build_pdf section scheduling
+# ---------------------------------------------------------------------------
+class TestBuildPdfSections:
+    class _Section:
+        def __init__(self, name, delay=0, finished=None):
+            self.name, self.delay, self.finished = name, delay, finished
+
+        async def generate_section_elements(self, styles, **kwargs):
+            import asyncio
+            await asyncio.sleep(self.delay)
+            for op in kwargs['operations']:
+                await op.all_facts()
+            if self.finished is not None:
+                self.finished.append(self.name)
+            return [self.name]
+
+    async def _story(self, sections, operations=(), finished=None):
+        from plugins.debrief.app.utility.pdf_jobs import PdfJob
+        gui = DebriefGui.__new__(DebriefGui)
+        gui.log = MagicMock()
+        gui.debrief_svc = MagicMock(fingerprint=AsyncMock(return_value=(('op-1',),)))
+        gui.section_cache = SectionCache(0)
+        gui._a18 = object()
+        gui.report_section_modules = {
+            'main-summary': self._Section('cover', 0.06, finished),
+            'statistics': self._Section('stats', 0.04, finished),
+            'agents': self._Section('agents', 0.02, finished),
+            'ttps-detections': self._Section('detections', 0, finished),
+            'steps-table': self._Section('steps', 0, finished),
+        }
+        gui._render_pdf = AsyncMock(return_value=b'%PDF')
+        job = PdfJob(sections, 'report.pdf')
+        await gui._build_pdf(list(operations), [], 'report.pdf', sections, None, job=job)
+        story = gui._render_pdf.await_args.args[0]
+        assert set(job.sections.values()) == {'done'}
+        return [f if isinstance(f, str) else f'{type(f).__name__}:{getattr(f, "name", "")}'
+                for f in story if not isinstance(f, type(story[0]))]
+
+    @pytest.mark.asyncio
+    async def test_sections_generated_concurrently_and_assembled_in_plan_order(self):
+        import time
+        finished = []
+        started = time.monotonic()
+        story = await self._story(['ttps-detections', 'agents', 'statistics', 'steps-table'], finished=finished)
+        assert time.monotonic() - started < 0.1
+        assert finished[-3:] == ['agents', 'stats', 'cover']
+        assert [f for f in story if ':' not in f] == ['cover', 'stats', 'agents', 'steps', 'detections']
+        assert story[-4:] == ['UseTemplateMarker:LandscapeFirst', 'PageBreak:', 'LockTemplateMarker:Landscape',
+                              'detections']
+
+    @pytest.mark.asyncio
+    async def test_snapshot_facts_loaded_once(self, make_operation):
+        from plugins.debrief.app.utility.operation_resolver import OperationSnapshot
+        op, events = make_operation(), []
+        all_facts = op.all_facts
+
+        async def counted_facts():
+            events.append('facts')
+            return await all_facts()
+        op.all_facts = counted_facts
+        finished = []
+        await self._story(['agents', 'steps-table'], operations=[OperationSnapshot(op)], finished=finished)
+        assert events == ['facts']
+        assert sorted(finished) == ['agents', 'cover', 'steps']
+
+    @pytest.mark.asyncio
+    async def test_unchanged_sections_reused_across_renders(self):
+        gui = DebriefGui.__new__(DebriefGui)
+        gui.log = MagicMock()
+        gui._a18 = object()
+        gui.debrief_svc = MagicMock(fingerprint=AsyncMock(return_value=(('op-1',),)))
+        gui.section_cache = SectionCache(1024 * 1024)
+        gui._render_pdf = AsyncMock(return_value=b'%PDF')
+        cover, table = MagicMock(cacheable=False), MagicMock(id='steps-table')
+        cover.cache_key.return_value, table.cache_key.return_value = None, ()
+        cover.generate_section_elements = AsyncMock(return_value=['cover'])
+        table.generate_section_elements = AsyncMock(return_value=['steps'])
+        gui.report_section_modules = {'main-summary': cover, 'steps-table': table}
+        for _ in range(2):
+            await gui._build_pdf([], [], 'report.pdf', ['steps-table'], None)
+            assert [f for f in gui._render_pdf.await_args.args[0] if isinstance(f, str)] == ['cover', 'steps']
+        assert cover.generate_section_elements.await_count == 2
+        assert table.generate_section_elements.await_count == 1
+
+
+# ---------------------------------------------------------------------------
+# DebriefGui on-disk PDF cache
+# ---------------------------------------------------------------------------
+class TestPdfArtifactCaching:
+    def _make_gui(self, mock_services, tmp_path):
+        gui = TestBinaryPdfResponse()._make_gui(mock_services)
+        gui.pdf_cache = PdfArtifactCache(str(tmp_path / 'pdfs'), max_bytes=1024 * 1024)
+        gui.report_section_modules = dict()
+        build = gui._build_pdf
+        gui._build_pdf = AsyncMock(side_effect=build)
+        return gui
+
+    @pytest.mark.asyncio
+    async def test_stopped_operation_rendered_once(self, mock_services, make_operation, tmp_path):
+        import json
+        op = make_operation()
+        op.state = 'finished'
+        mock_services['data_svc'].locate.return_value = [op]
+        gui = self._make_gui(mock_services, tmp_path)
+        _, headers, body = await TestBinaryPdfResponse()._post(gui, {'Accept': 'application/pdf'})
+        assert body == TestBinaryPdfResponse.PDF
+        assert headers['Content-Length'] == str(len(body))
+        _, _, body = await TestBinaryPdfResponse()._post(gui, {})
+        assert json.loads(body)['pdf_bytes'] == TestBinaryPdfResponse.PDF.decode('utf-8', errors='ignore')
+        assert gui._build_pdf.await_count == 1
+        assert len(os.listdir(tmp_path / 'pdfs')) == 1
+
+        await TestBinaryPdfResponse()._post(gui, {}, **{'report-sections': ['agents']})
+        assert gui._build_pdf.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_logo_content_is_part_of_key(self, mock_services, make_operation, tmp_path):
+        op = make_operation()
+        op.state = 'finished'
+        mock_services['data_svc'].locate.return_value = [op]
+        gui = self._make_gui(mock_services, tmp_path)
+        (tmp_path / 'header-logos').mkdir()
+        logo = tmp_path / 'header-logos' / 'logo.png'
+        gui.uploads_dir = str(tmp_path)
+        for content in (b'one', b'one', b'two'):
+            logo.write_bytes(content)
+            await TestBinaryPdfResponse()._post(gui, {}, **{'header-logo': 'logo.png'})
+        assert gui._build_pdf.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_running_operation_not_cached(self, mock_services, make_operation, tmp_path):
+        op = make_operation()
+        op.state = 'running'
+        mock_services['data_svc'].locate.return_value = [op]
+        gui = self._make_gui(mock_services, tmp_path)
+        for _ in range(2):
+            await TestBinaryPdfResponse()._post(gui, {'Accept': 'application/pdf'})
+        assert gui._build_pdf.await_count == 2
+        assert not os.path.exists(tmp_path / 'pdfs')
+
+    @pytest.mark.asyncio
+    async def test_browser_graphs_not_cached_without_numpy(self, mock_services, make_operation, tmp_path):
+        from plugins.debrief.app.utility import graph_layout
+        op = make_operation()
+        op.state = 'finished'
+        gui = self._make_gui(mock_services, tmp_path)
+        with patch.object(graph_layout, 'available', return_value=False):
+            assert await gui._pdf_cache_key([op], ['steps-graph'], None) is None
+            assert await gui._pdf_cache_key([op], ['steps-table'], None)
+
+    @pytest.mark.asyncio
+    async def test_graph_too_large_to_lay_out_not_cached(self, mock_services, make_operation, tmp_path):
+        pytest.importorskip('numpy')
+        from plugins.debrief.app.utility import graph_layout
+        from importlib import import_module
+        steps_graph = import_module('plugins.debrief.app.debrief-sections.steps_graph')
+        op = make_operation()
+        op.state = 'finished'
+        gui = self._make_gui(mock_services, tmp_path)
+        with patch('plugins.debrief.app.utility.base_report_section.get_attack18'):
+            gui.report_section_modules = {'steps-graph': steps_graph.DebriefReportSection()}
+        gui.debrief_svc.build_steps_d3 = AsyncMock(return_value=dict(nodes=[dict(id=0, type='c2')], links=[]))
+        assert await gui._pdf_cache_key([op], ['steps-graph'], None)
+        with patch.object(graph_layout, 'MAX_NODES', 0):
+            assert await gui._pdf_cache_key([op], ['steps-graph'], None) is None
+            assert await gui._pdf_cache_key([op], ['steps-table'], None)
+
+    @pytest.mark.asyncio
+    async def test_evicted_before_open_rendered_again(self, mock_services, make_operation, tmp_path):
+        import builtins
+        op = make_operation()
+        op.state = 'finished'
+        mock_services['data_svc'].locate.return_value = [op]
+        gui = self._make_gui(mock_services, tmp_path)
+        real_open, evicted = builtins.open, []
+
+        def racing_open(path, *args, **kwargs):
+            if str(path).endswith('.pdf') and not evicted:
+                evicted.append(path)
+                os.remove(path)
+            return real_open(path, *args, **kwargs)
+
+        with patch.object(builtins, 'open', racing_open):
+            status, _, body = await TestBinaryPdfResponse()._post(gui, {'Accept': 'application/pdf'})
+        assert status == 200
+        assert body == TestBinaryPdfResponse.PDF
+        assert gui._build_pdf.await_count == 2
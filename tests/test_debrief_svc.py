@@ -4,6 +4,8 @@ from types import SimpleNamespace
 from unittest.mock import AsyncMock, MagicMock, patch
 
 from plugins.debrief.app.debrief_svc import DebriefService
+from plugins.debrief.app.utility.d3_graph import D3Graph
+from plugins.debrief.app.utility.fact_detail import FactDetail
 
 
 # ---------------------------------------------------------------------------
@@ -116,26 +118,24 @@ class TestTacticEntryHelpers:
 # ===========================================================================
 class TestAddAgentsToD3:
     def test_adds_agent_node_and_link(self, sample_agent):
-        id_store = {'c2': 0}
-        graph = {'nodes': [], 'links': []}
-        DebriefService._add_agents_to_d3([sample_agent], id_store, graph)
-        assert len(graph['nodes']) == 1
-        assert graph['nodes'][0]['type'] == 'agent'
-        assert len(graph['links']) == 1
-        assert graph['links'][0]['source'] == 0
+        graph = D3Graph()
+        DebriefService._add_agents_to_d3([sample_agent], graph)
+        assert len(graph.nodes) == 1
+        assert graph.nodes[0]['type'] == 'agent'
+        assert len(graph.links) == 1
+        assert graph.links[0]['source'] == 0
 
     def test_no_duplicate_agents(self, sample_agent):
-        id_store = {'c2': 0}
-        graph = {'nodes': [], 'links': []}
-        DebriefService._add_agents_to_d3([sample_agent, sample_agent], id_store, graph)
-        assert len(graph['nodes']) == 1
+        graph = D3Graph()
+        DebriefService._add_agents_to_d3([sample_agent, sample_agent], graph)
+        assert len(graph.nodes) == 1
 
     def test_multiple_agents(self, sample_agent, sample_agent_linux):
-        id_store = {'c2': 0}
-        graph = {'nodes': [], 'links': []}
-        DebriefService._add_agents_to_d3([sample_agent, sample_agent_linux], id_store, graph)
-        assert len(graph['nodes']) == 2
-        assert len(graph['links']) == 2
+        graph = D3Graph()
+        DebriefService._add_agents_to_d3([sample_agent, sample_agent_linux], graph)
+        assert len(graph.nodes) == 2
+        assert len(graph.links) == 2
+        assert [n['id'] for n in graph.nodes] == [1, 2]
 
 
 # ===========================================================================
@@ -178,6 +178,19 @@ class TestGetByPropOrder:
         result = DebriefService._get_by_prop_order(two_op_chain, 'technique_name')
         assert len(result) == 2
 
+    def test_recurring_tactic_opens_new_run(self, make_ability, make_link):
+        chain = [make_link(ability=make_ability(tactic=t), unique=f'u{i}')
+                 for i, t in enumerate(['discovery', 'collection', 'discovery', 'discovery'])]
+        result = DebriefService._get_by_prop_order(chain, 'tactic')
+        assert [(p, [lnk.unique for lnk in lnks]) for p, lnks in result] == [
+            ('discovery', ['u0']), ('collection', ['u1']), ('discovery', ['u2', 'u3'])]
+
+    def test_cleanup_link_joins_current_run(self, make_ability, make_link):
+        l1 = make_link(ability=make_ability(tactic='discovery'), unique='u1')
+        l2 = make_link(ability=make_ability(tactic='defense-evasion'), unique='u2', cleanup=1)
+        result = DebriefService._get_by_prop_order([l1, l2], 'tactic')
+        assert result == [('discovery', [l1, l2])]
+
 
 # ===========================================================================
 # _link_nontargeted_facts
@@ -336,6 +349,20 @@ class TestBuildAttackpathD3:
         link_nodes = [n for n in result['nodes'] if n['type'] == 'link']
         assert len(link_nodes) >= 1
 
+    @pytest.mark.asyncio
+    async def test_origin_link_resolved_from_selected_operations(self, mock_services, make_operation, make_agent,
+                                                                 make_link):
+        svc = _svc(mock_services)
+        parent_agent = make_agent(paw='paw1', unique='paw1')
+        lnk = make_link(paw='paw1', unique='origin-lnk', link_id='origin-lnk')
+        spawned_agent = make_agent(paw='paw2', unique='paw2', origin_link_id='origin-lnk')
+        op = make_operation(agents=[parent_agent, spawned_agent], chain=[lnk])
+        mock_services['data_svc'].locate.return_value = [op]
+        result = await svc.build_attackpath_d3(['op-1'])
+        mock_services['app_svc'].find_op_with_link.assert_not_awaited()
+        link_node = next(n for n in result['nodes'] if n['type'] == 'link')
+        assert dict(source=link_node['id'], target=2, type='next_link') in result['links']
+
 
 # ===========================================================================
 # _get_pub_attrs — static
@@ -353,3 +380,120 @@ class TestGetPubAttrs:
         f = make_fact()
         result = DebriefService._get_pub_attrs(f)
         assert result['origin_type'] == 'LEARNED'
+
+
+class TestBuildFactD3MultiOp:
+    @pytest.mark.asyncio
+    async def test_shared_fact_gets_node_per_operation(self, mock_services, make_operation, make_fact, make_source):
+        svc = _svc(mock_services)
+        f1 = make_fact(unique='f1')
+        op1 = make_operation(op_id='op-1', facts=[f1], source=make_source(facts=[f1]))
+        op2 = make_operation(op_id='op-2', facts=[f1], source=make_source(facts=[]))
+        mock_services['data_svc'].locate.return_value = [op1, op2]
+        result = await svc.build_fact_d3(['op-1', 'op-2'])
+        fact_ids = [n['id'] for n in result['nodes'] if n['type'] == 'fact']
+        assert len(fact_ids) == len(set(fact_ids)) == 2
+        targets = [(lnk['source'], lnk['target']) for lnk in result['links']]
+        assert sorted(targets, key=str) == sorted([('op-1', fact_ids[0]), ('op-2', fact_ids[1])], key=str)
+
+
+class TestBuildFactD3Detail:
+    @pytest.mark.asyncio
+    async def test_top_k_limits_fact_nodes(self, mock_services, make_operation, make_fact, make_source):
+        svc = _svc(mock_services)
+        facts = [make_fact(unique=f'f{i}', score=i) for i in range(10)]
+        op = make_operation(facts=facts, source=make_source(facts=[]))
+        mock_services['data_svc'].locate.return_value = [op]
+        result = await svc.build_fact_d3(['op-1'], detail=FactDetail(top_k=3))
+        fact_nodes = [n for n in result['nodes'] if n['type'] == 'fact']
+        assert [n['attrs']['unique'] for n in fact_nodes] == ['f7', 'f8', 'f9']
+        assert len(result['links']) == 3
+
+    @pytest.mark.asyncio
+    async def test_cluster_node_replaces_hidden_facts(self, mock_services, make_operation, make_fact, make_source):
+        svc = _svc(mock_services)
+        top = make_fact(trait='host.user.name', unique='top', score=5)
+        files = [make_fact(trait='host.file.path', unique=f'p{i}') for i in range(4)]
+        rels = [SimpleNamespace(edge='has_file', source=top, target=f) for f in files]
+        op = make_operation(facts=[top] + files, relationships=rels, source=make_source(facts=[top]))
+        mock_services['data_svc'].locate.return_value = [op]
+        result = await svc.build_fact_d3(['op-1'], detail=FactDetail(top_k=1, cluster=True))
+        fact_node = next(n for n in result['nodes'] if n['type'] == 'fact')
+        cluster = next(n for n in result['nodes'] if n['type'] == 'fact_cluster')
+        assert cluster['attrs'] == dict(trait='host.file.path', count=4)
+        assert result['links'] == [dict(source='op-1', target=fact_node['id'], type='relationship'),
+                                   dict(source=fact_node['id'], target=cluster['id'], type='relationship')]
+
+    @pytest.mark.asyncio
+    async def test_dropped_facts_lose_their_links(self, mock_services, make_operation, make_fact, make_source):
+        svc = _svc(mock_services)
+        f1 = make_fact(unique='f1', score=2)
+        f2 = make_fact(unique='f2', score=1)
+        rel = SimpleNamespace(edge='has_password', source=f1, target=f2)
+        op = make_operation(facts=[f1, f2], relationships=[rel], source=make_source(facts=[]))
+        mock_services['data_svc'].locate.return_value = [op]
+        result = await svc.build_fact_d3(['op-1'], detail=FactDetail(top_k=1))
+        assert all(lnk['source'] is not None and lnk['target'] is not None for lnk in result['links'])
+        assert len(result['links']) == 1
+
+
+# ===========================================================================
+# build_graph_delta — async
+# ===========================================================================
+class TestBuildGraphDelta:
+    @pytest.mark.asyncio
+    async def test_no_cursor_returns_full_graph(self, mock_services, sample_operation):
+        svc = _svc(mock_services)
+        mock_services['data_svc'].locate.return_value = [sample_operation]
+        result = await svc.build_graph_delta(svc.build_steps_d3, ['op-1'], '')
+        assert result['reset'] is True
+        assert result['cursor'] == 'op-1:1:0:1'
+        assert result['nodes'] == (await svc.build_steps_d3(['op-1']))['nodes']
+
+    @pytest.mark.asyncio
+    async def test_only_new_steps_returned(self, mock_services, make_operation, make_link):
+        svc = _svc(mock_services)
+        op = make_operation(chain=[make_link(unique='l1')])
+        mock_services['data_svc'].locate.return_value = [op]
+        first = await svc.build_graph_delta(svc.build_steps_d3, ['op-1'], '')
+        op.chain.append(make_link(unique='l2'))
+        delta = await svc.build_graph_delta(svc.build_steps_d3, ['op-1'], first['cursor'])
+        assert delta['reset'] is False
+        assert [n['name'] for n in delta['nodes']] == ['link:l2']
+        new_id = delta['nodes'][0]['id']
+        assert all(lnk['target'] == new_id for lnk in delta['links'])
+        assert len(delta['links']) == 2
+        assert delta['cursor'] == 'op-1:2:0:1'
+
+    @pytest.mark.asyncio
+    async def test_unchanged_operation_returns_empty_delta(self, mock_services, sample_operation):
+        svc = _svc(mock_services)
+        mock_services['data_svc'].locate.return_value = [sample_operation]
+        first = await svc.build_graph_delta(svc.build_tactic_d3, ['op-1'], '')
+        delta = await svc.build_graph_delta(svc.build_tactic_d3, ['op-1'], first['cursor'])
+        assert delta['nodes'] == [] and delta['links'] == []
+
+    @pytest.mark.asyncio
+    async def test_new_agent_forces_reset(self, mock_services, make_operation, make_agent, make_link):
+        svc = _svc(mock_services)
+        op = make_operation(chain=[make_link(unique='l1')])
+        mock_services['data_svc'].locate.return_value = [op]
+        first = await svc.build_graph_delta(svc.build_steps_d3, ['op-1'], '')
+        op.agents.append(make_agent(paw='paw2', unique='agent2'))
+        delta = await svc.build_graph_delta(svc.build_steps_d3, ['op-1'], first['cursor'])
+        assert delta['reset'] is True
+
+    @pytest.mark.asyncio
+    async def test_new_facts_returned(self, mock_services, make_operation, make_fact):
+        svc = _svc(mock_services)
+        facts = [make_fact(unique='f1')]
+        op = make_operation(facts=facts)
+        mock_services['data_svc'].locate.return_value = [op]
+        first = await svc.build_graph_delta(svc.build_fact_d3, ['op-1'], '', count_facts=True)
+        facts.append(make_fact(unique='f2', trait='host.new'))
+        delta = await svc.build_graph_delta(svc.build_fact_d3, ['op-1'], first['cursor'], count_facts=True)
+        assert [n['name'] for n in delta['nodes']] == ['host.new']
+
+    def test_malformed_cursor(self):
+        assert DebriefService._parse_graph_cursor('op-1:x:0:1') is None
+        assert DebriefService._parse_graph_cursor('op-1:3:0:1') == {'op-1': (3, 0, 1)}
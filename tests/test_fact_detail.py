@@ -0,0 +1,69 @@
+"""Tests for app/utility/fact_detail.py — FactDetail."""
+from types import SimpleNamespace
+
+import pytest
+
+from plugins.debrief.app.utility.fact_detail import FactDetail
+
+
+def _facts(*specs):
+    return [SimpleNamespace(trait=trait, score=score, unique=f'f{i}') for i, (trait, score) in enumerate(specs)]
+
+
+class TestSelect:
+    def test_disabled_keeps_everything(self):
+        facts = _facts(('a', 1), ('b', 2))
+        assert FactDetail().select(facts) == (facts, {})
+
+    def test_top_k_by_score_in_discovery_order(self):
+        facts = _facts(('a', 1), ('b', 5), ('c', 3), ('d', 5))
+        shown, clusters = FactDetail(top_k=2).select(facts)
+        assert [f.unique for f in shown] == ['f1', 'f3']
+        assert clusters == {}
+
+    def test_ties_go_to_first_discovered(self):
+        facts = _facts(('a', 1), ('b', 1), ('c', 1))
+        shown, _ = FactDetail(top_k=2).select(facts)
+        assert [f.unique for f in shown] == ['f0', 'f1']
+
+    def test_overflow_clustered_by_trait(self):
+        facts = _facts(('a', 9), ('b', 1), ('c', 1), ('b', 1))
+        shown, clusters = FactDetail(top_k=1, cluster=True).select(facts)
+        assert [f.unique for f in shown] == ['f0']
+        assert {t: [f.unique for f in fs] for t, fs in clusters.items()} == {'b': ['f1', 'f3'], 'c': ['f2']}
+
+    def test_expanded_trait_shown(self):
+        facts = _facts(('a', 9), ('b', 1), ('c', 1))
+        shown, clusters = FactDetail(top_k=1, cluster=True, expand=['b']).select(facts)
+        assert [f.unique for f in shown] == ['f0', 'f1']
+        assert list(clusters) == ['c']
+
+    def test_cluster_without_top_k_collapses_everything(self):
+        facts = _facts(('a', 9), ('b', 1), ('a', 1))
+        detail = FactDetail(cluster=True)
+        assert detail.enabled
+        shown, clusters = detail.select(facts)
+        assert shown == []
+        assert {t: [f.unique for f in fs] for t, fs in clusters.items()} == {'a': ['f0', 'f2'], 'b': ['f1']}
+
+    def test_cluster_and_expand_without_top_k(self):
+        facts = _facts(('a', 9), ('b', 1), ('a', 1))
+        shown, clusters = FactDetail(cluster=True, expand=['b']).select(facts)
+        assert [f.unique for f in shown] == ['f1']
+        assert list(clusters) == ['a']
+
+    def test_expand_without_top_k_or_cluster_keeps_everything(self):
+        facts = _facts(('a', 9), ('b', 1))
+        detail = FactDetail(expand=['b'])
+        assert detail.enabled
+        assert detail.select(facts) == (facts, {})
+
+    def test_top_k_and_expand_without_cluster_drops_the_rest(self):
+        facts = _facts(('a', 9), ('b', 1), ('c', 1))
+        shown, clusters = FactDetail(top_k=1, expand=['b']).select(facts)
+        assert [f.unique for f in shown] == ['f0', 'f1']
+        assert clusters == {}
+
+    def test_negative_top_k_rejected(self):
+        with pytest.raises(ValueError):
+            FactDetail(top_k=-1)
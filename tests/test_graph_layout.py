@@ -0,0 +1,81 @@
+"""Tests for app/utility/graph_layout.py — server-side graph layout."""
+import pytest
+
+pytest.importorskip('numpy')
+
+from reportlab.graphics.shapes import Drawing  # noqa: E402
+
+from plugins.debrief.app.utility import graph_layout  # noqa: E402
+from plugins.debrief.app.utility.graph_layout import available, force_layout, render_graph  # noqa: E402
+
+
+def _graph(n=12):
+    nodes = [dict(id=0, name='C2 Server', type='c2')] + \
+            [dict(id=i, name=f'n{i}', type='link', status=i % 2, attrs=dict(name=f'step {i}')) for i in range(1, n)]
+    links = [dict(source=i - 1, target=i, type='next_link') for i in range(1, n)]
+    return dict(nodes=nodes, links=links)
+
+
+class TestForceLayout:
+    def test_available_with_numpy(self):
+        assert available()
+
+    def test_same_input_same_layout(self):
+        assert force_layout(_graph()) == force_layout(_graph())
+
+    def test_positions_in_unit_square(self):
+        positions = force_layout(_graph())
+        assert set(positions) == set(range(12))
+        assert all(0.0 <= c <= 1.0 for xy in positions.values() for c in xy)
+
+    def test_small_graphs(self):
+        assert force_layout(dict(nodes=[], links=[])) == {}
+        assert force_layout(dict(nodes=[dict(id='op-1')], links=[])) == {'op-1': (0.5, 0.5)}
+
+    def test_links_to_unknown_nodes_ignored(self):
+        graph = _graph(3)
+        graph['links'].append(dict(source=1, target=None, type='relationship'))
+        assert len(force_layout(graph)) == 3
+
+
+    @pytest.mark.parametrize('n', [100, 1200, 2500, 8000, 50000])
+    def test_iterations_stay_within_pair_budget(self, n):
+        assert graph_layout.layout_iterations(n, 150) * n * n <= graph_layout._PAIR_BUDGET
+
+    def test_large_graph_within_pair_budget(self, monkeypatch):
+        monkeypatch.setattr(graph_layout, '_PAIR_BUDGET', 10 ** 8)
+        layout_iterations, pairs = graph_layout.layout_iterations, []
+
+        def record(n, iterations):
+            iterations = layout_iterations(n, iterations)
+            pairs.append(n * n * iterations)
+            return iterations
+        monkeypatch.setattr(graph_layout, 'layout_iterations', record)
+        assert len(force_layout(_graph(3000))) == 3000
+        assert pairs == [3000 * 3000 * 11]
+
+    def test_can_layout(self):
+        assert graph_layout.can_layout(_graph(graph_layout.MAX_NODES))
+        assert not graph_layout.can_layout(_graph(graph_layout.MAX_NODES + 1))
+        assert graph_layout.layout_iterations(graph_layout.MAX_NODES, 150) >= 30
+
+
+class TestRenderGraph:
+    def test_returns_drawing_of_requested_width(self):
+        drawing = render_graph(_graph(), 500)
+        assert isinstance(drawing, Drawing)
+        assert (drawing.width, drawing.height) == (500, 375)
+
+    def test_one_shape_per_link_node_and_label(self):
+        drawing = render_graph(_graph(5), 400)
+        assert len(drawing.contents) == 4 + 5 + 5
+
+    def test_technique_nodes_coloured(self):
+        graph = dict(nodes=[dict(id=0, name='op', type='operation'),
+                            dict(id=1, name='Process Discovery', type='technique_name'),
+                            dict(id=2, name='Discovery', type='tactic')],
+                     links=[dict(source=0, target=1), dict(source=0, target=2)])
+        circles = [shape for shape in render_graph(graph, 400).contents if hasattr(shape, 'r')]
+        assert [c.fillColor for c in circles] == [graph_layout.NODE_COLORS['operation'],
+                                                  graph_layout.NODE_COLORS['technique_name'],
+                                                  graph_layout.NODE_COLORS['tactic']]
@@ -0,0 +1,138 @@
+"""Tests for app/utility/operation_resolver.py — OperationResolver and OperationSnapshot."""
+import asyncio
+
+import pytest
+from unittest.mock import AsyncMock
+
+from plugins.debrief.app.utility.operation_resolver import OperationResolver, OperationSnapshot, index_agents_by_paw
+
+
+def _data_svc(operations):
+    data_svc = AsyncMock()
+    data_svc.locate = AsyncMock(return_value=operations)
+    return data_svc
+
+
+class TestResolve:
+    @pytest.mark.asyncio
+    async def test_single_locate_for_all_ids(self, make_operation):
+        op1 = make_operation(op_id='op-1')
+        op2 = make_operation(op_id='op-2')
+        data_svc = _data_svc([op1, op2])
+        resolver = OperationResolver(data_svc)
+        assert await resolver.resolve(['op-2', 'op-1']) == [op2, op1]
+        data_svc.locate.assert_awaited_once_with('operations', match=dict(id=('op-2', 'op-1')))
+
+    @pytest.mark.asyncio
+    async def test_access_criteria_included(self, make_operation):
+        data_svc = _data_svc([make_operation(op_id='op-1')])
+        resolver = OperationResolver(data_svc, criteria=dict(access=('red',)))
+        await resolver.resolve(['op-1'])
+        data_svc.locate.assert_awaited_once_with('operations', match=dict(access=('red',), id=('op-1',)))
+
+    @pytest.mark.asyncio
+    async def test_missing_ids_skipped(self, make_operation):
+        resolver = OperationResolver(_data_svc([make_operation(op_id='op-1')]))
+        assert [o.id for o in await resolver.resolve(['op-1', 'op-9'])] == ['op-1']
+
+    @pytest.mark.asyncio
+    async def test_resolved_ids_not_fetched_again(self, make_operation):
+        op1 = make_operation(op_id='op-1')
+        data_svc = _data_svc([op1])
+        resolver = OperationResolver(data_svc)
+        await resolver.resolve(['op-1'])
+        assert await resolver.resolve(['op-1']) == [op1]
+        assert resolver.get('op-1') is op1
+        data_svc.locate.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_duplicate_ids_resolved_once(self, make_operation):
+        op1 = make_operation(op_id='op-1')
+        op2 = make_operation(op_id='op-2')
+        data_svc = _data_svc([op1, op2])
+        assert await OperationResolver(data_svc).resolve(['op-2', 'op-1', 'op-2', 'op-1']) == [op2, op1]
+        data_svc.locate.assert_awaited_once_with('operations', match=dict(id=('op-2', 'op-1')))
+
+    @pytest.mark.asyncio
+    async def test_empty_selection_skips_locate(self):
+        data_svc = _data_svc([])
+        assert await OperationResolver(data_svc).resolve([]) == []
+        data_svc.locate.assert_not_awaited()
+
+
+class TestAgentsByPaw:
+    def test_index_keeps_first_agent_per_paw(self, make_agent, make_operation):
+        a1 = make_agent(paw='paw1', unique='a1')
+        a2 = make_agent(paw='paw2', unique='a2')
+        dup = make_agent(paw='paw1', unique='dup')
+        op = make_operation(agents=[a1, None, a2, dup])
+        assert index_agents_by_paw(op) == {'paw1': a1, 'paw2': a2}
+
+    def test_resolver_builds_index_once(self, make_agent, make_operation):
+        op = make_operation(agents=[make_agent(paw='paw1')])
+        resolver = OperationResolver(AsyncMock())
+        index = resolver.agents_by_paw(op)
+        op.agents = []
+        assert resolver.agents_by_paw(op) is index
+
+
+class TestLinkIndex:
+    @pytest.mark.asyncio
+    async def test_links_indexed_across_resolved_operations(self, make_link, make_operation):
+        l1 = make_link(unique='l1')
+        l2 = make_link(unique='l2')
+        op1 = make_operation(op_id='op-1', chain=[l1])
+        op2 = make_operation(op_id='op-2', chain=[l2])
+        resolver = OperationResolver(_data_svc([op1, op2]))
+        await resolver.resolve(['op-1', 'op-2'])
+        index = resolver.link_index()
+        assert index['l1'] == (op1, l1)
+        assert index['l2'] == (op2, l2)
+
+
+class TestOperationSnapshot:
+    @staticmethod
+    def _counting(op, name):
+        calls = []
+        original = getattr(op, name)
+
+        async def load():
+            calls.append(name)
+            await asyncio.sleep(0)
+            return await original()
+        setattr(op, name, load)
+        return calls
+
+    @pytest.mark.asyncio
+    async def test_facts_loaded_once_for_concurrent_callers(self, make_operation, make_fact):
+        op = make_operation(facts=[make_fact()])
+        calls = self._counting(op, 'all_facts')
+        snapshot = OperationSnapshot(op)
+        first, second = await asyncio.gather(snapshot.all_facts(), snapshot.all_facts())
+        assert first is second
+        assert await snapshot.all_facts() is first
+        assert calls == ['all_facts']
+
+    @pytest.mark.asyncio
+    async def test_relationships_loaded_once(self, make_operation):
+        op = make_operation()
+        calls = self._counting(op, 'all_relationships')
+        snapshot = OperationSnapshot(op)
+        await snapshot.all_relationships()
+        await snapshot.all_relationships()
+        assert calls == ['all_relationships']
+
+    def test_chain_copied_and_attributes_proxied(self, make_operation, make_link):
+        op = make_operation(chain=[make_link()])
+        snapshot = OperationSnapshot(op)
+        op.chain.append(make_link(unique='l2'))
+        assert len(snapshot.chain) == 1
+        assert snapshot.id == op.id and snapshot.name == op.name
+
+    @pytest.mark.asyncio
+    async def test_resolver_hands_out_snapshots(self, make_operation):
+        op = make_operation()
+        resolver = OperationResolver(_data_svc([op]), snapshot=True)
+        [resolved] = await resolver.resolve(['op-1'])
+        assert isinstance(resolved, OperationSnapshot)
+        assert (await resolver.resolve(['op-1']))[0] is resolved
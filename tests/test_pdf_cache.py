@@ -0,0 +1,97 @@
+"""Tests for app/utility/pdf_cache.py — on-disk PDF artifacts with single-flight rendering."""
+import asyncio
+import os
+
+import pytest
+
+from plugins.debrief.app.utility.pdf_cache import PdfArtifactCache
+
+
+def _renderer(body=b'%PDF-1.4', gate=None):
+    calls = []
+
+    async def render(output):
+        calls.append(output)
+        if gate:
+            await gate.wait()
+        output.write(body)
+    return render, calls
+
+
+class TestPdfArtifactCache:
+    def test_key_is_stable_and_content_addressed(self):
+        key = PdfArtifactCache.key((('op-1', 'finished'),), ['agents'], None, '1.0')
+        assert key == PdfArtifactCache.key((('op-1', 'finished'),), ['agents'], None, '1.0')
+        assert key != PdfArtifactCache.key((('op-1', 'finished'),), ['agents'], 'logo', '1.0')
+        assert len(key) == 64
+
+    @pytest.mark.asyncio
+    async def test_render_once_then_hit(self, tmp_path):
+        cache = PdfArtifactCache(str(tmp_path / 'pdfs'), max_bytes=1024)
+        render, calls = _renderer()
+        first = await cache.get_or_render('k', render)
+        second = await cache.get_or_render('k', render)
+        assert first == second == cache.path('k')
+        assert len(calls) == 1
+        assert open(first, 'rb').read() == b'%PDF-1.4'
+        assert os.listdir(tmp_path / 'pdfs') == ['k.pdf']
+
+    @pytest.mark.asyncio
+    async def test_identical_requests_share_one_render(self, tmp_path):
+        cache = PdfArtifactCache(str(tmp_path), max_bytes=1024)
+        gate = asyncio.Event()
+        render, calls = _renderer(gate=gate)
+        waiting = [asyncio.ensure_future(cache.get_or_render('k', render)) for _ in range(3)]
+        await asyncio.sleep(0)
+        gate.set()
+        assert set(await asyncio.gather(*waiting)) == {cache.path('k')}
+        assert len(calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_waiter_takes_over_when_renderer_goes_away(self, tmp_path):
+        cache = PdfArtifactCache(str(tmp_path), max_bytes=1024)
+        gate = asyncio.Event()
+        render, calls = _renderer(gate=gate)
+        leader = asyncio.ensure_future(cache.get_or_render('k', render))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(cache.get_or_render('k', render))
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.sleep(0)
+        gate.set()
+        assert await follower == cache.path('k')
+        assert leader.cancelled()
+        assert len(calls) == 2
+        assert os.listdir(tmp_path) == ['k.pdf']
+
+    @pytest.mark.asyncio
+    async def test_failed_render_leaves_nothing_behind(self, tmp_path):
+        cache = PdfArtifactCache(str(tmp_path), max_bytes=1024)
+
+        async def render(output):
+            output.write(b'%PDF-partial')
+            raise RuntimeError('boom')
+
+        with pytest.raises(RuntimeError):
+            await cache.get_or_render('k', render)
+        assert os.listdir(tmp_path) == []
+        assert cache.lookup('k') is None
+
+    @pytest.mark.asyncio
+    async def test_least_recently_used_evicted(self, tmp_path):
+        cache = PdfArtifactCache(str(tmp_path), max_bytes=25)
+        render, _ = _renderer(body=b'x' * 10)
+        for key in ('a', 'b'):
+            await cache.get_or_render(key, render)
+        os.utime(cache.path('a'), (1, 1))
+        os.utime(cache.path('b'), (2, 2))
+        assert cache.lookup('a')  # a hit makes 'a' the most recently used
+        await cache.get_or_render('c', render)
+        assert sorted(os.listdir(tmp_path)) == ['a.pdf', 'c.pdf']
+
+    @pytest.mark.asyncio
+    async def test_oversized_pdf_still_served(self, tmp_path):
+        cache = PdfArtifactCache(str(tmp_path), max_bytes=5)
+        render, _ = _renderer(body=b'x' * 10)
+        path = await cache.get_or_render('big', render)
+        assert open(path, 'rb').read() == b'x' * 10
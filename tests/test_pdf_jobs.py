@@ -0,0 +1,159 @@
+"""Tests for app/utility/pdf_jobs.py — background PDF jobs."""
+import asyncio
+
+import pytest
+
+from plugins.debrief.app.utility.pdf_jobs import PdfJob, PdfJobCancelled, PdfJobQueue, count_pages
+
+
+async def _wait(job):
+    while not job.finished:
+        await asyncio.sleep(0)
+
+
+class TestPdfJob:
+    def test_display(self):
+        job = PdfJob(['statistics', 'agents'], 'report.pdf')
+        job.section_progress('statistics', 'running')
+        shown = job.display()
+        assert shown['state'] == 'queued'
+        assert shown['stage'] == 'statistics'
+        assert shown['sections'] == [dict(name='statistics', state='running'), dict(name='agents', state='pending')]
+
+    def test_page_done_raises_once_cancelled(self):
+        job = PdfJob([], 'report.pdf')
+        job.page_done(3)
+        assert job.pages == 3
+        job.state = PdfJob.CANCELLED
+        with pytest.raises(PdfJobCancelled):
+            job.page_done(4)
+
+    def test_count_pages(self):
+        assert count_pages(b'<< /Type /Pages /Count 2 >> << /Type /Page >> << /Type /Page\n>>') == 2
+        assert count_pages(None) == 0
+
+
+class TestPdfJobQueue:
+    @pytest.mark.asyncio
+    async def test_job_completes(self):
+        queue = PdfJobQueue()
+
+        async def render(job):
+            job.section_progress('agents', 'done')
+            return b'%PDF << /Type /Page >>'
+
+        job = queue.submit(render, ['agents'], 'report.pdf')
+        await _wait(job)
+        assert queue.get(job.id) is job
+        assert job.state == PdfJob.DONE
+        assert job.result.startswith(b'%PDF')
+        assert job.pages == 1
+        assert job.sections == dict(agents='done')
+
+    @pytest.mark.asyncio
+    async def test_failure_recorded(self):
+        queue = PdfJobQueue()
+
+        async def render(job):
+            raise RuntimeError('boom')
+
+        job = queue.submit(render, [], 'report.pdf')
+        await _wait(job)
+        assert job.state == PdfJob.FAILED
+        assert job.error == 'Error generating PDF report'
+
+    @pytest.mark.asyncio
+    async def test_concurrency_bounded(self):
+        queue = PdfJobQueue(max_running=2)
+        release = asyncio.Event()
+        running, peak = [0], [0]
+
+        async def render(job):
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+            await release.wait()
+            running[0] -= 1
+            return b''
+
+        jobs = [queue.submit(render, [], 'report.pdf') for _ in range(5)]
+        for _ in range(5):
+            await asyncio.sleep(0)
+        assert [job.state for job in jobs].count(PdfJob.RUNNING) == 2
+        release.set()
+        for job in jobs:
+            await _wait(job)
+        assert peak[0] == 2
+
+    @pytest.mark.asyncio
+    async def test_queue_full(self):
+        queue = PdfJobQueue(max_jobs=1)
+
+        async def render(job):
+            await asyncio.sleep(10)
+
+        queue.submit(render, [], 'report.pdf')
+        with pytest.raises(PdfJobQueue.QueueFull):
+            queue.submit(render, [], 'report.pdf')
+        queue.cancel(next(iter(queue._jobs)))
+
+    @pytest.mark.asyncio
+    async def test_cancel_stops_running_job(self):
+        queue = PdfJobQueue()
+        started = asyncio.Event()
+
+        async def render(job):
+            started.set()
+            await asyncio.sleep(10)
+
+        job = queue.submit(render, [], 'report.pdf')
+        await started.wait()
+        assert queue.cancel(job.id) is job
+        await asyncio.sleep(0)
+        assert job.state == PdfJob.CANCELLED
+        assert job.task.done()
+        assert queue.get(job.id) is None
+        assert queue.cancel(job.id) is None
+
+    @pytest.mark.asyncio
+    async def test_jobs_only_reachable_by_owner(self):
+        queue = PdfJobQueue()
+
+        async def render(job):
+            return b''
+
+        job = queue.submit(render, [], 'report.pdf', owner='alice')
+        assert queue.get(job.id) is None
+        assert queue.get(job.id, 'bob') is None
+        assert queue.cancel(job.id, 'bob') is None
+        assert queue.get(job.id, 'alice') is job
+        assert queue.cancel(job.id, 'alice') is job
+        await _wait(job)
+
+    @pytest.mark.asyncio
+    async def test_abandoned_job_cancelled(self):
+        queue = PdfJobQueue(idle_timeout=0.02)
+
+        async def render(job):
+            await asyncio.sleep(10)
+
+        job = queue.submit(render, [], 'report.pdf')
+        await asyncio.sleep(0.1)
+        assert job.state == PdfJob.CANCELLED
+        assert len(queue) == 0
+
+    @pytest.mark.asyncio
+    async def test_polling_keeps_job_alive(self):
+        queue = PdfJobQueue(idle_timeout=0.05)
+        release = asyncio.Event()
+
+        async def render(job):
+            await release.wait()
+            return b''
+
+        job = queue.submit(render, [], 'report.pdf')
+        for _ in range(6):
+            await asyncio.sleep(0.02)
+            assert queue.get(job.id) is job
+        release.set()
+        await _wait(job)
+        assert job.state == PdfJob.DONE
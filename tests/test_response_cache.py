@@ -0,0 +1,36 @@
+"""Tests for app/utility/response_cache.py — ResponseCache."""
+from plugins.debrief.app.utility.response_cache import ResponseCache
+
+
+class TestResponseCache:
+    def test_put_and_get(self):
+        cache = ResponseCache(max_bytes=100)
+        body, etag = cache.put('k', b'{"a": 1}')
+        assert cache.get('k') == (body, etag)
+        assert etag.startswith('"') and etag.endswith('"')
+        assert cache.get('missing') is None
+
+    def test_same_body_same_etag(self):
+        assert ResponseCache.etag(b'x') == ResponseCache.etag(b'x') != ResponseCache.etag(b'y')
+
+    def test_least_recently_used_evicted_over_budget(self):
+        cache = ResponseCache(max_bytes=10)
+        cache.put('a', b'1234')
+        cache.put('b', b'1234')
+        cache.get('a')
+        cache.put('c', b'1234')
+        assert cache.get('b') is None
+        assert cache.get('a') and cache.get('c')
+        assert cache.size == 8
+
+    def test_replacing_key_updates_size(self):
+        cache = ResponseCache(max_bytes=10)
+        cache.put('a', b'1234')
+        cache.put('a', b'12')
+        assert cache.size == 2 and len(cache) == 1
+
+    def test_oversized_body_not_stored(self):
+        cache = ResponseCache(max_bytes=3)
+        body, _ = cache.put('a', b'1234')
+        assert body == b'1234'
+        assert len(cache) == 0 and cache.size == 0
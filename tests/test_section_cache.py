@@ -0,0 +1,151 @@
+"""Tests for app/utility/section_cache.py and BaseReportSection.cache_key."""
+import importlib
+import pickle
+import threading
+from io import BytesIO
+from unittest.mock import MagicMock, patch
+
+import pytest
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import Paragraph, SimpleDocTemplate
+
+from plugins.debrief.app.utility import graph_layout
+from plugins.debrief.app.utility.base_report_section import BaseReportSection
+from plugins.debrief.app.utility.section_cache import SectionCache
+
+
+class _Section(BaseReportSection):
+    def __init__(self, section_id='steps-table'):
+        self.id = section_id
+        self.calls = 0
+
+    async def generate_section_elements(self, styles, **kwargs):
+        self.calls += 1
+        return [Paragraph('call %d' % self.calls, styles['Normal'])]
+
+
+def _texts(flowables):
+    return [f.text for f in flowables]
+
+
+@pytest.fixture
+def styles():
+    return getSampleStyleSheet()
+
+
+class TestCacheKey:
+    def test_flags_follow_selected_sections(self):
+        section = _Section()
+        section.cache_flags = ('agents', 'ttps-detections')
+        assert section.cache_key(selected_sections=['agents']) == (True, False)
+        assert section.cache_key() == (False, False)
+
+    def test_not_cacheable(self):
+        section = _Section()
+        section.cacheable = False
+        assert section.cache_key(selected_sections=[]) is None
+
+    def test_graph_needs_server_side_drawing(self):
+        section = _Section('steps-graph')
+        section.graph_type = 'steps'
+        assert section.cache_key(graph_files={'steps': 'x.svg'}) is None
+        with patch.object(graph_layout, 'available', return_value=True):
+            assert section.cache_key(debrief_svc=MagicMock()) == ()
+        with patch.object(graph_layout, 'available', return_value=False):
+            assert section.cache_key(debrief_svc=MagicMock()) is None
+
+
+class TestSectionCache:
+    @pytest.mark.asyncio
+    async def test_hit_returns_fresh_copy(self, styles):
+        cache, section = SectionCache(1024 * 1024), _Section()
+        first = await cache.generate(section, styles, ('op-1',), selected_sections=[])
+        second = await cache.generate(section, styles, ('op-1',), selected_sections=[])
+        assert section.calls == 1
+        assert _texts(second) == _texts(first) == ['call 1']
+        assert second[0] is not first[0]
+
+    @pytest.mark.asyncio
+    async def test_key_covers_fingerprint_section_and_flags(self, styles):
+        cache, section, other = SectionCache(1024 * 1024), _Section(), _Section('agents')
+        section.cache_flags = ('agents',)
+        await cache.generate(section, styles, ('op-1',), selected_sections=[])
+        await cache.generate(section, styles, ('op-1', 'changed'), selected_sections=[])
+        await cache.generate(section, styles, ('op-1',), selected_sections=['agents'])
+        await cache.generate(section, styles, ('op-1',), selected_sections=['statistics'])
+        await cache.generate(other, styles, ('op-1',), selected_sections=[])
+        assert section.calls == 3
+        assert other.calls == 1
+        assert len(cache) == 4
+
+    @pytest.mark.asyncio
+    async def test_uncacheable_sections_always_generated(self, styles):
+        cache, section = SectionCache(1024 * 1024), _Section()
+        section.cacheable = False
+        plain = MagicMock(spec=['id', 'generate_section_elements'])
+        plain.generate_section_elements = MagicMock(side_effect=lambda *a, **k: _async([]))
+        for _ in range(2):
+            await cache.generate(section, styles, ('op-1',))
+            await cache.generate(plain, styles, ('op-1',))
+        assert section.calls == 2
+        assert plain.generate_section_elements.call_count == 2
+        assert len(cache) == 0
+
+    @pytest.mark.asyncio
+    async def test_unpicklable_output_served_uncached(self, styles):
+        cache, section = SectionCache(1024 * 1024), _Section()
+
+        async def generate(styles, **kwargs):
+            section.calls += 1
+            return [threading.Lock()]
+        section.generate_section_elements = generate
+        await cache.generate(section, styles, ('op-1',))
+        await cache.generate(section, styles, ('op-1',))
+        assert section.calls == 2
+        assert len(cache) == 0
+
+    @pytest.mark.asyncio
+    async def test_graph_too_large_to_lay_out_not_cached(self, styles, make_operation):
+        from unittest.mock import AsyncMock
+        cache, section = SectionCache(1024 * 1024), _Section('steps-graph')
+        section.graph_type = 'steps'
+        nodes = [dict(id=0, name='c2', type='c2')]
+        debrief_svc = MagicMock(build_steps_d3=AsyncMock(return_value=dict(nodes=nodes, links=[])))
+        kwargs = dict(operations=[make_operation()], debrief_svc=debrief_svc, selected_sections=[])
+        with patch.object(graph_layout, 'available', return_value=True), \
+                patch.object(graph_layout, 'MAX_NODES', 1):
+            await cache.generate(section, styles, ('op-1',), **kwargs)
+            await cache.generate(section, styles, ('op-1',), **kwargs)
+            assert section.calls == 1
+            nodes.append(dict(id=1, name='n1', type='link'))
+            await cache.generate(section, styles, ('op-2',), **kwargs)
+            await cache.generate(section, styles, ('op-2',), **kwargs)
+        assert section.calls == 3
+        assert len(cache) == 1
+
+
+async def _async(value):
+    return value
+
+
+class TestRealSectionsRoundTrip:
+    """Cached flowables of the bundled sections must unpickle into a buildable story."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('module', ['agents', 'facts_table', 'statistics', 'step_output', 'steps_table',
+                                        'tactic_technique_table', 'steps_graph'])
+    async def test_unpickled_flowables_build(self, module, styles, make_operation, make_agent, make_link, make_fact,
+                                             mock_services):
+        from plugins.debrief.app.debrief_svc import DebriefService
+        with patch('plugins.debrief.app.utility.base_report_section.get_attack18'):
+            section = importlib.import_module(f'plugins.debrief.app.debrief-sections.{module}').DebriefReportSection()
+        agent = make_agent()
+        op = make_operation(agents=[agent], chain=[make_link()], facts=[make_fact()])
+        with patch.object(DebriefService, 'get_config', return_value={'app.name': 'caldera'}):
+            debrief_svc = DebriefService(mock_services)
+        flowables = await section.generate_section_elements(styles, operations=[op], agents=[agent],
+                                                            debrief_svc=debrief_svc, selected_sections=['agents'])
+        copy = pickle.loads(pickle.dumps(flowables, protocol=pickle.HIGHEST_PROTOCOL))
+        buffer = BytesIO()
+        SimpleDocTemplate(buffer).build(copy)
+        assert buffer.getvalue().startswith(b'%PDF')
@@ -123,6 +123,49 @@ class TestFactGraphSection:
             assert len(result) == 1
 
 
+class TestServerRenderedGraphSections:
+    @pytest.mark.asyncio
+    async def test_graph_built_from_operations(self, styles, make_operation):
+        pytest.importorskip('numpy')
+        section = _mock_section(steps_graph_mod)
+        op = make_operation()
+        debrief_svc = MagicMock(build_steps_d3=AsyncMock(return_value=dict(
+            nodes=[dict(id=0, name='C2 Server', type='c2'), dict(id='op-1', name='op', type='operation')],
+            links=[dict(source=0, target='op-1', type='next_link')])))
+        result = await section.generate_section_elements(styles, operations=[op], debrief_svc=debrief_svc,
+                                                         graph_files={'steps': '/fake/steps.svg'})
+        assert len(result) == 1
+        assert isinstance(result[0], KeepTogetherSplitAtTop)
+        assert debrief_svc.build_steps_d3.await_args.args == (['op-1'],)
+
+    @pytest.mark.asyncio
+    async def test_graph_too_large_falls_back_to_uploaded_svg(self, styles, make_operation):
+        pytest.importorskip('numpy')
+        from plugins.debrief.app.utility import graph_layout
+        section = _mock_section(steps_graph_mod)
+        debrief_svc = MagicMock(build_steps_d3=AsyncMock(return_value=dict(
+            nodes=[dict(id=i, name=str(i), type='link') for i in range(graph_layout.MAX_NODES + 1)], links=[])))
+        with patch.object(graph_layout, 'force_layout') as layout, \
+                patch.object(section, 'generate_grouped_graph_section_flowables', return_value='svg') as svg:
+            result = await section.generate_section_elements(styles, operations=[make_operation()],
+                                                             debrief_svc=debrief_svc,
+                                                             graph_files={'steps': '/fake/steps.svg'})
+            assert result == ['svg']
+            assert svg.call_args.args[1] == '/fake/steps.svg'
+            result = await section.generate_section_elements(styles, operations=[make_operation()],
+                                                             debrief_svc=debrief_svc, graph_files={})
+            assert result == []
+        layout.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_fact_graph_limited_to_top_facts(self, styles, make_operation):
+        pytest.importorskip('numpy')
+        section = _mock_section(fact_graph_mod)
+        debrief_svc = MagicMock(build_fact_d3=AsyncMock(return_value=dict(nodes=[], links=[])))
+        await section.generate_section_elements(styles, operations=[make_operation()], debrief_svc=debrief_svc)
+        assert debrief_svc.build_fact_d3.await_args.kwargs['detail'].top_k == 15
+
+
 # ===========================================================================
 # Facts Table Section
 # ===========================================================================
@@ -310,6 +353,20 @@ class TestStepsTableSection:
             result = await section.generate_section_elements(styles, operations=[op])
             assert len(result) >= 2
 
+    @pytest.mark.asyncio
+    async def test_table_built_off_event_loop(self, styles, make_operation, make_link):
+        import threading
+        section = _mock_section(steps_table_mod)
+        threads = []
+
+        def generate_table(*args, **kwargs):
+            threads.append(threading.current_thread())
+            return MagicMock()
+
+        with patch.object(section, 'generate_table', generate_table):
+            await section.generate_section_elements(styles, operations=[make_operation(chain=[make_link()])])
+        assert threads and threading.current_thread() not in threads
+
 
 # ===========================================================================
 # Tactic Graph Section
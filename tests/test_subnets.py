@@ -0,0 +1,58 @@
+"""Tests for app/utility/subnets.py — SubnetIndex."""
+import pytest
+
+from plugins.debrief.app.utility.subnets import SubnetIndex
+
+
+class TestSubnetOf:
+    def test_default_prefixes(self):
+        index = SubnetIndex()
+        assert index.subnet_of('192.168.1.50') == '192.168.1.0/24'
+        assert index.subnet_of('2001:db8:0:1::5') == '2001:db8:0:1::/64'
+
+    def test_custom_prefix(self):
+        assert SubnetIndex(prefix_v4=16).subnet_of('10.1.2.3') == '10.1.0.0/16'
+
+    def test_invalid_addresses(self):
+        index = SubnetIndex()
+        assert index.subnet_of('') is None
+        assert index.subnet_of('10.0.0') is None
+        assert index.subnet_of(None) is None
+
+    def test_surrounding_whitespace_ignored(self):
+        assert SubnetIndex().subnet_of(' 10.0.0.1 ') == '10.0.0.0/24'
+
+    def test_invalid_prefix_rejected(self):
+        with pytest.raises(ValueError):
+            SubnetIndex(prefix_v4=33)
+
+
+class TestConfiguredNetworks:
+    def test_longest_prefix_wins(self):
+        index = SubnetIndex(networks=['10.0.0.0/8', '10.20.0.0/16'])
+        assert index.subnet_of('10.20.3.4') == '10.20.0.0/16'
+        assert index.subnet_of('10.30.3.4') == '10.0.0.0/8'
+        assert index.subnet_of('11.0.0.1') == '11.0.0.0/24'
+
+    def test_added_network_invalidates_cache(self):
+        index = SubnetIndex()
+        assert index.subnet_of('10.20.3.4') == '10.20.3.0/24'
+        index.add('10.20.0.0/16')
+        assert index.subnet_of('10.20.3.4') == '10.20.0.0/16'
+
+    def test_ipv6_network(self):
+        index = SubnetIndex(networks=['2001:db8::/32'])
+        assert index.subnet_of('2001:db8:5::1') == '2001:db8::/32'
+
+    def test_default_route(self):
+        assert SubnetIndex(networks=['0.0.0.0/0']).subnet_of('8.8.8.8') == '0.0.0.0/0'
+
+
+class TestDockerBridge:
+    def test_docker_ranges(self):
+        index = SubnetIndex()
+        assert index.is_docker_bridge('172.17.0.1')
+        assert index.is_docker_bridge('172.31.255.1')
+        assert not index.is_docker_bridge('172.32.0.1')
+        assert not index.is_docker_bridge('10.0.0.1')
+        assert not index.is_docker_bridge('fe80::1')
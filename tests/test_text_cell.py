@@ -0,0 +1,81 @@
+"""Tests for app/utility/text_cell.py — plain-text table cells laid out without Paragraphs."""
+import html
+import pickle
+import re
+from io import BytesIO
+
+import pytest
+from reportlab.platypus import Paragraph, SimpleDocTemplate
+
+from plugins.debrief.app.objects.c_story import Story
+from plugins.debrief.app.utility.base_report_section import BaseReportSection
+from plugins.debrief.app.utility.text_cell import TextCell
+
+TEXTS = [
+    '', '   ', 'hello', 'whoami && net user /domain', '  leading\tand\r\ntrailing  ', 'a' * 120,
+    'x&y <tag> "quoted"', 'C:\\Windows\\System32\\cmd.exe /c dir', 'non\xa0breaking  space',
+    'powershell.exe -ExecutionPolicy Bypass -Command "Get-Process | Select-Object Name"',
+]
+
+
+def _text_ops(table):
+    """Build ``table`` and return its page's drawing operations, leaving out graphics state and fill colour."""
+    buffer = BytesIO()
+    SimpleDocTemplate(buffer, invariant=1, pageCompression=0).build([table])
+    stream = re.findall(rb'stream\r?\n(.*?)endstream', buffer.getvalue(), re.S)[0]
+    ops = [re.sub(rb' 0 0 0 rg', b'', op) for op in stream.split(b'\n')]
+    return [op for op in ops if op not in (b'q', b'Q', b'0 0 0 rg')]
+
+
+class TestTextCell:
+    @pytest.mark.parametrize('width', [20, 45, 80, 160, 400])
+    @pytest.mark.parametrize('text', TEXTS)
+    def test_wraps_like_paragraph(self, text, width):
+        para = Paragraph(html.escape(text), Story._TABLE_STYLE)
+        cell = TextCell(text, Story._TABLE_STYLE)
+        assert cell.wrap(width, 10 ** 6) == para.wrap(width, 10 ** 6)
+
+    def test_text_is_not_markup(self):
+        cell = TextCell('<b>not bold</b> &amp;', Story._TABLE_STYLE)
+        cell.wrap(400, 100)
+        assert cell.lines == ['<b>not bold</b> &amp;']
+
+    def test_pickled_copy_wraps_the_same(self):
+        cell = TextCell('a long command line ' * 10, Story._TABLE_STYLE)
+        copy = pickle.loads(pickle.dumps(cell, protocol=pickle.HIGHEST_PROTOCOL))
+        assert copy.wrap(100, 1000) == cell.wrap(100, 1000)
+        assert copy.lines == cell.lines
+
+
+class TestGetTableObject:
+    def test_plain_text_string(self):
+        assert isinstance(Story.get_table_object('<script>', plain_text=True), TextCell)
+
+    def test_markup_stays_paragraph(self):
+        assert isinstance(Story.get_table_object('<b>bold</b>', escape_html=False, plain_text=True), Paragraph)
+        assert isinstance(Story.get_table_object('a &amp; b', escape_html=False, plain_text=True), Paragraph)
+        assert isinstance(Story.get_table_object('plain', escape_html=False, plain_text=True), TextCell)
+
+    def test_lists_and_dicts_stay_paragraphs(self):
+        assert isinstance(Story.get_table_object(['a', 'b'], plain_text=True), Paragraph)
+        assert isinstance(Story.get_table_object({'k': ['v']}, plain_text=True), Paragraph)
+
+
+class TestGenerateTable:
+    def test_draws_like_paragraph_cells(self):
+        # Escaped characters make a Paragraph draw each line in pieces; the same text, but other operations
+        texts = [text for text in TEXTS if text == html.escape(text)]
+
+        def data():
+            return [['Name', 'Command']] + [[text, text[::-1]] for text in texts]
+
+        plain = BaseReportSection.generate_table(data(), [80, 240], plain_text=True)
+        assert isinstance(plain._cellvalues[4][0], TextCell)
+        assert _text_ops(plain) == _text_ops(BaseReportSection.generate_table(data(), [80, 240]))
+
+    def test_prebuilt_cells_kept(self):
+        cell = TextCell('kept', Story._TABLE_STYLE)
+        data = [['Header', 'Other'], [cell, 'x']]
+        BaseReportSection.generate_table(data, '*')
+        assert data[1][0] is cell
+        assert isinstance(data[1][1], Paragraph)
@@ -1,6 +1,7 @@
 """Tests for build_topology() in debrief_svc.py."""
 import pytest
-from unittest.mock import AsyncMock, patch
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
 
 from plugins.debrief.app.debrief_svc import DebriefService
 
@@ -97,8 +98,8 @@ class TestIpToSubnet:
     def test_empty_string(self):
         assert DebriefService._ip_to_subnet('') is None
 
-    def test_ipv6_returns_none(self):
-        assert DebriefService._ip_to_subnet('::1') is None
+    def test_ipv6_grouped_by_64(self):
+        assert DebriefService._ip_to_subnet('2001:db8::5') == '2001:db8::/64'
 
     def test_partial_ip(self):
         assert DebriefService._ip_to_subnet('192.168.1') is None
@@ -107,6 +108,34 @@ class TestIpToSubnet:
         assert DebriefService._ip_to_subnet('999.999.999.999') is None
 
 
+class TestSubnetConfig:
+    @pytest.mark.asyncio
+    async def test_configured_subnets_and_prefix(self):
+        svc = _svc()
+        config = dict(topology_subnets=['10.20.0.0/16', 'bogus'], topology_subnet_prefix_v4=28)
+        svc.get_config = lambda prop=None, name=None: config.get(prop) if prop else {}
+        a1 = _make_agent('paw1', 'web01', ips=['10.20.1.5'])
+        a2 = _make_agent('paw2', 'db01', ips=['192.168.5.20'])
+        op = _make_operation(agents=[a1, a2], chain=[])
+        svc.data_svc.locate = AsyncMock(return_value=[op])
+
+        result = await svc.build_topology(['op-1'])
+        subnets = {s['cidr']: s['hosts'] for s in result['subnets']}
+        assert subnets == {'10.20.0.0/16': ['paw1'], '192.168.5.16/28': ['paw2']}
+
+    @pytest.mark.parametrize('prefix, expected', [(0, '0.0.0.0/0'), (None, '192.168.5.0/24'), (33, '192.168.5.0/24'),
+                                                  ('16', '192.168.5.0/24'), (True, '192.168.5.0/24')])
+    def test_prefix_validated(self, prefix, expected):
+        svc = _svc()
+        svc.log = MagicMock()
+        config = dict(topology_subnet_prefix_v4=prefix, topology_subnet_prefix_v6=-1)
+        svc.get_config = lambda prop=None, name=None: config.get(prop) if prop else {}
+        subnet_index = svc._subnet_index()
+        assert subnet_index.subnet_of('192.168.5.20') == expected
+        assert subnet_index.subnet_of('2001:db8::5') == '2001:db8::/64'
+        assert svc.log.warning.call_count == (1 if prefix in (None, 0) else 2)
+
+
 # ===========================================================================
 # build_topology — empty / basic cases
 # ===========================================================================
@@ -326,6 +355,51 @@ class TestBuildTopologyDiscovered:
         assert 'discovered-10.0.1.20' in subnet['hosts']
 
 
+class TestBuildTopologyKnowledge:
+    @staticmethod
+    def _with_source(op, source_id='src-1'):
+        from types import SimpleNamespace
+        op.source = SimpleNamespace(id=source_id)
+        return op
+
+    @pytest.mark.asyncio
+    async def test_remote_host_traits_fetched_in_one_query(self):
+        svc = _svc()
+        knowledge_svc = AsyncMock()
+        knowledge_svc.get_facts.return_value = [_make_fact('remote.host.ip', '10.0.1.30')]
+        svc.services['knowledge_svc'] = knowledge_svc
+        op = self._with_source(_make_operation(agents=[_make_agent('paw1', 'web01', ips=['10.0.1.5'])]))
+        svc.data_svc.locate = AsyncMock(return_value=[op])
+
+        result = await svc.build_topology(['op-1'])
+        knowledge_svc.get_facts.assert_awaited_once_with(
+            criteria=dict(source='src-1', trait=('remote.host.ip', 'remote.host.fqdn')))
+        assert 'discovered-10.0.1.30' in result['hosts']
+
+    @pytest.mark.asyncio
+    async def test_knowledge_facts_already_in_operation_not_repeated(self):
+        svc = _svc()
+        fact = _make_fact('remote.host.ip', '10.0.1.30')
+        knowledge_svc = AsyncMock()
+        knowledge_svc.get_facts.return_value = [_make_fact('remote.host.ip', '10.0.1.30')]
+        svc.services['knowledge_svc'] = knowledge_svc
+        op = self._with_source(_make_operation(facts=[fact]))
+        svc.data_svc.locate = AsyncMock(return_value=[op])
+
+        assert await svc._get_topology_facts(op) == [fact]
+
+    @pytest.mark.asyncio
+    async def test_knowledge_error_keeps_operation_facts(self):
+        svc = _svc()
+        fact = _make_fact('remote.host.ip', '10.0.1.30')
+        knowledge_svc = AsyncMock()
+        knowledge_svc.get_facts.side_effect = RuntimeError('store offline')
+        svc.services['knowledge_svc'] = knowledge_svc
+        op = self._with_source(_make_operation(facts=[fact]))
+
+        assert await svc._get_topology_facts(op) == [fact]
+
+
 # ===========================================================================
 # build_topology — multi-operation
 # ===========================================================================
@@ -337,9 +411,10 @@ class TestBuildTopologyMultiOp:
         a2 = _make_agent('paw2', 'db01', ips=['10.0.2.10'], unique='paw2')
         op1 = _make_operation(name='Op1', agents=[a1], chain=[], op_id='op-1')
         op2 = _make_operation(name='Op2', agents=[a2], chain=[], op_id='op-2')
-        svc.data_svc.locate = AsyncMock(side_effect=[[op1], [op2]])
+        svc.data_svc.locate = AsyncMock(return_value=[op1, op2])
 
         result = await svc.build_topology(['op-1', 'op-2'])
+        svc.data_svc.locate.assert_awaited_once_with('operations', match=dict(id=('op-1', 'op-2')))
         assert 'paw1' in result['hosts']
         assert 'paw2' in result['hosts']
         cidrs = [s['cidr'] for s in result['subnets']]
@@ -405,6 +480,12 @@ class TestBuildTopologyMultiHop:
         assert lat_targets['proxy01paw'] == 'dc01paw'
         assert lat_targets['dc01paw'] == 'db01paw'
 
+        assert result['path_to_c2']['db01paw'] == ['db01paw', 'dc01paw', 'proxy01paw', 'web01paw', 'c2']
+        assert [result['hosts'][h]['depth'] for h in ('c2', 'web01paw', 'proxy01paw', 'dc01paw', 'db01paw')] == \
+            [0, 1, 2, 3, 4]
+        assert [result['hosts'][h]['subtree_size'] for h in ('c2', 'web01paw', 'proxy01paw', 'dc01paw', 'db01paw')] == \
+            [5, 4, 3, 2, 1]
+
     @pytest.mark.asyncio
     async def test_dual_homed_agent_uses_non_docker_ip(self):
         """Agent with both Docker and real IPs should use non-Docker as primary."""
@@ -437,3 +518,194 @@ class TestBuildTopologyMultiHop:
 
         result = await svc.build_topology(['op-1'])
         assert result['hosts']['paw1']['primary_ip'] == '10.0.1.10'
+
+
+# ===========================================================================
+# _paths_to_c2
+# ===========================================================================
+class TestPathsToC2:
+    def test_shared_suffix(self):
+        parent_map = dict(a='pivot', b='pivot', pivot='c2')
+        paths = DebriefService._paths_to_c2(['a', 'b', 'pivot'], parent_map)
+        assert paths == dict(a=['a', 'pivot', 'c2'], b=['b', 'pivot', 'c2'], pivot=['pivot', 'c2'])
+
+    def test_host_without_parent(self):
+        assert DebriefService._paths_to_c2(['lonely'], {}) == dict(lonely=['lonely'])
+
+    def test_cycle_ends_with_repeated_node(self):
+        parent_map = dict(a='b', b='a', t='a')
+        paths = DebriefService._paths_to_c2(['t', 'a', 'b'], parent_map)
+        assert paths == dict(t=['t', 'a', 'b', 'a'], a=['a', 'b', 'a'], b=['b', 'a', 'b'])
+
+
+# ===========================================================================
+# _beacon_tree
+# ===========================================================================
+class TestBeaconTree:
+    def test_depth_and_subtree_size(self):
+        parent_map = dict(a='pivot', b='pivot', pivot='c2', lonely='gone')
+        depth, size = DebriefService._beacon_tree(['c2', 'a', 'b', 'pivot', 'lonely'], parent_map)
+        assert depth == dict(c2=0, a=2, b=2, pivot=1, lonely=None)
+        assert size == dict(c2=4, a=1, b=1, pivot=3, lonely=1)
+
+    def test_cycle_members_count_everything_leading_into_it(self):
+        depth, size = DebriefService._beacon_tree(['c2', 't', 'a', 'b'], dict(a='b', b='a', t='a'))
+        assert depth == dict(c2=0, t=None, a=None, b=None)
+        assert size == dict(c2=1, t=1, a=3, b=3)
+
+    def test_long_chain(self):
+        n = 20000
+        parent_map = {f'h{i}': f'h{i - 1}' if i else 'c2' for i in range(n)}
+        depth, size = DebriefService._beacon_tree(['c2'] + list(parent_map), parent_map)
+        assert depth[f'h{n - 1}'] == n
+        assert size['c2'] == n + 1
+        assert size['h0'] == n
+        assert size[f'h{n - 1}'] == 1
+
+
+# ===========================================================================
+# diff_topology
+# ===========================================================================
+class TestDiffTopology:
+    @staticmethod
+    async def _topologies(first_chain, second_chain, agents):
+        svc = _svc()
+        op = _make_operation(agents=agents, chain=list(first_chain))
+        svc.data_svc.locate = AsyncMock(return_value=[op])
+        before = await svc.build_topology(['op-1'])
+        op.chain = list(second_chain)
+        return before, await svc.build_topology(['op-1'])
+
+    @pytest.mark.asyncio
+    async def test_new_steps_and_hosts(self):
+        web01 = _make_agent('web01', 'web01', ips=['10.0.1.5'])
+        db01 = _make_agent('db01', 'db01', ips=['10.0.2.5'], origin_link_id='lat-1')
+        step = _make_link('web01', link_id='step-1')
+        lateral = _make_link('web01', link_id='lat-1', tactic='lateral-movement')
+        before, after = await self._topologies([step], [step, lateral], [web01, db01])
+
+        delta = DebriefService.diff_topology(before, after)
+        assert [e['step']['id'] for e in delta['replay_sequence']] == ['lat-1']
+        assert delta['replay_updates'] == []
+        assert set(delta['hosts']) == {'c2', 'web01', 'db01'}  # step counts, origin, depth, subtree sizes
+        assert [(e['source'], e['target']) for e in delta['edges']] == [('web01', 'db01')]
+        assert delta['path_to_c2'] == dict(db01=['db01', 'web01', 'c2'])
+
+    @pytest.mark.asyncio
+    async def test_completed_step_reported_as_update(self):
+        web01 = _make_agent('web01', 'web01', ips=['10.0.1.5'])
+        running = _make_link('web01', link_id='step-1', status=-3)
+        done = _make_link('web01', link_id='step-1', status=0)
+        before, after = await self._topologies([running], [done], [web01])
+
+        delta = DebriefService.diff_topology(before, after)
+        assert delta['replay_sequence'] == []
+        assert [(u['operation'], u['index']) for u in delta['replay_updates']] == [('op-1', 0)]
+        assert delta['replay_updates'][0]['entry']['step']['status'] == 0
+
+    @pytest.mark.asyncio
+    async def test_earlier_operation_growing_keeps_later_entries(self):
+        svc = _svc()
+        op1 = _make_operation(agents=[_make_agent('web01', 'web01', ips=['10.0.1.5'])],
+                              chain=[_make_link('web01', link_id='a-1')])
+        op2 = _make_operation(agents=[_make_agent('db01', 'db01', ips=['10.0.2.5'])],
+                              chain=[_make_link('db01', link_id='b-1')], op_id='op-2')
+        svc.data_svc.locate = AsyncMock(return_value=[op1, op2])
+        before = await svc.build_topology(['op-1', 'op-2'])
+        op1.chain.append(_make_link('web01', link_id='a-2'))
+        after = await svc.build_topology(['op-1', 'op-2'])
+
+        delta = DebriefService.diff_topology(before, after)
+        assert [(e['operation'], e['index'], e['step']['id']) for e in delta['replay_sequence']] == \
+            [('op-1', 1, 'a-2')]
+        assert delta['replay_updates'] == []
+
+    def test_removed_replay_entry_requires_reload(self):
+        entry = dict(paw='a', step=dict(id='synthetic-0'), index=0, operation=None)
+        before = dict(replay_sequence=[entry], hosts={}, edges=[], subnets=[], path_to_c2={})
+        after = dict(before, replay_sequence=[dict(entry, operation='op-1')])
+        assert DebriefService.diff_topology(before, after) is None
+
+    def test_unchanged_topology_has_empty_delta(self):
+        topo = dict(replay_sequence=[], hosts={}, edges=[], subnets=[], path_to_c2={})
+        assert not any(DebriefService.diff_topology(topo, topo).values())
+
+    def test_removed_edge_requires_reload(self):
+        edge = dict(source='c2', target='a', type='initial_access', technique='Initial Access')
+        before = dict(replay_sequence=[], hosts={}, edges=[edge], subnets=[], path_to_c2={})
+        after = dict(before, edges=[])
+        assert DebriefService.diff_topology(before, after) is None
+
+
+# ===========================================================================
+# fingerprint
+# ===========================================================================
+class TestFingerprint:
+    @pytest.mark.asyncio
+    async def test_counters_without_loading_facts(self):
+        svc = _svc()
+        op = _make_operation(chain=[_make_link('paw1')])
+        op.all_facts = AsyncMock(side_effect=AssertionError('facts loaded'))
+        before = await svc.fingerprint([op])
+        op.chain[0].facts.append(_make_fact('host.user.name', 'admin'))
+        assert await svc.fingerprint([op]) != before
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('status', [-2, -4])
+    async def test_unfinished_link_status_change(self, status):
+        svc = _svc()
+        op = _make_operation(chain=[_make_link('paw1')])
+        op.chain[0].status, op.chain[0].finish = -3, None
+        before = await svc.fingerprint([op])
+        op.chain[0].status = status
+        assert await svc.fingerprint([op]) != before
+
+    @pytest.mark.asyncio
+    async def test_report_fields_change(self):
+        from types import SimpleNamespace
+        svc = _svc()
+        op = _make_operation()
+        op.adversary = SimpleNamespace(adversary_id='adv-1')
+        before = await svc.fingerprint([op])
+        op.name = 'Renamed'
+        renamed = await svc.fingerprint([op])
+        op.adversary = SimpleNamespace(adversary_id='adv-2')
+        assert len({before, renamed, await svc.fingerprint([op])}) == 3
+
+    @pytest.mark.asyncio
+    async def test_knowledge_store_facts_counted_on_request(self):
+        svc = _svc()
+        knowledge_svc = AsyncMock()
+        knowledge_svc.get_facts.return_value = []
+        svc.services['knowledge_svc'] = knowledge_svc
+        op = TestBuildTopologyKnowledge._with_source(_make_operation())
+        before = await svc.fingerprint([op], knowledge=True)
+        knowledge_svc.get_facts.return_value = [_make_fact('remote.host.ip', '10.0.1.30')]
+        assert await svc.fingerprint([op]) == await svc.fingerprint([op])
+        assert await svc.fingerprint([op], knowledge=True) != before
+
+
+# ===========================================================================
+# Shared operation snapshot
+# ===========================================================================
+class TestSharedSnapshot:
+    @pytest.mark.asyncio
+    async def test_facts_traversed_once_across_builders(self):
+        from plugins.debrief.app.utility.operation_resolver import OperationResolver
+        svc = _svc()
+        op = _make_operation(agents=[_make_agent('paw1', 'web01', ips=['10.0.1.5'])])
+        calls = []
+        original = op.all_facts
+
+        async def all_facts():
+            calls.append(1)
+            return await original()
+        op.all_facts = all_facts
+        op.source = SimpleNamespace(id='src', facts=[])
+        svc.data_svc.locate = AsyncMock(return_value=[op])
+
+        resolver = OperationResolver(svc.data_svc, snapshot=True)
+        await svc.fingerprint(await resolver.resolve(['op-1']))
+        await svc.build_topology(['op-1'], resolver=resolver)
+        await svc.build_fact_d3(['op-1'], resolver=resolver)
+        assert len(calls) == 1